@@ -3,6 +3,8 @@ from db import get_db_connection
 from audit import log_audit
 from werkzeug.security import generate_password_hash
 from permissions import require_permission
+import dimensions
+import archiver
 import bcrypt
 
 
@@ -378,3 +380,76 @@ def restore_user(user_id):
     cur.close()
     conn.close()
     return redirect(url_for("admin.list_users"))
+
+
+@admin_bp.route("/admin/dimensions/refresh", methods=["POST"])
+def refresh_dimensions():
+    require_admin()
+
+    # Drop cached severities / categories / formats / environments, here
+    # and (within DIMENSION_VERSION_CHECK seconds) in every other worker
+    dimensions.invalidate()
+    log_audit("Refreshed lookup table cache")
+
+    return redirect(url_for("admin.admin_home"))
+
+
+@admin_bp.route("/admin/ingestion-profiles")
+def ingestion_profiles():
+    """
+    Where ingestion time went, per file: /admin/ingestion-profiles?file_id=42
+    """
+    require_admin()
+
+    file_id = request.args.get("file_id", type=int)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    where_sql = "WHERE p.file_id = %s" if file_id else ""
+    params = [file_id] if file_id else []
+
+    cur.execute(f"""
+        SELECT
+            p.profile_id,
+            p.file_id,
+            rf.original_name,
+            p.rows_ingested,
+            p.total_seconds,
+            p.slowest_stage,
+            p.peak_memory_bytes,
+            p.stages,
+            p.created_at
+        FROM ingestion_profiles p
+        JOIN raw_files rf ON rf.file_id = p.file_id
+        {where_sql}
+        ORDER BY p.created_at DESC
+        LIMIT 100
+    """, params)
+
+    # stages slowest first
+    profiles = [
+        row[:7] + (sorted(row[7].items(), key=lambda s: -s[1]["seconds"]),) + row[8:]
+        for row in cur.fetchall()
+    ]
+
+    cur.close()
+    conn.close()
+
+    return render_template("admin_ingestion_profiles.html", profiles=profiles, file_id=file_id)
+
+
+@admin_bp.route("/admin/archiver-runs")
+def archiver_runs():
+    """
+    Recent archiver.py runs: duration, files and log rows archived, watermark.
+    """
+    require_admin()
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    runs = archiver.recent_runs(cur, limit=50)
+    cur.close()
+    conn.close()
+
+    return render_template("admin_archiver_runs.html", runs=runs)
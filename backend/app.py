@@ -9,10 +9,13 @@ from admin import admin_bp
 from user_home import user_home_bp
 from files import files_bp
 from profile import profile_bp
+from spool import SpoolingRequest
 
 
 app = Flask(__name__)
 app.secret_key = SECRET_KEY
+# uploads stream straight to the spool directory (see spool.py)
+app.request_class = SpoolingRequest
 
 app.register_blueprint(auth_bp)
 app.register_blueprint(dashboard_bp)
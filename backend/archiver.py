@@ -0,0 +1,284 @@
+"""
+Scheduled archiver.
+
+    python archiver.py                # one run (e.g. from cron)
+    python archiver.py --loop         # a run every ARCHIVE_INTERVAL_SECONDS
+    python archiver.py --status
+    python archiver.py --freeze-archived   # one-time, see freeze_archived()
+
+Archives raw_files uploaded more than ARCHIVE_AFTER_DAYS ago. Candidates are
+read in (uploaded_at, file_id) order, starting after the watermark the last
+run reached, ARCHIVE_BATCH_SIZE files per transaction; so a run only visits
+files uploaded since the previous cutoff. archives.total_records comes from
+raw_files.record_count (written at ingest) instead of counting log_entries.
+The log rows of each archived file move to its cold segment (cold_store.py).
+Runs, their duration and the rows they archived are kept in archiver_runs.
+
+A file with an ingest or re-parse job queued or running stops the run in
+front of it, so the watermark never passes it; the next run starts there.
+A file restored from the archive is behind the watermark and stays active
+until someone archives it again by hand.
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+
+from psycopg2.extras import execute_values
+
+from db import get_db_connection
+from config import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, ARCHIVE_INTERVAL_SECONDS
+import cold_store
+import jobs
+
+RUNNING = "RUNNING"
+DONE = "DONE"
+FAILED = "FAILED"
+
+# pg_advisory_lock key: one archiver at a time across all nodes
+ARCHIVER_LOCK_KEY = 7201
+
+
+def last_watermark(cur):
+    # batches commit together with the watermark, so a failed run's
+    # progress counts as well
+    cur.execute("""
+        SELECT watermark_uploaded_at, watermark_file_id
+        FROM archiver_runs
+        WHERE watermark_uploaded_at IS NOT NULL
+        ORDER BY run_id DESC
+        LIMIT 1
+    """)
+    return cur.fetchone() or ("-infinity", 0)
+
+
+def start_run(conn, cutoff):
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO archiver_runs (cutoff, state)
+        VALUES (%s, %s)
+        RETURNING run_id
+    """, (cutoff, RUNNING))
+    run_id = cur.fetchone()[0]
+    conn.commit()
+    cur.close()
+    return run_id
+
+
+def archive_batch(conn, run_id, cutoff, after, batch_size):
+    """
+    Archive the next batch_size candidates after the (uploaded_at, file_id)
+    position `after`; one transaction. The batch ends before the first file
+    whose job is still queued or running. Returns (files, rows, new position,
+    whether such a file stopped it).
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT file_id, uploaded_at, COALESCE(record_count, 0),
+               EXISTS (
+                   SELECT 1
+                   FROM ingestion_jobs j
+                   WHERE j.file_id = raw_files.file_id AND j.state IN (%s, %s)
+               )
+        FROM raw_files
+        WHERE is_archived = FALSE
+          AND uploaded_at < %s
+          AND (uploaded_at, file_id) > (%s, %s)
+        ORDER BY uploaded_at, file_id
+        LIMIT %s
+        FOR UPDATE OF raw_files
+    """, (jobs.QUEUED, jobs.RUNNING, cutoff, after[0], after[1], batch_size))
+    batch = []
+    blocked = False
+    for file_id, uploaded_at, records, active in cur.fetchall():
+        if active:
+            # its rows are still changing: archive it on a later run
+            blocked = True
+            break
+        batch.append((file_id, uploaded_at, records))
+
+    if not batch:
+        conn.commit()
+        cur.close()
+        return 0, 0, after, blocked
+
+    # rows leave log_entries for the cold segments
+    for file_id, _, _ in batch:
+        cold_store.freeze_file(conn, cur, file_id)
+
+    cur.execute("""
+        UPDATE raw_files
+        SET is_archived = TRUE
+        WHERE file_id = ANY(%s)
+    """, ([r[0] for r in batch],))
+
+    execute_values(cur, """
+        INSERT INTO archives (file_id, archived_on, total_records)
+        VALUES %s
+    """, [(file_id, records) for file_id, _, records in batch], template="(%s, NOW(), %s)")
+
+    last = batch[-1]
+    rows = sum(r[2] for r in batch)
+    cur.execute("""
+        UPDATE archiver_runs
+        SET watermark_uploaded_at = %s,
+            watermark_file_id = %s,
+            files_archived = files_archived + %s,
+            rows_archived = rows_archived + %s,
+            batches = batches + 1
+        WHERE run_id = %s
+    """, (last[1], last[0], len(batch), rows, run_id))
+    conn.commit()
+    cur.close()
+    return len(batch), rows, (last[1], last[0]), blocked
+
+
+def finish_run(conn, run_id, state, error=None):
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE archiver_runs
+        SET state = %s,
+            error_message = %s,
+            finished_at = NOW(),
+            duration_seconds = EXTRACT(EPOCH FROM (NOW() - started_at))
+        WHERE run_id = %s
+        RETURNING files_archived, rows_archived, duration_seconds
+    """, (state, error, run_id))
+    result = cur.fetchone()
+    conn.commit()
+    cur.close()
+    return result
+
+
+def run_once(conn, age_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    One archiver run; returns its run_id, or None when another archiver holds the lock.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT pg_try_advisory_lock(%s)", (ARCHIVER_LOCK_KEY,))
+    if not cur.fetchone()[0]:
+        conn.commit()
+        cur.close()
+        print("another archiver run is in progress")
+        return None
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=age_days)
+    position = last_watermark(cur)
+    conn.commit()
+
+    run_id = start_run(conn, cutoff)
+    try:
+        while True:
+            files, _, position, blocked = archive_batch(conn, run_id, cutoff, position, batch_size)
+            if blocked:
+                print(f"archiver run {run_id}: stopped at a file that is still being ingested")
+                break
+            if files < batch_size:
+                break
+        files, rows, seconds = finish_run(conn, run_id, DONE)
+        print(f"archiver run {run_id}: {files} files / {rows} log rows archived in {seconds}s")
+    except Exception as e:
+        conn.rollback()
+        finish_run(conn, run_id, FAILED, str(e))
+        print(f"archiver run {run_id} failed:", e)
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (ARCHIVER_LOCK_KEY,))
+        conn.commit()
+        cur.close()
+
+    return run_id
+
+
+def freeze_archived(conn, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    One-time backfill: files archived before the cold store existed still
+    have their rows in log_entries and no segment. Freezes them, one
+    transaction per file. Returns (files, rows).
+    """
+    files = rows = 0
+    after = 0
+    cur = conn.cursor()
+    while True:
+        cur.execute("""
+            SELECT rf.file_id
+            FROM raw_files rf
+            WHERE rf.is_archived = TRUE
+              AND rf.file_id > %s
+              AND EXISTS (SELECT 1 FROM log_entries le WHERE le.file_id = rf.file_id)
+            ORDER BY rf.file_id
+            LIMIT %s
+        """, (after, batch_size))
+        file_ids = [r[0] for r in cur.fetchall()]
+        conn.commit()
+        if not file_ids:
+            break
+
+        for file_id in file_ids:
+            # a restore may have won the race since the SELECT
+            cur.execute("SELECT is_archived FROM raw_files WHERE file_id = %s FOR UPDATE", (file_id,))
+            row = cur.fetchone()
+            if row and row[0]:
+                rows += cold_store.freeze_file(conn, cur, file_id)
+                files += 1
+            conn.commit()
+        after = file_ids[-1]
+        print(f"frozen {files} archived files / {rows} rows (up to file_id {after})")
+
+    cur.close()
+    return files, rows
+
+
+def recent_runs(cur, limit=20):
+    cur.execute("""
+        SELECT run_id, state, started_at, duration_seconds, files_archived,
+               rows_archived, batches, cutoff, watermark_uploaded_at, error_message
+        FROM archiver_runs
+        ORDER BY run_id DESC
+        LIMIT %s
+    """, (limit,))
+    return cur.fetchall()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Archive files older than ARCHIVE_AFTER_DAYS")
+    arg_parser.add_argument("--age-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    arg_parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    arg_parser.add_argument("--loop", action="store_true", help="run every --interval seconds")
+    arg_parser.add_argument("--interval", type=int, default=ARCHIVE_INTERVAL_SECONDS)
+    arg_parser.add_argument("--status", action="store_true")
+    arg_parser.add_argument(
+        "--freeze-archived", action="store_true",
+        help="move the rows of files archived before the cold store into segments"
+    )
+    args = arg_parser.parse_args()
+
+    conn = get_db_connection()
+
+    if args.freeze_archived:
+        files, rows = freeze_archived(conn, max(1, args.batch_size))
+        print(f"{files} archived files / {rows} rows moved to the cold store")
+        conn.close()
+        return
+
+    if args.status:
+        cur = conn.cursor()
+        for run_id, state, started_at, seconds, files, rows, batches, _, watermark, error in recent_runs(cur):
+            print(
+                f"run {run_id} {state:<8} {started_at:%Y-%m-%d %H:%M:%S}  {seconds or 0}s  "
+                f"{files} files / {rows} rows in {batches} batches  watermark {watermark}"
+                + (f"  error: {error}" if error else "")
+            )
+        cur.close()
+        conn.close()
+        return
+
+    while True:
+        run_once(conn, args.age_days, max(1, args.batch_size))
+        if not args.loop:
+            break
+        time.sleep(args.interval)
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Micro-benchmark: compiled category matcher vs the old any() keyword chains.
+
+    python benchmarks/bench_categories.py [--lines 200000] [--extra-rules 0]
+
+--extra-rules adds N synthetic keywords per category to both implementations
+to show how each one scales as teams add rules. Below REGEX_MIN_KEYWORDS
+the matcher uses the same scan as the old chains, so expect about 1.0x there.
+"""
+import argparse
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parser.detectors import CategoryMatcher, DEFAULT_RULES, default_rules, FALLBACK_CATEGORY
+
+SAMPLE_MESSAGES = [
+    "User admin logged in from 10.0.0.4",
+    "Invalid credentials for account ops-bot",
+    "Database connection failed after 3 retries",
+    "Payment service returned HTTP 502 for order 88123",
+    "Request completed in 182 ms",
+    "Cache warmed with 4096 entries",
+    "java.lang.NullPointerException at com.acme.billing.Invoice.total(Invoice.java:88)",
+    "Scheduled cleanup finished, 0 items removed",
+    "Pod checkout-7f9c restarted by kubelet",
+    "Report exported to s3://reports/2024/01/daily.csv",
+]
+
+
+def legacy_detector(groups):
+    """
+    The pre-matcher implementation: one any() scan per category, in priority order.
+    """
+    def detect(message):
+        if not message:
+            return FALLBACK_CATEGORY
+        msg = message.lower()
+        for category, keywords in groups:
+            if any(k in msg for k in keywords):
+                return category
+        return FALLBACK_CATEGORY
+    return detect
+
+
+def build_rules(extra_rules, rng):
+    groups = []
+    for category, (priority, keywords) in sorted(DEFAULT_RULES.items(), key=lambda r: r[1][0]):
+        extra = [
+            "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 12)))
+            for _ in range(extra_rules)
+        ]
+        groups.append((category, priority, list(keywords) + extra))
+    return groups
+
+
+def make_messages(count, rng):
+    words = "".join(SAMPLE_MESSAGES).lower().split()
+    messages = []
+    for i in range(count):
+        if i % 2:
+            messages.append(rng.choice(SAMPLE_MESSAGES))
+        else:
+            messages.append(" ".join(rng.choice(words) for _ in range(rng.randint(4, 16))))
+    return messages
+
+
+def measure(detect, messages):
+    start = time.perf_counter()
+    results = [detect(m) for m in messages]
+    elapsed = time.perf_counter() - start
+    return results, len(messages) / elapsed
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--lines", type=int, default=200000)
+    arg_parser.add_argument("--extra-rules", type=int, default=0)
+    arg_parser.add_argument("--seed", type=int, default=42)
+    args = arg_parser.parse_args()
+
+    rng = random.Random(args.seed)
+    groups = build_rules(args.extra_rules, rng)
+    messages = make_messages(args.lines, rng)
+
+    legacy = legacy_detector([(category, keywords) for category, _, keywords in groups])
+    matcher = CategoryMatcher([
+        (category, keyword, priority)
+        for category, priority, keywords in groups
+        for keyword in keywords
+    ] if args.extra_rules else default_rules())
+
+    old_results, old_rate = measure(legacy, messages)
+    new_results, new_rate = measure(matcher.match, messages)
+
+    if old_results != new_results:
+        print("WARNING: matcher and legacy detector disagree")
+
+    print(f"keywords:         {matcher.rules_count}")
+    print(f"lines:            {len(messages)}")
+    print(f"legacy any():     {old_rate:,.0f} lines/sec")
+    print(f"compiled matcher: {new_rate:,.0f} lines/sec ({new_rate / old_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
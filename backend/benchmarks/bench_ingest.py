@@ -0,0 +1,202 @@
+"""
+Ingestion benchmark: parser throughput and peak memory for every layout.
+
+    python benchmarks/bench_ingest.py [--lines 100000] [--layouts csv,xml] [--e2e]
+    python benchmarks/bench_ingest.py --save-baseline
+
+Each measurement runs in a fresh process so peak RSS belongs to that parser
+alone. "parse" times the parse_* generator over a file from
+generate_logs.py; "e2e" (--e2e, needs the database from .env) runs
+run_parser into log_entries and deletes the rows afterwards.
+
+Results are compared with benchmarks/baselines.json: a drop in lines/sec or
+a growth in peak RSS beyond --threshold is reported as a regression and the
+exit status is 1. Baselines only make sense on the machine that wrote them.
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import resource
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_logs import LAYOUTS, generate
+
+# imported directly so "parse" runs without the database driver
+PARSE_FUNCTIONS = {
+    "TXT": ("parser.text_parser", "parse_text"),
+    "CSV": ("parser.csv_parser", "parse_csv"),
+    "JSON": ("parser.json_parser", "parse_json"),
+    "XML": ("parser.xml_parser", "parse_xml"),
+}
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+
+def _peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak /= 1024
+    return round(peak / 1024, 1)
+
+
+def _parse_only(format_name, path, results):
+    module, name = PARSE_FUNCTIONS[format_name]
+    parser = getattr(importlib.import_module(module), name)
+    start = time.perf_counter()
+    with open(path, "rb") as stream:
+        lines = sum(1 for _ in parser(stream))
+    results.put((lines, time.perf_counter() - start, _peak_rss_mb()))
+
+
+def _end_to_end(format_name, path, results):
+    from db import get_db_connection
+    from parser.parser_runner import run_parser
+    import dimensions
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO raw_files (original_name, file_size_bytes, format_id)
+        VALUES (%s, %s, %s)
+        RETURNING file_id
+    """, (f"bench_{os.path.basename(path)}", os.path.getsize(path), dimensions.format_id(format_name)))
+    file_id = cur.fetchone()[0]
+    conn.commit()
+
+    try:
+        start = time.perf_counter()
+        with open(path, "rb") as stream:
+            stats = run_parser(file_id, stream)
+        elapsed = time.perf_counter() - start
+        results.put((stats["rows"], elapsed, _peak_rss_mb()))
+    finally:
+        cur.execute("DELETE FROM raw_files WHERE file_id = %s", (file_id,))
+        conn.commit()
+        cur.close()
+        conn.close()
+
+
+def measure(target, format_name, path):
+    """
+    Run target in a fresh process; returns {lines, seconds, lines_per_sec, peak_rss_mb}.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=target, args=(format_name, path, results))
+    proc.start()
+    while True:
+        try:
+            lines, seconds, peak = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if not proc.is_alive():
+                raise RuntimeError(f"{target.__name__} failed for {path} (exit code {proc.exitcode})")
+    proc.join()
+
+    return {
+        "lines": lines,
+        "seconds": round(seconds, 3),
+        "lines_per_sec": round(lines / seconds, 1) if seconds > 0 else 0.0,
+        "peak_rss_mb": peak,
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    List of human-readable regressions against the stored baseline.
+    """
+    regressions = []
+    for key, current in results.items():
+        base = baseline.get(key)
+        if not base:
+            continue
+        if current["lines_per_sec"] < base["lines_per_sec"] * (1 - threshold):
+            regressions.append(
+                f"{key}: {current['lines_per_sec']:,.0f} lines/sec vs baseline {base['lines_per_sec']:,.0f}"
+            )
+        if current["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            regressions.append(
+                f"{key}: peak RSS {current['peak_rss_mb']} MB vs baseline {base['peak_rss_mb']} MB"
+            )
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("--lines", type=int, default=100000)
+    arg_parser.add_argument("--seed", type=int, default=42)
+    arg_parser.add_argument("--layouts", default=",".join(LAYOUTS))
+    arg_parser.add_argument("--e2e", action="store_true", help="also run run_parser against the database")
+    arg_parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    arg_parser.add_argument("--save-baseline", action="store_true")
+    arg_parser.add_argument("--threshold", type=float, default=0.15)
+    args = arg_parser.parse_args()
+
+    layouts = [l for l in args.layouts.split(",") if l]
+    unknown = [l for l in layouts if l not in LAYOUTS]
+    if unknown:
+        arg_parser.error(f"unknown layouts: {', '.join(unknown)}")
+
+    stages = [("parse", _parse_only)]
+    if args.e2e:
+        stages.append(("e2e", _end_to_end))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for layout in layouts:
+            _, ext, format_name = LAYOUTS[layout]
+            path = generate(layout, os.path.join(tmp, f"{layout}.{ext}"), args.lines, args.seed)
+
+            for stage, target in stages:
+                key = f"{layout}:{stage}"
+                results[key] = measure(target, format_name, path)
+                r = results[key]
+                print(
+                    f"{key:<20} {r['lines']:>9} lines  {r['seconds']:>8}s  "
+                    f"{r['lines_per_sec']:>12,.0f} lines/sec  peak RSS {r['peak_rss_mb']} MB"
+                )
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({
+                "lines": args.lines,
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "results": results,
+            }, f, indent=2, sort_keys=True)
+        print(f"baseline written to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print("no baseline yet; run with --save-baseline to create one")
+        return
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    if baseline.get("lines") != args.lines:
+        print(f"note: baseline was recorded with --lines {baseline.get('lines')}")
+
+    regressions = compare(results, baseline.get("results", {}), args.threshold)
+    if regressions:
+        print(f"REGRESSIONS (threshold {args.threshold:.0%}):")
+        for line in regressions:
+            print("  " + line)
+        sys.exit(1)
+
+    print(f"no regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
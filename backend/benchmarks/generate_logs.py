@@ -0,0 +1,147 @@
+"""
+Deterministic synthetic log files for every layout the parsers accept.
+
+    python benchmarks/generate_logs.py LAYOUT OUTPUT [--lines 100000] [--seed 42]
+
+Layouts: text_space, text_pipe, csv, json_array, ndjson, xml.
+The same seed and line count always produce byte-identical files.
+"""
+import argparse
+import datetime
+import json
+import random
+from xml.sax.saxutils import escape
+
+SEVERITIES = ["DEBUG", "INFO", "INFO", "INFO", "WARN", "ERROR", "FATAL"]
+SERVICES = ["auth_service", "payment_service", "db_service", "file_service", "api.gateway", "scheduler"]
+MESSAGES = [
+    "User login success user_id={n}",
+    "Invalid credentials for account ops-{n}",
+    "Database connection failed after {n} retries",
+    "Payment service returned HTTP 502 for order {n}",
+    "Request completed in {n} ms",
+    "Cache warmed with {n} entries",
+    "File uploaded report_{n}.pdf",
+    "Pod checkout-{n} restarted by kubelet",
+]
+STACK_TRACE = [
+    "java.lang.NullPointerException: value was null",
+    "    at com.acme.billing.Invoice.total(Invoice.java:{n})",
+    "    at com.acme.billing.InvoiceService.close(InvoiceService.java:{n})",
+]
+# a stack trace follows roughly one ERROR line in STACK_TRACE_EVERY
+STACK_TRACE_EVERY = 4
+START = datetime.datetime(2024, 1, 1)
+
+
+def records(count, seed):
+    """
+    Yield (timestamp, severity, service, message, stack_trace_lines).
+    """
+    rng = random.Random(seed)
+    ts = START
+    for _ in range(count):
+        ts += datetime.timedelta(milliseconds=rng.randint(1, 2000))
+        severity = rng.choice(SEVERITIES)
+        n = rng.randint(1, 99999)
+        trace = []
+        if severity == "ERROR" and rng.randrange(STACK_TRACE_EVERY) == 0:
+            trace = [line.format(n=rng.randint(10, 999)) for line in STACK_TRACE]
+        yield ts, severity, rng.choice(SERVICES), rng.choice(MESSAGES).format(n=n), trace
+
+
+def write_text_space(out, count, seed):
+    for ts, severity, service, message, trace in records(count, seed):
+        out.write(f"{ts:%Y-%m-%d %H:%M:%S},{ts.microsecond // 1000:03d} {severity} {service} - {message}\n")
+        for line in trace:
+            out.write(line + "\n")
+
+
+def write_text_pipe(out, count, seed):
+    for ts, severity, service, message, trace in records(count, seed):
+        out.write(f"{ts:%Y-%m-%d %H:%M:%S},{ts.microsecond // 1000:03d} | {severity} | {message}\n")
+        for line in trace:
+            out.write(line + "\n")
+
+
+def write_csv(out, count, seed):
+    # columns the parser does not know about end up in attributes
+    out.write("timestamp,level,service,message,host,trace_id\n")
+    for i, (ts, severity, service, message, trace) in enumerate(records(count, seed)):
+        out.write(f"{ts.isoformat()},{severity},{service},\"{message}\",node-{i % 16},{i:012x}\n")
+
+
+def write_json_array(out, count, seed):
+    out.write("[\n")
+    for i, (ts, severity, service, message, trace) in enumerate(records(count, seed)):
+        if i:
+            out.write(",\n")
+        out.write(json.dumps({
+            "timestamp": ts.isoformat(),
+            "level": severity,
+            "service": service,
+            "message": "\n".join([message] + trace),
+            "request_id": i,
+        }))
+    out.write("\n]\n")
+
+
+def write_ndjson(out, count, seed):
+    for i, (ts, severity, service, message, trace) in enumerate(records(count, seed)):
+        out.write(json.dumps({
+            "timestamp": ts.isoformat(),
+            "level": severity,
+            "service": service,
+            "message": "\n".join([message] + trace),
+            "request_id": i,
+        }))
+        out.write("\n")
+
+
+def write_xml(out, count, seed):
+    out.write("<logs>\n")
+    for i, (ts, severity, service, message, trace) in enumerate(records(count, seed)):
+        out.write(
+            "    <log>\n"
+            f"        <timestamp>{ts.isoformat()}</timestamp>\n"
+            f"        <level>{severity}</level>\n"
+            f"        <service>{service}</service>\n"
+            f"        <message>{escape(message)}</message>\n"
+            f"        <request_id>{i}</request_id>\n"
+            "    </log>\n"
+        )
+    out.write("</logs>\n")
+
+
+# layout -> (writer, file extension, format_name used by run_parser)
+LAYOUTS = {
+    "text_space": (write_text_space, "txt", "TXT"),
+    "text_pipe": (write_text_pipe, "txt", "TXT"),
+    "csv": (write_csv, "csv", "CSV"),
+    "json_array": (write_json_array, "json", "JSON"),
+    "ndjson": (write_ndjson, "ndjson", "JSON"),
+    "xml": (write_xml, "xml", "XML"),
+}
+
+
+def generate(layout, path, count, seed=42):
+    writer = LAYOUTS[layout][0]
+    with open(path, "w", encoding="utf-8", newline="\n") as out:
+        writer(out, count, seed)
+    return path
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument("layout", choices=sorted(LAYOUTS))
+    arg_parser.add_argument("output")
+    arg_parser.add_argument("--lines", type=int, default=100000)
+    arg_parser.add_argument("--seed", type=int, default=42)
+    args = arg_parser.parse_args()
+
+    generate(args.layout, args.output, args.lines, args.seed)
+    print(f"wrote {args.lines} {args.layout} records to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
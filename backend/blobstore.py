@@ -0,0 +1,108 @@
+import gzip
+import mmap
+import os
+import shutil
+import uuid
+from contextlib import contextmanager, ExitStack
+
+from config import BLOB_STORE_DIR, BLOB_COMPRESSLEVEL
+from compression import decompressing_reader, CHUNK_SIZE, STREAM_COMPRESSIONS
+
+# Content-addressed store for the original bytes of every upload.
+# A blob is keyed by raw_files.content_sha256 and kept compressed at rest:
+# uploads that arrived as .gz / .bz2 / .xz are stored as they are, anything
+# else is gzipped. Identical content uploaded by several teams is stored once;
+# raw_files.blob_sha256 is the reference, raw_blobs the registry.
+
+
+def blob_path(sha256, codec):
+    # two levels of fan-out keep directories small
+    return os.path.join(BLOB_STORE_DIR, sha256[:2], sha256[2:4], f"{sha256}.{codec}")
+
+
+def _register(cur, sha256, codec, path):
+    cur.execute("""
+        INSERT INTO raw_blobs (sha256, codec, stored_bytes)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (sha256) DO NOTHING
+    """, (sha256, codec, os.path.getsize(path)))
+
+
+def _lookup(cur, sha256):
+    cur.execute("SELECT codec FROM raw_blobs WHERE sha256 = %s", (sha256,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def store_blob(cur, sha256, stream=None, path=None, codec=None):
+    """
+    Store content under sha256 unless it is already there.
+
+    Either pass an (uncompressed) binary stream, which is gzipped chunk by
+    chunk, or the path of a file already compressed with codec, which is
+    moved into the store as is. Returns the codec the blob is stored with.
+    """
+    existing = _lookup(cur, sha256)
+    if existing:
+        return existing
+
+    codec = codec if path is not None else "gz"
+    dest = blob_path(sha256, codec)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+
+    if not os.path.exists(dest):
+        tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+        try:
+            if path is not None:
+                shutil.move(path, tmp)
+            else:
+                with gzip.open(tmp, "wb", compresslevel=BLOB_COMPRESSLEVEL) as out:
+                    shutil.copyfileobj(stream, out, CHUNK_SIZE)
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    _register(cur, sha256, codec, dest)
+    return codec
+
+
+@contextmanager
+def open_blob(cur, sha256):
+    """
+    Memory-map a stored blob and yield a decompressing reader over the map.
+    The compressed bytes are read straight from the page cache; only the
+    decompressed chunks the parser asks for become Python objects.
+    """
+    codec = _lookup(cur, sha256)
+    if codec not in STREAM_COMPRESSIONS:
+        raise FileNotFoundError(f"No stored blob for {sha256}")
+
+    with ExitStack() as stack:
+        raw = stack.enter_context(open(blob_path(sha256, codec), "rb"))
+        mapped = stack.enter_context(mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ))
+        reader = decompressing_reader(mapped, codec)
+        stack.callback(reader.close)
+        yield reader
+
+
+def release_blob(cur, sha256):
+    """
+    Drop the registry row once no raw_files row references the blob.
+    Returns the path to unlink after the caller commits, or None.
+    """
+    cur.execute("""
+        DELETE FROM raw_blobs b
+        WHERE b.sha256 = %s
+          AND NOT EXISTS (SELECT 1 FROM raw_files rf WHERE rf.blob_sha256 = b.sha256)
+        RETURNING codec
+    """, (sha256,))
+    row = cur.fetchone()
+    return blob_path(sha256, row[0]) if row else None
+
+
+def remove_blob_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,395 @@
+import array
+import heapq
+import json
+import os
+import sys
+import uuid
+import zlib
+from datetime import datetime, timedelta, timezone
+
+from config import COLD_STORE_DIR, COLD_COMPRESSLEVEL
+from parser.bulk_loader import BulkLoader, LOG_ENTRY_COLUMNS
+from partitions import ensure_partition_for
+
+# Cold tier for archived files.
+# Archiving a file moves its log_entries rows into one segment file under
+# COLD_STORE_DIR (keyed by file_id) and deletes them from the hot table.
+# Segments are columnar: every column is zlib-compressed on its own, and the
+# header carries min / max timestamp and the distinct severity, category and
+# service ids (a zone map). A scan rejects a segment on its header alone and
+# otherwise inflates only the columns its predicates need. Text columns are
+# dictionary encoded - distinct values once plus a uint32 code per row - so
+# keyword and attribute predicates run once per distinct value.
+
+MAGIC = b"LVSEG1\n"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+# stands in for NULL in the integer columns
+NULL = -1
+# log_ids per DELETE when the frozen rows leave log_entries
+DELETE_BATCH_SIZE = 50000
+
+# column -> array typecode, "dict" for dictionary-encoded text
+COLUMNS = (
+    ("log_id", "q"),
+    ("log_timestamp", "q"),   # microseconds since the epoch
+    ("created_at", "q"),
+    ("severity_id", "h"),
+    ("category_id", "h"),
+    ("service_id", "i"),
+    ("template_id", "q"),
+    ("message_line", "dict"),
+    ("template_params", "dict"),
+    ("attributes", "dict"),
+)
+TYPECODES = dict(COLUMNS)
+TIMESTAMP_COLUMNS = ("log_timestamp", "created_at")
+
+RESTORE_COLUMNS = ("log_id", "created_at") + LOG_ENTRY_COLUMNS
+
+
+def segment_path(file_id):
+    return os.path.join(COLD_STORE_DIR, f"{file_id % 256:02x}", f"{file_id}.seg")
+
+
+def _micros(ts):
+    return NULL if ts is None else (ts - EPOCH) // ONE_MICROSECOND
+
+
+def _datetime(micros):
+    return None if micros == NULL else EPOCH + timedelta(microseconds=micros)
+
+
+class _Dictionary:
+    def __init__(self):
+        self.values = []
+        self.codes = array.array("I")
+        self._index = {}
+
+    def add(self, value):
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+
+# -------------------------
+# Writing
+# -------------------------
+def freeze_file(conn, cur, file_id):
+    """
+    Move file_id's log_entries rows into its segment; returns the row count.
+    The segment is on disk before the DELETE runs in cur's transaction, so a
+    failed commit leaves the rows in both places, never in neither. Only the
+    log_ids written to the segment are deleted: a row committed after the
+    read stays in log_entries. Callers lock the raw_files row and make sure
+    no ingest job for the file is active.
+    """
+    ints = {name: array.array(code) for name, code in COLUMNS if code != "dict"}
+    dicts = {name: _Dictionary() for name, code in COLUMNS if code == "dict"}
+
+    reader = conn.cursor(name=f"freeze_{file_id}")
+    reader.itersize = 10000
+    reader.execute("""
+        SELECT log_id, log_timestamp, created_at, severity_id, category_id,
+               service_id, template_id, message_line, template_params::text, attributes::text
+        FROM log_entries
+        WHERE file_id = %s
+        ORDER BY log_timestamp
+    """, (file_id,))
+
+    for row in reader:
+        for (name, code), value in zip(COLUMNS, row):
+            if code == "dict":
+                dicts[name].add(value)
+            elif name in TIMESTAMP_COLUMNS:
+                ints[name].append(_micros(value))
+            else:
+                ints[name].append(NULL if value is None else value)
+    reader.close()
+
+    rows = len(ints["log_id"])
+    if rows:
+        _write_segment(file_id, rows, ints, dicts)
+        log_ids = ints["log_id"]
+        for start in range(0, rows, DELETE_BATCH_SIZE):
+            cur.execute(
+                "DELETE FROM log_entries WHERE file_id = %s AND log_id = ANY(%s)",
+                (file_id, log_ids[start:start + DELETE_BATCH_SIZE].tolist())
+            )
+    return rows
+
+
+def _write_segment(file_id, rows, ints, dicts):
+    parts = []
+    for name, code in COLUMNS:
+        if code == "dict":
+            parts.append((f"{name}.values", json.dumps(dicts[name].values).encode("utf-8")))
+            parts.append((f"{name}.codes", dicts[name].codes.tobytes()))
+        else:
+            parts.append((name, ints[name].tobytes()))
+
+    timestamps = ints["log_timestamp"]
+    header = {
+        "file_id": file_id,
+        "rows": rows,
+        "byteorder": sys.byteorder,
+        # zone map; rows are stored in timestamp order
+        "min_ts": timestamps[0],
+        "max_ts": timestamps[-1],
+        "severity_ids": sorted(set(ints["severity_id"])),
+        "category_ids": sorted(set(ints["category_id"])),
+        "service_ids": sorted(set(ints["service_id"])),
+        "parts": {},
+    }
+
+    blobs = []
+    offset = 0
+    for name, raw in parts:
+        blob = zlib.compress(raw, COLD_COMPRESSLEVEL)
+        header["parts"][name] = [offset, len(blob)]
+        blobs.append(blob)
+        offset += len(blob)
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    dest = segment_path(file_id)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp = f"{dest}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(tmp, "wb") as out:
+            out.write(MAGIC)
+            out.write(len(header_bytes).to_bytes(4, "big"))
+            out.write(header_bytes)
+            for blob in blobs:
+                out.write(blob)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(tmp, dest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def remove_segment(file_id):
+    try:
+        os.remove(segment_path(file_id))
+    except FileNotFoundError:
+        pass
+
+
+# -------------------------
+# Reading
+# -------------------------
+class Segment:
+    def __init__(self, path):
+        self._file = open(path, "rb")
+        if self._file.read(len(MAGIC)) != MAGIC:
+            self._file.close()
+            raise ValueError(f"Not a log segment: {path}")
+        size = int.from_bytes(self._file.read(4), "big")
+        self.header = json.loads(self._file.read(size))
+        self._data_start = len(MAGIC) + 4 + size
+        self._cache = {}
+
+    def close(self):
+        self._file.close()
+
+    def _part(self, name):
+        offset, length = self.header["parts"][name]
+        self._file.seek(self._data_start + offset)
+        return zlib.decompress(self._file.read(length))
+
+    def ints(self, name):
+        if name not in self._cache:
+            values = array.array(TYPECODES[name])
+            values.frombytes(self._part(name))
+            if self.header["byteorder"] != sys.byteorder:
+                values.byteswap()
+            self._cache[name] = values
+        return self._cache[name]
+
+    def dictionary(self, name):
+        """
+        (distinct values, per-row codes)
+        """
+        if name not in self._cache:
+            codes = array.array("I")
+            codes.frombytes(self._part(f"{name}.codes"))
+            if self.header["byteorder"] != sys.byteorder:
+                codes.byteswap()
+            self._cache[name] = (json.loads(self._part(f"{name}.values")), codes)
+        return self._cache[name]
+
+    def may_match(self, filters):
+        """
+        Zone-map check: False when no row of the segment can pass filters.
+        """
+        h = self.header
+        if filters.get("start") is not None and h["max_ts"] < _micros(filters["start"]):
+            return False
+        if filters.get("end") is not None and h["min_ts"] >= _micros(filters["end"]):
+            return False
+        for name in ("severity_id", "category_id", "service_id"):
+            wanted = filters.get(name)
+            if wanted is not None and wanted not in h[f"{name}s"]:
+                return False
+        return True
+
+    def matching_rows(self, filters):
+        """
+        Indexes of the rows passing filters, cheapest predicates first.
+        """
+        rows = range(self.header["rows"])
+
+        if filters.get("start") is not None or filters.get("end") is not None:
+            ts = self.ints("log_timestamp")
+            low = _micros(filters["start"]) if filters.get("start") is not None else ts[0]
+            high = _micros(filters["end"]) if filters.get("end") is not None else ts[-1] + 1
+            rows = [i for i in rows if low <= ts[i] < high]
+
+        for name in ("severity_id", "category_id", "service_id"):
+            wanted = filters.get(name)
+            if wanted is not None and rows:
+                column = self.ints(name)
+                rows = [i for i in rows if column[i] == wanted]
+
+        # message test from search.parse_query
+        message_matches = filters.get("message")
+        if message_matches and rows:
+            values, codes = self.dictionary("message_line")
+            hits = {code for code, text in enumerate(values) if text is not None and message_matches(text)}
+            rows = [i for i in rows if codes[i] in hits]
+
+        attribute_filters = filters.get("attributes") or ()
+        if attribute_filters and rows:
+            values, codes = self.dictionary("attributes")
+            parsed = [json.loads(v) if v is not None else None for v in values]
+            for documents in attribute_filters:
+                patterns = [json.loads(d) for d in documents]
+                hits = {
+                    code for code, value in enumerate(parsed)
+                    if value is not None and any(_contains(value, p) for p in patterns)
+                }
+                rows = [i for i in rows if codes[i] in hits]
+
+        return rows
+
+    def row(self, i):
+        messages, message_codes = self.dictionary("message_line")
+        attributes, attribute_codes = self.dictionary("attributes")
+        attribute = attributes[attribute_codes[i]]
+        return {
+            "log_timestamp": _datetime(self.ints("log_timestamp")[i]),
+            "severity_id": _nullable(self.ints("severity_id")[i]),
+            "category_id": _nullable(self.ints("category_id")[i]),
+            "service_id": _nullable(self.ints("service_id")[i]),
+            "message_line": messages[message_codes[i]],
+            "attributes": json.loads(attribute) if attribute is not None else None,
+        }
+
+
+def _nullable(value):
+    return None if value == NULL else value
+
+
+def _contains(value, pattern):
+    # Python version of jsonb @>
+    if isinstance(pattern, dict):
+        return isinstance(value, dict) and all(
+            k in value and _contains(value[k], v) for k, v in pattern.items()
+        )
+    if isinstance(pattern, list):
+        return isinstance(value, list) and all(
+            any(_contains(item, p) for item in value) for p in pattern
+        )
+    if isinstance(pattern, bool) or isinstance(value, bool):
+        return value is pattern
+    return value == pattern
+
+
+def search(file_ids, filters, limit):
+    """
+    The newest `limit` archived rows of file_ids passing filters, newest
+    first, as (file_id, row dict). Segments are visited newest first and the
+    scan stops once no remaining segment can beat the rows already found.
+    """
+    segments = []
+    for file_id in file_ids:
+        path = segment_path(file_id)
+        if not os.path.exists(path):
+            continue
+        segment = Segment(path)
+        if segment.may_match(filters):
+            segments.append((file_id, segment))
+        else:
+            segment.close()
+    segments.sort(key=lambda s: s[1].header["max_ts"], reverse=True)
+
+    # min-heap of (timestamp, tie-break, file_id, row) holding the best `limit`
+    best = []
+    try:
+        for n, (file_id, segment) in enumerate(segments):
+            if len(best) >= limit and segment.header["max_ts"] <= best[0][0]:
+                break
+
+            rows = segment.matching_rows(filters)
+            ts = segment.ints("log_timestamp")
+            # rows are in timestamp order, so the newest are at the end
+            for i in reversed(rows[-limit:] if limit else []):
+                if len(best) >= limit and ts[i] <= best[0][0]:
+                    break
+                item = (ts[i], (n, i), file_id, segment.row(i))
+                if len(best) < limit:
+                    heapq.heappush(best, item)
+                else:
+                    heapq.heapreplace(best, item)
+    finally:
+        for _, segment in segments:
+            segment.close()
+
+    return [(file_id, row) for _, _, file_id, row in sorted(best, reverse=True)]
+
+
+# -------------------------
+# Restoring
+# -------------------------
+def thaw_file(conn, file_id, batch_size):
+    """
+    COPY file_id's segment back into log_entries in conn's transaction;
+    returns the row count. Remove the segment after the commit.
+    """
+    path = segment_path(file_id)
+    if not os.path.exists(path):
+        return 0
+
+    segment = Segment(path)
+    try:
+        columns = {name: segment.ints(name) for name, code in COLUMNS if code != "dict"}
+        dicts = {name: segment.dictionary(name) for name, code in COLUMNS if code == "dict"}
+        messages, message_codes = dicts["message_line"]
+        params, param_codes = dicts["template_params"]
+        attributes, attribute_codes = dicts["attributes"]
+
+        loader = BulkLoader(conn, batch_size, columns=RESTORE_COLUMNS)
+        for i in range(segment.header["rows"]):
+            ts = _datetime(columns["log_timestamp"][i])
+            ensure_partition_for(ts)
+            loader.add((
+                columns["log_id"][i],
+                _datetime(columns["created_at"][i]),
+                file_id,
+                ts,
+                _nullable(columns["severity_id"][i]),
+                _nullable(columns["category_id"][i]),
+                messages[message_codes[i]],
+                _nullable(columns["template_id"][i]),
+                params[param_codes[i]],
+                _nullable(columns["service_id"][i]),
+                attributes[attribute_codes[i]]
+            ))
+        loader.flush()
+    finally:
+        segment.close()
+
+    return loader.total_rows
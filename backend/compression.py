@@ -0,0 +1,120 @@
+import bz2
+import gzip
+import hashlib
+import lzma
+import os
+import zipfile
+from contextlib import contextmanager, ExitStack
+
+# Compressed uploads (rotated .log.gz files, zip bundles) are kept compressed
+# in the spool and decompressed as a stream while the parser reads them.
+# The gzip / bz2 / xz readers are seekable, so the sniffer and the parsers'
+# head peeks work on them unchanged.
+
+STREAM_COMPRESSIONS = {
+    "gz": gzip.open,
+    "bz2": bz2.open,
+    "xz": lzma.open,
+}
+ARCHIVE_COMPRESSIONS = {"zip"}
+
+COMPRESSED_EXTENSIONS = set(STREAM_COMPRESSIONS) | ARCHIVE_COMPRESSIONS
+
+# What a corrupt / truncated compressed file raises while being read
+DECOMPRESSION_ERRORS = (OSError, EOFError, lzma.LZMAError, zipfile.BadZipFile)
+
+CHUNK_SIZE = 1024 * 1024
+
+
+class DecompressionLimitExceeded(Exception):
+    """Raised when a stream decompresses to more bytes than allowed."""
+
+
+def split_compression(filename):
+    """
+    "app.log.gz" -> ("app.log", "gz"), "app.log" -> ("app.log", None)
+    """
+    if "." in filename:
+        inner, ext = filename.rsplit(".", 1)
+        if ext.lower() in COMPRESSED_EXTENSIONS:
+            return inner, ext.lower()
+    return filename, None
+
+
+def decompressing_reader(fileobj, compression):
+    """
+    Wrap a binary stream so reads return decompressed bytes.
+    """
+    opener = STREAM_COMPRESSIONS.get(compression)
+    if opener is None:
+        return fileobj
+    return opener(fileobj, "rb")
+
+
+def archive_members(fileobj):
+    """
+    Regular files inside a zip, skipping directories and macOS metadata.
+    """
+    with zipfile.ZipFile(fileobj) as archive:
+        return [
+            info for info in archive.infolist()
+            if not info.is_dir()
+            and not info.filename.startswith("__MACOSX/")
+            and not os.path.basename(info.filename).startswith(".")
+        ]
+
+
+def digest_stream(stream, max_bytes=None):
+    """
+    (sha256, size) of the decompressed bytes, read in chunks. Stops with
+    DecompressionLimitExceeded once more than max_bytes come out.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+        if max_bytes is not None and size > max_bytes:
+            raise DecompressionLimitExceeded(f"more than {max_bytes} bytes decompressed")
+    return digest.hexdigest(), size
+
+
+def uncompressed_size(stream):
+    """
+    Decompressed length of a stream the parser has (mostly) consumed.
+    gzip cannot seek from the end, so the rest is read through.
+    """
+    while stream.read(CHUNK_SIZE):
+        pass
+    return stream.tell()
+
+
+@contextmanager
+def open_member(fileobj, member_name):
+    """
+    One zip member as a decompressed, seekable stream (nested .gz etc. included).
+    """
+    with zipfile.ZipFile(fileobj) as archive, archive.open(member_name) as member:
+        reader = decompressing_reader(member, split_compression(member_name)[1])
+        try:
+            yield reader
+        finally:
+            reader.close()
+
+
+@contextmanager
+def open_payload(path, member_name=None):
+    """
+    Open a spooled upload for parsing: plain, single-stream compressed,
+    or one member of a zip archive.
+    """
+    with ExitStack() as stack:
+        raw = stack.enter_context(open(path, "rb"))
+        if member_name is not None:
+            yield stack.enter_context(open_member(raw, member_name))
+            return
+
+        reader = decompressing_reader(raw, split_compression(path)[1])
+        if reader is not raw:
+            stack.callback(reader.close)
+        yield reader
@@ -71,4 +71,100 @@ DB_SETTINGS = {
     "database": os.getenv("dbname") # psycopg2 uses 'database', not 'dbname' in kwargs
 }
 
-SECRET_KEY = os.getenv("SECRET_KEY")
\ No newline at end of file
+SECRET_KEY = os.getenv("SECRET_KEY")
+
+# -------------------------
+# Ingestion
+# -------------------------
+# Rows buffered before each COPY / execute_values flush into log_entries
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+
+# Seconds before the lookup-table cache (severities, categories, formats,
+# environments) is reloaded from the database
+DIMENSION_CACHE_TTL = int(os.getenv("DIMENSION_CACHE_TTL", "300"))
+# Seconds between checks of the cache version bumped by
+# /admin/dimensions/refresh, so every worker process picks up a refresh
+DIMENSION_VERSION_CHECK = int(os.getenv("DIMENSION_VERSION_CHECK", "10"))
+
+# Uploads are spooled here and parsed by ingest_worker.py processes.
+# When workers run on several nodes this must be shared storage (NFS, etc.)
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", os.path.join(UPLOAD_FOLDER, "spool"))
+# Worker processes started by ingest_worker.py on this node
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 2)))
+# Seconds an idle worker sleeps before polling the queue again
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "2"))
+# A RUNNING job without a heartbeat for this long is considered abandoned
+INGEST_JOB_STALE_SECONDS = int(os.getenv("INGEST_JOB_STALE_SECONDS", "600"))
+INGEST_JOB_MAX_ATTEMPTS = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", "3"))
+# Parsing is spread over all workers, but at most this many of them on a
+# node write a batch to the database at the same time. Every worker still
+# has its own connection; this limits concurrent writes, not connections.
+INGEST_CONCURRENT_WRITES = int(os.getenv("INGEST_CONCURRENT_WRITES", "4"))
+
+# Hard cap for one uploaded file, enforced while it is streamed to the spool
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(2 * 1024 * 1024 * 1024)))
+# Zip members and .gz / .bz2 / .xz uploads are decompressed (sniffed and
+# hashed) inside the upload request: caps on the decompressed bytes of one
+# upload and on its (or a member's) expansion ratio
+ZIP_MAX_UNCOMPRESSED_BYTES = int(os.getenv("ZIP_MAX_UNCOMPRESSED_BYTES", str(2 * 1024 * 1024 * 1024)))
+ZIP_MAX_RATIO = int(os.getenv("ZIP_MAX_RATIO", "100"))
+# Original bytes of every upload, content-addressed and compressed at rest
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(UPLOAD_FOLDER, "blobs"))
+BLOB_COMPRESSLEVEL = int(os.getenv("BLOB_COMPRESSLEVEL", "6"))
+# Record time per ingestion stage (decode, regex, timestamp, ...) in ingestion_profiles.
+# Off by default: the timing wrappers add about 30% to parse + categorize
+# time (2.1s -> 2.8s per 200k lines); turn on ("1") while investigating
+INGEST_PROFILE = os.getenv("INGEST_PROFILE", "0") == "1"
+# An XML upload that is not well-formed yields no records. With "1" the
+# <log> elements before the broken one are kept instead.
+XML_KEEP_PARTIAL = os.getenv("XML_KEEP_PARTIAL", "0") == "1"
+# Also record peak Python memory with tracemalloc (slows parsing noticeably)
+INGEST_TRACEMALLOC = os.getenv("INGEST_TRACEMALLOC", "0") == "1"
+# What to do when a team uploads bytes it already has:
+# "link" records the upload as a pointer to the existing file, "skip" drops it
+DUPLICATE_UPLOAD_POLICY = os.getenv("DUPLICATE_UPLOAD_POLICY", "link")
+
+# -------------------------
+# Template mining
+# -------------------------
+# Leading tokens used to route a message through the template tree
+TEMPLATE_TREE_DEPTH = int(os.getenv("TEMPLATE_TREE_DEPTH", "2"))
+# Share of tokens a message must have in common with a template to join it
+TEMPLATE_SIMILARITY = float(os.getenv("TEMPLATE_SIMILARITY", "0.4"))
+# Distinct tokens per tree node before further ones are routed to <*>
+TEMPLATE_MAX_CHILDREN = int(os.getenv("TEMPLATE_MAX_CHILDREN", "100"))
+
+# -------------------------
+# Re-categorization backfill (recategorize.py)
+# -------------------------
+# log_id range handled (and committed) per chunk
+RECATEGORIZE_CHUNK_SIZE = int(os.getenv("RECATEGORIZE_CHUNK_SIZE", "10000"))
+# changed rows sent per UPDATE ... FROM (VALUES ...) statement
+RECATEGORIZE_PAGE_SIZE = int(os.getenv("RECATEGORIZE_PAGE_SIZE", "1000"))
+
+# -------------------------
+# log_entries partitioning (partitions.py, migrate_partitions.py)
+# -------------------------
+# One partition per "month", "week" or "day" of log_timestamp
+LOG_PARTITION_INTERVAL = os.getenv("LOG_PARTITION_INTERVAL", "month")
+# Future partitions created ahead by the ingest workers / partitions.py
+LOG_PARTITIONS_AHEAD = int(os.getenv("LOG_PARTITIONS_AHEAD", "3"))
+# log_id range copied (and committed) per batch while migrating existing rows
+PARTITION_MIGRATE_BATCH_SIZE = int(os.getenv("PARTITION_MIGRATE_BATCH_SIZE", "20000"))
+
+# -------------------------
+# Archiver (archiver.py)
+# -------------------------
+# Files uploaded longer ago than this are archived
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+# Files archived (and committed) per batch; each one's rows move to a cold segment
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "50"))
+# Pause between runs with archiver.py --loop
+ARCHIVE_INTERVAL_SECONDS = int(os.getenv("ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# -------------------------
+# Cold tier (cold_store.py)
+# -------------------------
+# Columnar segments holding the log rows of archived files
+COLD_STORE_DIR = os.getenv("COLD_STORE_DIR", os.path.join(UPLOAD_FOLDER, "cold"))
+COLD_COMPRESSLEVEL = int(os.getenv("COLD_COMPRESSLEVEL", "6"))
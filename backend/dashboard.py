@@ -1,5 +1,8 @@
+from datetime import datetime, timedelta, timezone
+
 from flask import Blueprint, render_template, session, redirect, url_for, request
 from db import get_db_connection
+import dimensions
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
@@ -34,6 +37,8 @@ def dashboard():
     if scope not in ("TEAM", "MINE"):
         scope = "TEAM"
 
+    service = request.args.get("service")
+
     conn = get_db_connection()
     cur = conn.cursor()
 
@@ -68,16 +73,39 @@ def dashboard():
         if not team_ids:
             cur.close()
             conn.close()
-            return render_template("dashboard.html", admin=admin, days=days)
+            return render_template("dashboard.html", admin=admin, days=days, services=dimensions.service_names())
 
     # -------------------------
     # Base WHERE filters
     # -------------------------
+    # The window is on upload time, like the file cards below. The oldest
+    # log_timestamp of the files in it (raw_files.first_log_at) is added as
+    # a redundant bound, passed as a value, so the planner can skip the
+    # log_entries partitions before it. While a file in the window is being
+    # ingested or re-parsed its first_log_at is not final: no bound then.
+    since = datetime.now(timezone.utc) - timedelta(days=int(days))
+    cur.execute("""
+        SELECT MIN(rf.first_log_at),
+               BOOL_OR(EXISTS (
+                   SELECT 1
+                   FROM ingestion_jobs j
+                   WHERE j.file_id = rf.file_id AND j.state IN ('QUEUED', 'RUNNING')
+               ))
+        FROM raw_files rf
+        WHERE rf.team_id = ANY(%s)
+          AND rf.uploaded_at >= %s
+          AND rf.is_archived = FALSE
+    """, (team_ids, since))
+    first_log_at, unbounded = cur.fetchone()
+
     where_sql = """
     WHERE rf.team_id = ANY(%s)
-      AND rf.uploaded_at >= NOW() - (%s || ' days')::interval
+      AND rf.uploaded_at >= %s
     """
-    params = [team_ids, days]
+    params = [team_ids, since]
+    if first_log_at is not None and not unbounded:
+        where_sql += " AND le.log_timestamp >= %s"
+        params.append(first_log_at)
 
 
     # If user chooses "My uploads only"
@@ -85,6 +113,10 @@ def dashboard():
         where_sql += " AND rf.uploaded_by = %s"
         params.append(user_id)
 
+    if service:
+        where_sql += " AND le.service_id = (SELECT service_id FROM services WHERE service_name = %s)"
+        params.append(service)
+
     # -------------------------
     # 1) Total logs per day
     # -------------------------
@@ -115,31 +147,45 @@ def dashboard():
     # -------------------------
     # 3) Top error types
     # -------------------------
+    # grouped on the mined template, so messages differing only in ids /
+    # numbers count together
     cur.execute(f"""
-        SELECT le.message_line, COUNT(*) AS error_count
-        FROM log_entries le
-        JOIN raw_files rf ON le.file_id = rf.file_id
-        JOIN log_severities ls ON le.severity_id = ls.severity_id
-        {where_sql} AND rf.is_archived=FALSE
-          AND ls.severity_code IN ('ERROR', 'FATAL')
-        GROUP BY le.message_line
-        ORDER BY error_count DESC
-        LIMIT 5
+        SELECT lt.template_text, t.error_count
+        FROM (
+            SELECT le.template_id, COUNT(*) AS error_count
+            FROM log_entries le
+            JOIN raw_files rf ON le.file_id = rf.file_id
+            JOIN log_severities ls ON le.severity_id = ls.severity_id
+            {where_sql} AND rf.is_archived=FALSE
+              AND ls.severity_code IN ('ERROR', 'FATAL')
+              AND le.template_id IS NOT NULL
+            GROUP BY le.template_id
+            ORDER BY error_count DESC
+            LIMIT 5
+        ) t
+        JOIN log_templates lt ON lt.template_id = t.template_id
+        ORDER BY t.error_count DESC
     """, params)
     top_errors = cur.fetchall()
 
     # -------------------------
-    # 4) Most active systems (approx)
+    # 4) Most active systems
     # -------------------------
+    # counted per service_id, names joined on the five survivors only
     cur.execute(f"""
-        SELECT SUBSTRING(le.message_line FROM 1 FOR 40) AS system_key,
-               COUNT(*) AS total_logs
-        FROM log_entries le
-        JOIN raw_files rf ON le.file_id = rf.file_id
-        {where_sql} AND rf.is_archived=FALSE
-        GROUP BY system_key
-        ORDER BY total_logs DESC
-        LIMIT 5
+        SELECT s.service_name, t.total_logs
+        FROM (
+            SELECT le.service_id, COUNT(*) AS total_logs
+            FROM log_entries le
+            JOIN raw_files rf ON le.file_id = rf.file_id
+            {where_sql} AND rf.is_archived=FALSE
+              AND le.service_id IS NOT NULL
+            GROUP BY le.service_id
+            ORDER BY total_logs DESC
+            LIMIT 5
+        ) t
+        JOIN services s ON s.service_id = t.service_id
+        ORDER BY t.total_logs DESC
     """, params)
     most_active_systems = cur.fetchall()
 
@@ -148,9 +194,9 @@ def dashboard():
     # -------------------------
     file_where_sql = """
         WHERE rf.team_id = ANY(%s)
-          AND rf.uploaded_at >= NOW() - (%s || ' days')::interval
+          AND rf.uploaded_at >= %s
     """
-    file_params = [team_ids, days]
+    file_params = [team_ids, since]
 
     # If user chooses "My uploads only"
     if not admin and scope == "MINE":
@@ -260,6 +306,8 @@ def dashboard():
         admin=admin,
         days=days,
         scope=scope,
+        service=service,
+        services=dimensions.service_names(),
         all_teams=all_teams,
         selected_team_id=selected_team_id,
         logs_per_day=logs_per_day,
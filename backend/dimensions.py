@@ -0,0 +1,216 @@
+import threading
+import time
+from db import get_db_connection
+from config import DIMENSION_CACHE_TTL, DIMENSION_VERSION_CHECK
+
+# Process-wide cache of the small lookup tables
+# (log_severities, log_categories, file_formats, environments, services).
+# They hold a handful of rows each and almost never change, so they are
+# loaded once and served from dicts; the TTL / invalidate() make admin
+# changes visible without a restart.
+# The cache lives in each process (every gunicorn worker, every ingest
+# worker), so invalidate() bumps the dimension_cache_version sequence and
+# the other processes reload when they see it change, checked at most every
+# DIMENSION_VERSION_CHECK seconds.
+
+DEFAULT_SEVERITY = "INFO"
+DEFAULT_CATEGORY = "GENERAL"
+FALLBACK_CATEGORY = "UNCATEGORIZED"
+UNKNOWN_SERVICE = "unknown"
+SERVICE_NAME_MAX = 100
+
+# Level names other logging libraries use for our severity codes; every
+# parser's severity goes through severity_id, whatever the file format
+SEVERITY_ALIASES = {
+    "WARNING": "WARN",
+    "CRITICAL": "FATAL",
+    "ERR": "ERROR",
+    "TRACE": "DEBUG",
+}
+
+_lock = threading.Lock()
+_cache = None
+_loaded_at = 0.0
+_version = None
+_checked_at = 0.0
+
+
+def _current_version(cur):
+    cur.execute("SELECT last_value FROM dimension_cache_version")
+    return cur.fetchone()[0]
+
+
+def _load():
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    version = _current_version(cur)
+
+    cur.execute("SELECT severity_code, severity_id FROM log_severities ORDER BY severity_level")
+    severity_rows = cur.fetchall()
+
+    cur.execute("SELECT category_name, category_id FROM log_categories ORDER BY category_name")
+    category_rows = cur.fetchall()
+
+    cur.execute("SELECT format_name, format_id FROM file_formats ORDER BY format_id")
+    format_rows = cur.fetchall()
+
+    cur.execute("SELECT environment_id, environment_code FROM environments ORDER BY environment_id")
+    environment_rows = cur.fetchall()
+
+    cur.execute("SELECT service_name, service_id FROM services ORDER BY service_name")
+    service_rows = cur.fetchall()
+
+    cur.close()
+    conn.close()
+
+    return version, {
+        "severities": dict(severity_rows),
+        "categories": dict(category_rows),
+        "formats": dict(format_rows),
+        "environments": {code: env_id for env_id, code in environment_rows},
+        "services": dict(service_rows),
+        "severity_codes": [r[0] for r in severity_rows],
+        "category_names": [r[0] for r in category_rows],
+        "environment_list": environment_rows,
+        "service_names": [r[0] for r in service_rows],
+    }
+
+
+def _version_changed():
+    conn = get_db_connection()
+    cur = conn.cursor()
+    version = _current_version(cur)
+    cur.close()
+    conn.close()
+    return version != _version
+
+
+def get_dimensions():
+    global _cache, _loaded_at, _version, _checked_at
+
+    cache = _cache
+    now = time.monotonic()
+    if (
+        cache is not None
+        and now - _loaded_at < DIMENSION_CACHE_TTL
+        and now - _checked_at < DIMENSION_VERSION_CHECK
+    ):
+        return cache
+
+    with _lock:
+        # another thread may have refreshed while we waited
+        now = time.monotonic()
+        stale = _cache is None or now - _loaded_at >= DIMENSION_CACHE_TTL
+        if not stale and now - _checked_at >= DIMENSION_VERSION_CHECK:
+            stale = _version_changed()
+            _checked_at = now
+        if stale:
+            _version, _cache = _load()
+            _loaded_at = _checked_at = time.monotonic()
+        return _cache
+
+
+def invalidate():
+    """
+    Drop the cache here and, through the version, in every other process.
+    """
+    global _cache
+    conn = get_db_connection()
+    cur = conn.cursor()
+    # nextval is not transactional, no commit needed
+    cur.execute("SELECT nextval('dimension_cache_version')")
+    cur.close()
+    conn.close()
+
+    with _lock:
+        _cache = None
+
+
+# -------------------------
+# ID lookups
+# -------------------------
+def severity_id(code):
+    severities = get_dimensions()["severities"]
+    code = (code or "").strip().upper()
+    return severities.get(SEVERITY_ALIASES.get(code, code), severities.get(DEFAULT_SEVERITY))
+
+
+def category_id(name):
+    categories = get_dimensions()["categories"]
+    found = categories.get(name)
+    if found is not None:
+        return found
+    return categories.get(DEFAULT_CATEGORY, categories.get(FALLBACK_CATEGORY))
+
+
+def format_id(name):
+    return get_dimensions()["formats"].get(name)
+
+
+def environment_id(code):
+    return get_dimensions()["environments"].get(code)
+
+
+# -------------------------
+# Services (grow at ingest)
+# -------------------------
+# New service names show up with every upload, so ingestion inserts them
+# on first sight and keeps its own name -> id map instead of waiting for
+# the TTL reload.
+_service_ids = {}
+
+
+def service_id(cur, name):
+    """
+    services.service_id for name; a new name is inserted and committed at
+    once through cur, so cur must be on a connection of its own (not the
+    ingest transaction, which would hold the row lock until its batch commits).
+    """
+    name = (name or "").strip()[:SERVICE_NAME_MAX] or UNKNOWN_SERVICE
+    found = _service_ids.get(name)
+    if found is not None:
+        return found
+
+    found = get_dimensions()["services"].get(name)
+    if found is None:
+        cur.execute("""
+            INSERT INTO services (service_name)
+            VALUES (%s)
+            ON CONFLICT (service_name) DO NOTHING
+            RETURNING service_id
+        """, (name,))
+        row = cur.fetchone()
+        if row is None:
+            # inserted by another worker since our last reload
+            cur.execute("SELECT service_id FROM services WHERE service_name = %s", (name,))
+            row = cur.fetchone()
+        cur.connection.commit()
+        found = row[0]
+
+    _service_ids[name] = found
+    return found
+
+
+# -------------------------
+# Dropdown options for views
+# -------------------------
+def severity_codes():
+    return get_dimensions()["severity_codes"]
+
+
+def category_names():
+    return get_dimensions()["category_names"]
+
+
+def service_names():
+    return get_dimensions()["service_names"]
+
+
+def environment_codes():
+    return sorted(get_dimensions()["environments"])
+
+
+def environments():
+    """(environment_id, environment_code) pairs, as the upload form expects."""
+    return get_dimensions()["environment_list"]
@@ -1,8 +1,10 @@
-import os
 from flask import Blueprint, render_template, session, redirect, url_for, request, abort
 from db import get_db_connection
 from audit import log_audit
-from config import UPLOAD_FOLDER
+from blobstore import release_blob, remove_blob_file
+from jobs import enqueue_reparse, has_active_job
+from config import INGEST_BATCH_SIZE
+import cold_store
 
 files_bp = Blueprint("files", __name__)
 
@@ -32,7 +34,7 @@ def list_files():
     if admin:
         cur.execute("""
             SELECT rf.file_id, rf.original_name, rf.file_size_bytes, rf.uploaded_at,
-                   u.email, t.team_name, rf.is_archived
+                   u.email, t.team_name, rf.is_archived, rf.blob_sha256
             FROM raw_files rf
             JOIN users u ON rf.uploaded_by = u.user_id
             JOIN teams t ON rf.team_id = t.team_id
@@ -41,7 +43,7 @@ def list_files():
     else:
         cur.execute("""
             SELECT rf.file_id, rf.original_name, rf.file_size_bytes, rf.uploaded_at,
-                   u.email, t.team_name, rf.is_archived
+                   u.email, t.team_name, rf.is_archived, rf.blob_sha256
             FROM raw_files rf
             JOIN users u ON rf.uploaded_by = u.user_id
             JOIN teams t ON rf.team_id = t.team_id
@@ -70,7 +72,7 @@ def delete_file(file_id):
 
     # Fetch file info
     cur.execute("""
-        SELECT file_id, original_name, uploaded_by
+        SELECT file_id, original_name, uploaded_by, blob_sha256
         FROM raw_files
         WHERE file_id = %s
     """, (file_id,))
@@ -81,7 +83,7 @@ def delete_file(file_id):
         conn.close()
         abort(404, "File not found")
 
-    file_id_db, filename, uploaded_by = row
+    file_id_db, filename, uploaded_by, blob_sha256 = row
 
     # Permission check
     if not admin and uploaded_by != user_id:
@@ -89,15 +91,17 @@ def delete_file(file_id):
         conn.close()
         abort(403, "You can delete only your uploaded files")
 
-    # Delete file from disk
-    file_path = os.path.join(UPLOAD_FOLDER, filename)
-    if os.path.exists(file_path):
-        os.remove(file_path)
-
     # Delete from DB (log_entries will be deleted automatically because ON DELETE CASCADE)
     cur.execute("DELETE FROM raw_files WHERE file_id=%s", (file_id,))
+
+    # The stored original goes only when no other upload shares its content
+    blob_file = release_blob(cur, blob_sha256) if blob_sha256 else None
     conn.commit()
 
+    if blob_file:
+        remove_blob_file(blob_file)
+    cold_store.remove_segment(file_id)
+
     log_audit(f"Deleted file {filename}")
 
     cur.close()
@@ -105,6 +109,68 @@ def delete_file(file_id):
 
     return redirect(url_for("files.list_files"))
 
+@files_bp.route("/files/<int:file_id>/reparse", methods=["POST"])
+def reparse_file(file_id):
+    """
+    Queue the stored original for parsing again (e.g. after a parser fix);
+    the worker replaces the file's log_entries.
+    """
+    user_id = session.get("user_id")
+    if not user_id:
+        return redirect(url_for("auth.login"))
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    admin = is_admin_user(cur, user_id)
+
+    # the lock keeps a concurrent re-parse / archive out until the job is queued
+    cur.execute("""
+        SELECT original_name, uploaded_by, blob_sha256, is_archived
+        FROM raw_files
+        WHERE file_id = %s
+        FOR UPDATE
+    """, (file_id,))
+    row = cur.fetchone()
+
+    if not row:
+        cur.close()
+        conn.close()
+        abort(404, "File not found")
+
+    filename, uploaded_by, blob_sha256, is_archived = row
+
+    if not admin and uploaded_by != user_id:
+        cur.close()
+        conn.close()
+        abort(403, "You can re-parse only your uploaded files")
+
+    if not blob_sha256:
+        cur.close()
+        conn.close()
+        abort(400, "The original bytes of this file are not stored")
+
+    if is_archived:
+        cur.close()
+        conn.close()
+        abort(409, "The file is archived; restore it before re-parsing")
+
+    if has_active_job(cur, file_id):
+        cur.close()
+        conn.close()
+        abort(409, "The file is already queued for parsing")
+
+    enqueue_reparse(cur, file_id, blob_sha256)
+    conn.commit()
+
+    log_audit(f"Re-parse file {filename}")
+
+    cur.close()
+    conn.close()
+
+    return redirect(url_for("files.list_files"))
+
+
 @files_bp.route("/files/<int:file_id>/archive", methods=["POST"])
 def archive_file(file_id):
     user_id = session.get("user_id")
@@ -120,11 +186,12 @@ def archive_file(file_id):
         conn.close()
         abort(403, "Only admin can archive files")
 
-    # Fetch file info
+    # Fetch file info; the lock keeps a concurrent archive / restore out
     cur.execute("""
-        SELECT file_id, original_name, is_archived
+        SELECT file_id, original_name, is_archived, COALESCE(record_count, 0)
         FROM raw_files
         WHERE file_id = %s
+        FOR UPDATE
     """, (file_id,))
     row = cur.fetchone()
 
@@ -133,7 +200,8 @@ def archive_file(file_id):
         conn.close()
         abort(404, "File not found")
 
-    file_id_db, filename, is_archived = row
+    # total_records is the count stored at ingest
+    file_id_db, filename, is_archived, total_records = row
 
     # If already archived, do nothing
     if is_archived:
@@ -141,13 +209,14 @@ def archive_file(file_id):
         conn.close()
         return redirect(url_for("files.list_files"))
 
-    # Count total logs for that file
-    cur.execute("""
-        SELECT COUNT(*)
-        FROM log_entries
-        WHERE file_id = %s
-    """, (file_id,))
-    total_records = cur.fetchone()[0]
+    # Still being ingested / re-parsed: its rows are not final yet
+    if has_active_job(cur, file_id):
+        cur.close()
+        conn.close()
+        abort(409, "The file is still being ingested; archive it when its job has finished")
+
+    # Rows move to the file's cold segment and leave log_entries
+    cold_store.freeze_file(conn, cur, file_id)
 
     # Insert into archives table
     cur.execute("""
@@ -187,11 +256,13 @@ def restore_file(file_id):
         conn.close()
         abort(403, "Only admin can restore archived files")
 
-    # Check file exists
+    # Check file exists; the lock makes a second concurrent restore wait
+    # and then see is_archived = FALSE instead of copying the rows again
     cur.execute("""
-        SELECT file_id, original_name
+        SELECT file_id, original_name, is_archived
         FROM raw_files
         WHERE file_id = %s
+        FOR UPDATE
     """, (file_id,))
     row = cur.fetchone()
 
@@ -200,10 +271,19 @@ def restore_file(file_id):
         conn.close()
         abort(404, "File not found")
 
-    filename = row[1]
+    filename, is_archived = row[1], row[2]
+
+    # Not archived: its rows are already in log_entries
+    if not is_archived:
+        cur.close()
+        conn.close()
+        return redirect(url_for("files.list_files"))
 
     cur.execute("DELETE FROM archives WHERE file_id = %s", (file_id,))
 
+    # Rows come back from the cold segment with COPY
+    cold_store.thaw_file(conn, file_id, INGEST_BATCH_SIZE)
+
     # Restore file (unarchive)
     cur.execute("""
         UPDATE raw_files
@@ -212,6 +292,7 @@ def restore_file(file_id):
     """, (file_id,))
 
     conn.commit()
+    cold_store.remove_segment(file_id)
 
     log_audit(f"Restored file {filename}")
 
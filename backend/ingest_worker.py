@@ -0,0 +1,186 @@
+"""
+Background ingestion workers.
+
+    python ingest_worker.py [--workers N]
+
+Starts N processes that claim jobs from ingestion_jobs and run the parsers
+on the spooled upload, so the files of a multi-file upload are parsed in
+parallel. Each worker has its own database connection; at most
+INGEST_CONCURRENT_WRITES of them per node write a batch into log_entries at
+the same time. Any number of nodes can run this against the same
+database as long as they all see INGEST_SPOOL_DIR.
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+
+from db import get_db_connection
+from config import INGEST_WORKERS, INGEST_POLL_SECONDS, INGEST_CONCURRENT_WRITES
+from jobs import claim_job, update_progress, finish_job, fail_job, spool_in_use
+from compression import open_payload, split_compression, uncompressed_size, STREAM_COMPRESSIONS
+from blobstore import store_blob, open_blob
+from parser.parser_runner import run_parser
+
+
+def record_uncompressed_size(conn, file_id, size):
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE raw_files
+        SET file_size_bytes = %s
+        WHERE file_id = %s
+    """, (size, file_id))
+    conn.commit()
+    cur.close()
+
+
+def keep_original(conn, file_id, spool_path, archive_member):
+    """
+    Move the upload into the blob store so it can be re-parsed later.
+    Returns its sha256, or None when the file has no content hash.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT content_sha256 FROM raw_files WHERE file_id = %s", (file_id,))
+    row = cur.fetchone()
+    if not row or not row[0]:
+        cur.close()
+        return None
+
+    sha256 = row[0]
+    compression = split_compression(spool_path)[1]
+
+    if archive_member is not None:
+        with open_payload(spool_path, archive_member) as stream:
+            store_blob(cur, sha256, stream=stream)
+    elif compression in STREAM_COMPRESSIONS:
+        # already compressed: the spool file itself becomes the blob
+        store_blob(cur, sha256, path=spool_path, codec=compression)
+    else:
+        with open(spool_path, "rb") as stream:
+            store_blob(cur, sha256, stream=stream)
+
+    cur.execute("""
+        UPDATE raw_files
+        SET blob_sha256 = %s
+        WHERE file_id = %s
+    """, (sha256, file_id))
+    conn.commit()
+    cur.close()
+    return sha256
+
+
+def process_job(conn, job, write_slots=None):
+    job_id, file_id, spool_path, archive_member, blob_sha256, attempts = job
+    reparse = blob_sha256 is not None
+    stream_compressed = (
+        not reparse and archive_member is None
+        and split_compression(spool_path)[1] in STREAM_COMPRESSIONS
+    )
+
+    if not reparse:
+        # Stored before parsing: a file that fails to parse is the one
+        # most likely to be re-parsed after a fix
+        try:
+            stored = keep_original(conn, file_id, spool_path, archive_member)
+        except Exception as e:
+            conn.rollback()
+            stored = None
+            print(f"job {job_id}: could not store original of file_id={file_id}:", e)
+        # a .gz / .bz2 / .xz spool was moved into the store as it is
+        if stored and stream_compressed:
+            blob_sha256 = stored
+
+    cur = conn.cursor()
+    if blob_sha256:
+        # read the stored original through a memory map
+        payload = open_blob(cur, blob_sha256)
+    else:
+        # compressed spools are decompressed as the parser reads them
+        payload = open_payload(spool_path, archive_member)
+
+    with payload as stream:
+        stats = run_parser(
+            file_id,
+            stream,
+            on_progress=lambda rows: update_progress(conn, job_id, rows),
+            replace=attempts > 1 or reparse,
+            write_slot=write_slots
+        )
+
+        # .gz / .bz2 / .xz: the real size is only known after decompressing
+        if stream_compressed:
+            record_uncompressed_size(conn, file_id, uncompressed_size(stream))
+    cur.close()
+
+    finish_job(conn, job_id, stats)
+
+    if reparse:
+        return stats
+
+    # Parsed successfully: the spooled copy is no longer needed
+    # (a zip stays until its last member is done)
+    if not spool_in_use(conn, spool_path):
+        try:
+            os.remove(spool_path)
+        except OSError:
+            pass
+
+    return stats
+
+
+def worker_loop(stop_event, write_slots):
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    # the parent handles Ctrl+C and tells us through stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    conn = get_db_connection()
+    print(f"[{worker_id}] ingestion worker started")
+
+    while not stop_event.is_set():
+        job = claim_job(conn, worker_id)
+        if not job:
+            stop_event.wait(INGEST_POLL_SECONDS)
+            continue
+
+        job_id = job[0]
+        print(f"[{worker_id}] claimed job {job_id} (file_id={job[1]})")
+
+        try:
+            stats = process_job(conn, job, write_slots)
+            print(f"[{worker_id}] job {job_id} done: {stats['rows']} rows, {stats['rows_per_sec']} rows/sec")
+        except Exception as e:
+            print(f"[{worker_id}] job {job_id} failed:", e)
+            fail_job(conn, job_id, str(e))
+
+    conn.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Run background log ingestion workers")
+    arg_parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    arg_parser.add_argument("--concurrent-writes", type=int, default=INGEST_CONCURRENT_WRITES)
+    args = arg_parser.parse_args()
+
+    stop_event = multiprocessing.Event()
+    write_slots = multiprocessing.BoundedSemaphore(max(1, args.concurrent_writes))
+
+    def shutdown(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    processes = [
+        multiprocessing.Process(target=worker_loop, args=(stop_event, write_slots), daemon=True)
+        for _ in range(max(1, args.workers))
+    ]
+    for p in processes:
+        p.start()
+
+    for p in processes:
+        p.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import os
+
+from config import INGEST_JOB_STALE_SECONDS, INGEST_JOB_MAX_ATTEMPTS
+
+# Postgres-backed ingestion queue.
+# Upload inserts a QUEUED row; ingest_worker.py processes (on any node
+# pointing at the same database) claim rows with FOR UPDATE SKIP LOCKED,
+# so two workers never pick the same job and nobody blocks on a lock.
+
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+DONE = "DONE"
+FAILED = "FAILED"
+
+
+def enqueue_job(cur, file_id, spool_path, archive_member=None):
+    """
+    Uses the caller's cursor so the job is committed together with its raw_files row.
+    archive_member names the file inside a spooled zip that this job parses.
+    """
+    cur.execute("""
+        INSERT INTO ingestion_jobs (file_id, spool_path, archive_member, state)
+        VALUES (%s, %s, %s, %s)
+        RETURNING job_id
+    """, (file_id, spool_path, archive_member, QUEUED))
+    return cur.fetchone()[0]
+
+
+def enqueue_reparse(cur, file_id, blob_sha256):
+    """
+    Parse a stored upload again from the blob store (no spool file involved).
+    """
+    cur.execute("""
+        INSERT INTO ingestion_jobs (file_id, blob_sha256, state)
+        VALUES (%s, %s, %s)
+        RETURNING job_id
+    """, (file_id, blob_sha256, QUEUED))
+    return cur.fetchone()[0]
+
+
+def claim_job(conn, worker_id):
+    """
+    Claim the oldest queued job, or a RUNNING job whose worker stopped
+    sending heartbeats.
+    Returns (job_id, file_id, spool_path, archive_member, blob_sha256, attempts) or None.
+    """
+    expire_stale_jobs(conn)
+
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE ingestion_jobs
+        SET state = %s,
+            worker_id = %s,
+            attempts = attempts + 1,
+            rows_ingested = 0,
+            error = NULL,
+            started_at = NOW(),
+            heartbeat_at = NOW()
+        WHERE job_id = (
+            SELECT job_id
+            FROM ingestion_jobs
+            WHERE (state = %s
+                   OR (state = %s AND heartbeat_at < NOW() - (%s || ' seconds')::interval))
+              AND attempts < %s
+            ORDER BY job_id
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING job_id, file_id, spool_path, archive_member, blob_sha256, attempts
+    """, (RUNNING, worker_id, QUEUED, RUNNING, INGEST_JOB_STALE_SECONDS, INGEST_JOB_MAX_ATTEMPTS))
+    job = cur.fetchone()
+    conn.commit()
+    cur.close()
+    return job
+
+
+def update_progress(conn, job_id, rows_ingested):
+    # doubles as the heartbeat
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE ingestion_jobs
+        SET rows_ingested = %s, heartbeat_at = NOW()
+        WHERE job_id = %s
+    """, (rows_ingested, job_id))
+    conn.commit()
+    cur.close()
+
+
+def finish_job(conn, job_id, stats):
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE ingestion_jobs
+        SET state = %s,
+            rows_ingested = %s,
+            rows_per_sec = %s,
+            finished_at = NOW(),
+            heartbeat_at = NOW()
+        WHERE job_id = %s
+    """, (DONE, stats["rows"], stats["rows_per_sec"], job_id))
+    conn.commit()
+    cur.close()
+
+
+def spool_in_use(conn, spool_path):
+    """
+    True while another job still has to read this spool file (zip members share one).
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT 1
+        FROM ingestion_jobs
+        WHERE spool_path = %s AND state IN (%s, %s)
+        LIMIT 1
+    """, (spool_path, QUEUED, RUNNING))
+    in_use = cur.fetchone() is not None
+    cur.close()
+    return in_use
+
+
+def has_active_job(cur, file_id):
+    """
+    True while a job for file_id is queued or running (its rows are still changing).
+    """
+    cur.execute("""
+        SELECT 1
+        FROM ingestion_jobs
+        WHERE file_id = %s AND state IN (%s, %s)
+        LIMIT 1
+    """, (file_id, QUEUED, RUNNING))
+    return cur.fetchone() is not None
+
+
+def _release_failed(conn, cur, failed):
+    """
+    Clean up after jobs that just became FAILED; failed holds their
+    (file_id, spool_path) pairs. Commits.
+    """
+    for file_id, _ in failed:
+        # a file whose first ingest failed is no duplicate target: uploading
+        # the same bytes again (e.g. after a parser fix) parses them anew. A
+        # failed re-parse leaves the hash of a file that was ingested before.
+        cur.execute("""
+            UPDATE raw_files
+            SET content_sha256 = NULL
+            WHERE file_id = %s
+              AND NOT EXISTS (
+                  SELECT 1 FROM ingestion_jobs
+                  WHERE file_id = %s AND state = %s
+              )
+        """, (file_id, file_id, DONE))
+    conn.commit()
+
+    # the spool goes once no other job (zip member) still reads it
+    for _, spool_path in failed:
+        if spool_path and not spool_in_use(conn, spool_path):
+            try:
+                os.remove(spool_path)
+            except OSError:
+                pass
+
+
+def fail_job(conn, job_id, error):
+    conn.rollback()
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE ingestion_jobs
+        SET state = %s, error = %s, finished_at = NOW()
+        WHERE job_id = %s
+        RETURNING file_id, spool_path
+    """, (FAILED, error, job_id))
+    _release_failed(conn, cur, cur.fetchall())
+    cur.close()
+
+
+def expire_stale_jobs(conn):
+    """
+    RUNNING jobs whose worker stopped sending heartbeats on their last
+    attempt: claim_job will not take them again, so they become FAILED.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE ingestion_jobs
+        SET state = %s,
+            error = 'worker stopped responding on the last attempt',
+            finished_at = NOW()
+        WHERE state = %s
+          AND heartbeat_at < NOW() - (%s || ' seconds')::interval
+          AND attempts >= %s
+        RETURNING file_id, spool_path
+    """, (FAILED, RUNNING, INGEST_JOB_STALE_SECONDS, INGEST_JOB_MAX_ATTEMPTS))
+    failed = cur.fetchall()
+    # the worker died before run_parser could drop its committed batches
+    for file_id, _ in failed:
+        cur.execute("DELETE FROM log_entries WHERE file_id = %s", (file_id,))
+    _release_failed(conn, cur, failed)
+    cur.close()
+
+
+JOB_COLUMNS = """
+    j.job_id,
+    j.file_id,
+    rf.original_name,
+    rf.uploaded_by,
+    j.state,
+    j.rows_ingested,
+    j.rows_per_sec,
+    j.error,
+    j.attempts,
+    j.created_at,
+    j.started_at,
+    j.finished_at,
+    EXTRACT(EPOCH FROM (COALESCE(j.finished_at, NOW()) - j.started_at))
+"""
+
+
+def _job_dict(row):
+    (job_id, file_id, filename, uploaded_by, state, rows, rows_per_sec,
+     error, attempts, created_at, started_at, finished_at, elapsed) = row
+
+    elapsed = float(elapsed) if elapsed is not None else None
+    if rows_per_sec is None and elapsed:
+        # still running: live throughput
+        rows_per_sec = round(rows / elapsed, 1)
+
+    return {
+        "job_id": job_id,
+        "file_id": file_id,
+        "file_name": filename,
+        "uploaded_by": uploaded_by,
+        "state": state,
+        "rows_ingested": rows,
+        "rows_per_sec": float(rows_per_sec) if rows_per_sec is not None else None,
+        "elapsed_seconds": round(elapsed, 3) if elapsed is not None else None,
+        "error": error,
+        "attempts": attempts,
+        "created_at": created_at.isoformat() if created_at else None,
+        "started_at": started_at.isoformat() if started_at else None,
+        "finished_at": finished_at.isoformat() if finished_at else None,
+    }
+
+
+def get_job(cur, job_id):
+    cur.execute(f"""
+        SELECT {JOB_COLUMNS}
+        FROM ingestion_jobs j
+        JOIN raw_files rf ON j.file_id = rf.file_id
+        WHERE j.job_id = %s
+    """, (job_id,))
+    row = cur.fetchone()
+    return _job_dict(row) if row else None
+
+
+def get_jobs(cur, job_ids):
+    cur.execute(f"""
+        SELECT {JOB_COLUMNS}
+        FROM ingestion_jobs j
+        JOIN raw_files rf ON j.file_id = rf.file_id
+        WHERE j.job_id = ANY(%s)
+        ORDER BY j.job_id
+    """, (list(job_ids),))
+    return [_job_dict(row) for row in cur.fetchall()]
+
+
+def summarize_jobs(jobs):
+    """
+    Totals for one multi-file upload.
+    """
+    finished = [j for j in jobs if j["state"] in (DONE, FAILED)]
+    return {
+        "files": len(jobs),
+        "done": sum(1 for j in jobs if j["state"] == DONE),
+        "failed": sum(1 for j in jobs if j["state"] == FAILED),
+        "pending": len(jobs) - len(finished),
+        "rows_ingested": sum(j["rows_ingested"] or 0 for j in jobs),
+    }
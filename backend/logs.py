@@ -1,10 +1,141 @@
-from flask import Blueprint, render_template, request, session, redirect, url_for
+import json
+import math
+from datetime import datetime, timedelta, timezone
+
+from flask import Blueprint, render_template, request, session, redirect, url_for, abort
+from psycopg2 import errors
 from db import get_db_connection
 from audit import log_audit
 from permissions import require_permission
+import dimensions
+import cold_store
+import search
 
 logs_bp = Blueprint("logs", __name__)
 
+ATTRIBUTE_PREFIX = "attr."
+
+
+def _attribute_documents(path, value):
+    """
+    JSONB documents matching attributes.<path> == value. "42" is also tried
+    as the number 42 (JSON uploads keep their types, CSV / XML store text).
+    NaN / Infinity are left as text, jsonb has no such numbers.
+    """
+    candidates = [value]
+    try:
+        typed = json.loads(value)
+        if isinstance(typed, (bool, int)) or (isinstance(typed, float) and math.isfinite(typed)):
+            candidates.append(typed)
+    except ValueError:
+        pass
+
+    documents = []
+    for candidate in candidates:
+        # attr.user.id=7 -> {"user": {"id": 7}}
+        doc = candidate
+        for key in reversed(path.split(".")):
+            doc = {key: doc}
+        documents.append(json.dumps(doc))
+    return documents
+
+
+def day_start(value, name):
+    """
+    Midnight UTC of a YYYY-MM-DD filter value; 400 for anything else. The
+    log_entries query and the cold segments both use these bounds.
+    """
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    except ValueError:
+        abort(400, f"{name} must be a date (YYYY-MM-DD)")
+
+
+def attribute_filters(args, keyword):
+    """
+    Pull attr.key=value terms out of the keyword box and the query string.
+    Returns (remaining keyword, [(key, documents), ...]).
+    """
+    terms = [(k, v) for k, v in args.items() if k.startswith(ATTRIBUTE_PREFIX) and v]
+
+    words = []
+    for word in keyword.split():
+        key, sep, value = word.partition("=")
+        if sep and key.startswith(ATTRIBUTE_PREFIX) and len(key) > len(ATTRIBUTE_PREFIX) and value:
+            terms.append((key, value))
+        else:
+            words.append(word)
+
+    filters = [
+        (key[len(ATTRIBUTE_PREFIX):], _attribute_documents(key[len(ATTRIBUTE_PREFIX):], value))
+        for key, value in terms
+    ]
+    return " ".join(words), filters
+
+def archived_logs(cur, team_ids, uploaded_by, environment, filters, limit):
+    """
+    Newest `limit` rows of archived files from the cold segments, shaped
+    like the /logs query rows. filters are the cold_store.search filters
+    with severity / category / service still given by name.
+    """
+    query = """
+        SELECT rf.file_id, rf.original_name, rf.uploaded_by, e.environment_code
+        FROM raw_files rf
+        JOIN environments e ON rf.environment_id = e.environment_id
+        WHERE rf.team_id = ANY(%s) AND rf.is_archived = TRUE
+    """
+    params = [team_ids]
+    if uploaded_by:
+        query += " AND rf.uploaded_by = %s"
+        params.append(uploaded_by)
+    if environment:
+        query += " AND e.environment_code = %s"
+        params.append(environment)
+    cur.execute(query, params)
+    files = {row[0]: row[1:] for row in cur.fetchall()}
+    if not files:
+        return []
+
+    # names -> ids the segments store; an unknown name matches nothing
+    dims = dimensions.get_dimensions()
+    filters = dict(filters)
+    if filters.get("severity"):
+        filters["severity_id"] = dims["severities"].get(filters["severity"], -2)
+    if filters.get("category"):
+        filters["category_id"] = dims["categories"].get(filters["category"], -2)
+    if filters.get("service"):
+        cur.execute("SELECT service_id FROM services WHERE service_name = %s", (filters["service"],))
+        row = cur.fetchone()
+        filters["service_id"] = row[0] if row else -2
+
+    found = cold_store.search(files, filters, limit)
+
+    severity_codes = {v: k for k, v in dims["severities"].items()}
+    category_names = {v: k for k, v in dims["categories"].items()}
+    service_ids = list({r["service_id"] for _, r in found if r["service_id"] is not None})
+    service_names = {}
+    if service_ids:
+        cur.execute("SELECT service_id, service_name FROM services WHERE service_id = ANY(%s)", (service_ids,))
+        service_names = dict(cur.fetchall())
+
+    rows = []
+    for file_id, r in found:
+        original_name, owner, environment_code = files[file_id]
+        rows.append((
+            r["log_timestamp"],
+            severity_codes.get(r["severity_id"]),
+            category_names.get(r["category_id"]),
+            environment_code,
+            r["message_line"],
+            original_name,
+            owner,
+            service_names.get(r["service_id"]),
+            r["attributes"],
+            True
+        ))
+    return rows
+
+
 @logs_bp.route("/logs", methods=["GET"])
 @require_permission("VIEW_LOG")
 def view_logs():
@@ -16,12 +147,27 @@ def view_logs():
     # Read filters
     # -----------------------
     keyword = request.args.get("q", "").strip()
+    search_text, attr_filters = attribute_filters(request.args, keyword)
+    text_query = search.parse_query(search_text)
     severity = request.args.get("severity")
     category = request.args.get("category")
     environment = request.args.get("environment")
+    service = request.args.get("service")
 
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
+    # [start_at, end_before) in UTC days
+    start_at = day_start(start_date, "start_date") if start_date else None
+    end_before = day_start(end_date, "end_date") + timedelta(days=1) if end_date else None
+
+    # also search the cold segments of archived files
+    archive_requested = request.args.get("archive") == "1"
+    include_archive = archive_requested
+    search_warning = None
+    if include_archive and text_query and text_query.matches is None:
+        # a regex Python's re could spend minutes on: the cold tier is skipped
+        search_warning = text_query.warning
+        include_archive = False
 
     # User scope filter (TEAM / MINE)
     scope = request.args.get("scope", "TEAM")
@@ -83,10 +229,14 @@ def view_logs():
             e.environment_code,
             le.message_line,
             rf.original_name,
-            rf.uploaded_by
+            rf.uploaded_by,
+            s.service_name,
+            le.attributes,
+            FALSE AS archived
         FROM log_entries le
         JOIN log_severities ls ON le.severity_id = ls.severity_id
         JOIN log_categories lc ON le.category_id = lc.category_id
+        LEFT JOIN services s ON le.service_id = s.service_id
         JOIN raw_files rf ON le.file_id = rf.file_id
         JOIN environments e ON rf.environment_id = e.environment_id
         WHERE rf.team_id = ANY(%s) AND rf.is_archived=FALSE
@@ -103,9 +253,16 @@ def view_logs():
     # -----------------------
     # Apply filters
     # -----------------------
-    if keyword:
-        query += " AND le.message_line ILIKE %s"
-        params.append(f"%{keyword}%")
+    # word / phrase / prefix terms go to the tsvector index, substrings and
+    # /regex/ to the trigram index (see search.py)
+    if text_query:
+        query += " AND " + text_query.sql
+        params.extend(text_query.params)
+
+    # @> containment is answered by idx_log_entries_attributes
+    for _, documents in attr_filters:
+        query += " AND (" + " OR ".join(["le.attributes @> %s::jsonb"] * len(documents)) + ")"
+        params.extend(documents)
 
     if severity:
         query += " AND ls.severity_code = %s"
@@ -119,34 +276,68 @@ def view_logs():
         query += " AND e.environment_code = %s"
         params.append(environment)
 
-    if start_date:
-        query += " AND DATE(le.log_timestamp) >= %s"
-        params.append(start_date)
+    if service:
+        # resolved once, then idx_log_entries_service_time does the rest
+        query += " AND le.service_id = (SELECT service_id FROM services WHERE service_name = %s)"
+        params.append(service)
+
+    # bare comparisons on log_timestamp (not DATE(...)) so the planner can
+    # prune log_entries partitions and use idx_log_entries_time
+    if start_at:
+        query += " AND le.log_timestamp >= %s"
+        params.append(start_at)
 
-    if end_date:
-        query += " AND DATE(le.log_timestamp) <= %s"
-        params.append(end_date)
+    if end_before:
+        query += " AND le.log_timestamp < %s"
+        params.append(end_before)
 
     query += """
         ORDER BY le.log_timestamp DESC
         LIMIT %s OFFSET %s
     """
-    params.extend([limit, offset])
 
-    cur.execute(query, params)
-    logs = cur.fetchall()
+    # /regex/ is checked with Python's re, whose syntax is not PostgreSQL's
+    # ((?P<name>...) passes one and not the other): report, don't fail
+    try:
+        if not include_archive:
+            params.extend([limit, offset])
+            cur.execute(query, params)
+            logs = cur.fetchall()
+        else:
+            # both sides return their newest offset + limit rows, merged here
+            params.extend([offset + limit, 0])
+            cur.execute(query, params)
+            hot = cur.fetchall()
+
+            cold = archived_logs(
+                cur,
+                team_ids,
+                user_id if not is_admin and scope == "MINE" else None,
+                environment,
+                {
+                    "start": start_at,
+                    "end": end_before,
+                    "severity": severity,
+                    "category": category,
+                    "service": service,
+                    "message": text_query.matches if text_query else None,
+                    "attributes": [documents for _, documents in attr_filters],
+                },
+                offset + limit
+            )
+            logs = sorted(hot + cold, key=lambda r: r[0], reverse=True)[offset:offset + limit]
+    except errors.InvalidRegularExpression as e:
+        conn.rollback()
+        logs = []
+        search_warning = f"Invalid pattern: {e.diag.message_primary}"
 
     # -----------------------
     # Filter dropdown options
     # -----------------------
-    cur.execute("SELECT severity_code FROM log_severities ORDER BY severity_level")
-    severities = [r[0] for r in cur.fetchall()]
-
-    cur.execute("SELECT category_name FROM log_categories ORDER BY category_name")
-    categories = [r[0] for r in cur.fetchall()]
-
-    cur.execute("SELECT environment_code FROM environments ORDER BY environment_code")
-    environments = [r[0] for r in cur.fetchall()]
+    severities = dimensions.severity_codes()
+    categories = dimensions.category_names()
+    environments = dimensions.environment_codes()
+    services = dimensions.service_names()
 
     # log_audit("VIEW_LOGS", "log_entries", None, f"scope={scope}, q={keyword}")
 
@@ -159,6 +350,7 @@ def view_logs():
         severities=severities,
         categories=categories,
         environments=environments,
+        services=services,
         page=page,
         admin=is_admin,
         all_teams=all_teams,
@@ -167,7 +359,10 @@ def view_logs():
         severity=severity,
         category=category,
         environment=environment,
+        service=service,
         start_date=start_date,
+        include_archive=archive_requested,
+        search_warning=search_warning,
         scope=scope,
         end_date=end_date
     )   
@@ -0,0 +1,230 @@
+"""
+Move log_entries onto a table partitioned by log_timestamp.
+
+    python migrate_partitions.py [--batch-size 20000]
+    python migrate_partitions.py --status
+    python migrate_partitions.py --drop-old
+
+Runs while the app and the ingest workers keep writing:
+
+1. prepare  - log_entries_new is created PARTITION BY RANGE (log_timestamp)
+              with partitions for the existing time span, and a trigger on
+              log_entries mirrors every later INSERT / UPDATE / DELETE into it.
+2. copy     - existing rows are copied in log_id batches, one transaction
+              per batch. The batch rows are read FOR SHARE, so a concurrent
+              UPDATE / DELETE waits for that batch only and is then mirrored.
+              An interrupted copy resumes from partition_migration.copied_up_to.
+3. swap     - one short ACCESS EXCLUSIVE lock renames log_entries to
+              log_entries_unpartitioned and log_entries_new to log_entries.
+
+The old table is kept until --drop-old. Needs PostgreSQL 12 or newer.
+"""
+import argparse
+import datetime
+import time
+
+from db import get_db_connection
+from config import PARTITION_MIGRATE_BATCH_SIZE, LOG_PARTITIONS_AHEAD
+import partitions
+from search import SEARCH_INDEXES
+
+OLD = "log_entries"
+NEW = "log_entries_new"
+RETIRED = "log_entries_unpartitioned"
+
+# index name -> definition; created on NEW as <name>_new and renamed at the swap
+INDEXES = {
+    "idx_log_entries_file": "(file_id)",
+    "idx_log_entries_time": "(log_timestamp)",
+    "idx_log_entries_template": "(template_id)",
+    "idx_log_entries_service_time": "(service_id, log_timestamp)",
+    "idx_log_entries_attributes": "USING GIN (attributes jsonb_path_ops)",
+    **SEARCH_INDEXES,
+}
+
+
+def prepare(conn):
+    cur = conn.cursor()
+
+    # partitioned copy; LIKE keeps column order, NOT NULLs and the log_id sequence
+    cur.execute(f"CREATE TABLE {NEW} (LIKE {OLD} INCLUDING DEFAULTS) PARTITION BY RANGE (log_timestamp)")
+    # the partition key has to be part of the primary key
+    cur.execute(f"ALTER TABLE {NEW} ADD CONSTRAINT {NEW}_pkey PRIMARY KEY (log_id, log_timestamp)")
+    cur.execute(f"""
+        ALTER TABLE {NEW}
+        ADD FOREIGN KEY (file_id) REFERENCES raw_files(file_id) ON DELETE CASCADE,
+        ADD FOREIGN KEY (severity_id) REFERENCES log_severities(severity_id),
+        ADD FOREIGN KEY (category_id) REFERENCES log_categories(category_id),
+        ADD FOREIGN KEY (template_id) REFERENCES log_templates(template_id),
+        ADD FOREIGN KEY (service_id) REFERENCES services(service_id)
+    """)
+    for name, definition in INDEXES.items():
+        cur.execute(f"CREATE INDEX {name}_new ON {NEW} {definition}")
+    cur.execute(f"CREATE TABLE {partitions.DEFAULT_PARTITION} PARTITION OF {NEW} DEFAULT")
+
+    # one pass over the old table for the time span to pre-create
+    cur.execute(f"SELECT MIN(log_timestamp)::date, MAX(log_timestamp)::date FROM {OLD}")
+    first_day, last_day = cur.fetchone()
+    if first_day is not None:
+        partitions.create_range(cur, first_day, last_day, parent=NEW)
+
+    # ahead of today as well, so new uploads do not land in the default partition
+    start, end = partitions.partition_range(datetime.date.today())
+    for _ in range(LOG_PARTITIONS_AHEAD + 1):
+        partitions.create_partition(cur, start, end, parent=NEW)
+        start, end = partitions.partition_range(end)
+
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION log_entries_mirror()
+        RETURNS TRIGGER AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM {NEW}
+                WHERE log_id = OLD.log_id AND log_timestamp = OLD.log_timestamp;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO {NEW} VALUES (NEW.*);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """)
+    # waits for running writers; every write after this point is mirrored,
+    # so the rows to copy are exactly log_id <= max_log_id read below
+    cur.execute(f"""
+        CREATE TRIGGER trg_log_entries_mirror
+        AFTER INSERT OR UPDATE OR DELETE ON {OLD}
+        FOR EACH ROW EXECUTE FUNCTION log_entries_mirror()
+    """)
+    cur.execute(f"SELECT COALESCE(MIN(log_id), 1) - 1, COALESCE(MAX(log_id), 0) FROM {OLD}")
+    copied_up_to, max_log_id = cur.fetchone()
+
+    cur.execute("""
+        INSERT INTO partition_migration (copied_up_to, max_log_id, state)
+        VALUES (%s, %s, 'COPYING')
+    """, (copied_up_to, max_log_id))
+    conn.commit()
+    cur.close()
+
+
+def migration_state(conn):
+    cur = conn.cursor()
+    cur.execute("SELECT copied_up_to, max_log_id, state FROM partition_migration")
+    row = cur.fetchone()
+    conn.commit()
+    cur.close()
+    return row
+
+
+def copy_batch(conn, start_after, batch_size):
+    """
+    Copy log_id in (start_after, start_after + batch_size]; one transaction.
+    """
+    end = start_after + batch_size
+    cur = conn.cursor()
+    cur.execute(f"""
+        WITH batch AS (
+            SELECT *
+            FROM {OLD}
+            WHERE log_id > %s AND log_id <= %s
+            FOR SHARE
+        )
+        INSERT INTO {NEW}
+        SELECT * FROM batch
+        ON CONFLICT DO NOTHING
+    """, (start_after, end))
+    copied = cur.rowcount
+    cur.execute("UPDATE partition_migration SET copied_up_to = %s", (end,))
+    conn.commit()
+    cur.close()
+    return end, copied
+
+
+def swap(conn):
+    cur = conn.cursor()
+    cur.execute("SET LOCAL lock_timeout = '10s'")
+    cur.execute(f"LOCK TABLE {OLD} IN ACCESS EXCLUSIVE MODE")
+    cur.execute(f"DROP TRIGGER trg_log_entries_mirror ON {OLD}")
+    cur.execute("DROP FUNCTION log_entries_mirror()")
+
+    cur.execute(f"ALTER TABLE {OLD} RENAME TO {RETIRED}")
+    cur.execute(f"ALTER INDEX {OLD}_pkey RENAME TO {RETIRED}_pkey")
+    for name in INDEXES:
+        cur.execute(f"ALTER INDEX IF EXISTS {name} RENAME TO {name}_unpartitioned")
+        cur.execute(f"ALTER INDEX {name}_new RENAME TO {name}")
+
+    cur.execute(f"ALTER TABLE {NEW} RENAME TO {OLD}")
+    cur.execute(f"ALTER TABLE {OLD} RENAME CONSTRAINT {NEW}_pkey TO {OLD}_pkey")
+    # keep the sequence when the old table is dropped
+    cur.execute("ALTER SEQUENCE log_entries_log_id_seq OWNED BY log_entries.log_id")
+    cur.execute("UPDATE partition_migration SET state = 'DONE', finished_at = NOW()")
+    conn.commit()
+    cur.close()
+
+
+def drop_old(conn):
+    cur = conn.cursor()
+    cur.execute(f"DROP TABLE IF EXISTS {RETIRED}")
+    conn.commit()
+    cur.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Partition log_entries by log_timestamp")
+    arg_parser.add_argument("--batch-size", type=int, default=PARTITION_MIGRATE_BATCH_SIZE)
+    arg_parser.add_argument("--status", action="store_true")
+    arg_parser.add_argument("--drop-old", action="store_true")
+    args = arg_parser.parse_args()
+
+    conn = get_db_connection()
+    state = migration_state(conn)
+
+    if args.status:
+        if state:
+            copied_up_to, max_log_id, phase = state
+            print(f"{phase}: copied up to log_id {min(copied_up_to, max_log_id)} of {max_log_id}")
+        else:
+            print("not started")
+        conn.close()
+        return
+
+    if args.drop_old:
+        if not state or state[2] != "DONE":
+            print("migration not finished; keeping the old table")
+        else:
+            drop_old(conn)
+            print(f"{RETIRED} dropped")
+        conn.close()
+        return
+
+    if state and state[2] == "DONE":
+        print("log_entries is already partitioned")
+        conn.close()
+        return
+
+    if not state:
+        prepare(conn)
+        state = migration_state(conn)
+        print(f"{NEW} prepared; copying log_id up to {state[1]}")
+
+    copied_up_to, max_log_id, _ = state
+    batch_size = max(1, args.batch_size)
+    total = 0
+    started = time.perf_counter()
+
+    while copied_up_to < max_log_id:
+        copied_up_to, copied = copy_batch(conn, copied_up_to, batch_size)
+        total += copied
+        elapsed = time.perf_counter() - started
+        print(
+            f"copied up to log_id {min(copied_up_to, max_log_id)} of {max_log_id} "
+            f"({total} rows, {round(total / elapsed, 1) if elapsed > 0 else 0} rows/sec)"
+        )
+
+    swap(conn)
+    print(f"log_entries is partitioned; the old table is kept as {RETIRED} (drop it with --drop-old)")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
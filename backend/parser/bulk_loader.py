@@ -0,0 +1,141 @@
+import io
+import time
+from contextlib import nullcontext
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+LOG_ENTRY_COLUMNS = (
+    "file_id", "log_timestamp", "severity_id", "category_id", "message_line",
+    "template_id", "template_params", "service_id", "attributes"
+)
+
+
+def _copy_value(value):
+    """
+    Render one value for COPY ... FROM STDIN (text format).
+    """
+    if value is None:
+        return "\\N"
+
+    text = str(value)
+    # Postgres TEXT cannot hold NUL bytes, INSERT would have failed on them too
+    if "\x00" in text:
+        text = text.replace("\x00", "")
+
+    return (
+        text.replace("\\", "\\\\")
+            .replace("\t", "\\t")
+            .replace("\n", "\\n")
+            .replace("\r", "\\r")
+    )
+
+
+class BulkLoader:
+    """
+    Buffers log_entries rows and writes them in bounded batches.
+
+    COPY FROM STDIN is used first; if the server / driver refuses it the
+    loader switches to execute_values for the rest of the run.
+    """
+
+    def __init__(self, conn, batch_size, columns=LOG_ENTRY_COLUMNS, table="log_entries",
+                 commit_each_batch=False, on_flush=None, write_slot=None):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.commit_each_batch = commit_each_batch
+        self.on_flush = on_flush
+        # shared semaphore bounding how many processes write at once
+        self.write_slot = write_slot if write_slot is not None else nullcontext()
+        self.columns = columns
+        self.table = table
+        self.use_copy = True
+
+        self.rows = []
+        self.total_rows = 0
+        self.batches = 0
+        self.write_seconds = 0.0
+        self.started_at = time.perf_counter()
+
+    def add(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return 0
+
+        with self.write_slot:
+            start = time.perf_counter()
+            self._write()
+            self.write_seconds += time.perf_counter() - start
+
+        written = len(self.rows)
+        self.total_rows += written
+        self.batches += 1
+        self.rows = []
+
+        if self.on_flush:
+            self.on_flush(self.total_rows)
+        return written
+
+    def _write(self):
+        cur = self.conn.cursor()
+        try:
+            if self.use_copy:
+                cur.execute("SAVEPOINT bulk_copy")
+                try:
+                    self._copy(cur)
+                    cur.execute("RELEASE SAVEPOINT bulk_copy")
+                except (psycopg2.NotSupportedError, psycopg2.ProgrammingError, AttributeError) as e:
+                    # COPY not available (proxy, permissions, driver) -> fallback
+                    print("COPY unavailable, falling back to execute_values:", e)
+                    cur.execute("ROLLBACK TO SAVEPOINT bulk_copy")
+                    self.use_copy = False
+
+            if not self.use_copy:
+                self._execute_values(cur)
+        finally:
+            cur.close()
+
+        if self.commit_each_batch:
+            self.conn.commit()
+
+    def _copy(self, cur):
+        buf = io.StringIO()
+        for row in self.rows:
+            buf.write("\t".join(_copy_value(v) for v in row))
+            buf.write("\n")
+        buf.seek(0)
+
+        cur.copy_expert(
+            f"COPY {self.table} ({', '.join(self.columns)}) FROM STDIN",
+            buf
+        )
+
+    def _execute_values(self, cur):
+        execute_values(
+            cur,
+            f"INSERT INTO {self.table} ({', '.join(self.columns)}) VALUES %s",
+            self.rows,
+            page_size=self.batch_size
+        )
+
+    def discard(self):
+        """
+        Forget the buffered rows and the count; the caller removed what was written.
+        """
+        self.rows = []
+        self.total_rows = 0
+
+    def stats(self):
+        elapsed = time.perf_counter() - self.started_at
+        return {
+            "rows": self.total_rows,
+            "batches": self.batches,
+            "seconds": round(elapsed, 3),
+            "write_seconds": round(self.write_seconds, 3),
+            "rows_per_sec": round(self.total_rows / elapsed, 1) if elapsed > 0 else 0.0,
+            "method": "COPY" if self.use_copy else "execute_values"
+        }
@@ -1,50 +1,64 @@
 import csv
-from datetime import datetime
 import io
+from . import timestamps
+from .sniffer import SNIFF_BYTES, sniff_csv_dialect
+from .profiler import NULL_PROFILE
 
-def parse_csv(file_stream):
-    logs = []
-    text_stream = io.TextIOWrapper(file_stream, encoding="utf-8", errors="ignore")
-    reader = csv.DictReader(text_stream)
+_END = object()
 
-    if not reader.fieldnames:
-        return logs
+def parse_csv(file_stream, profile=NULL_PROFILE):
+    """
+    Yield one log dict per CSV row. The delimiter (, ; tab |) is sniffed
+    from the first few KB; non-core columns become the record's attributes.
+    """
+    parse_timestamp = profile.timed("timestamp", timestamps.parse_timestamp)
 
-    reader.fieldnames = [h.lower() for h in reader.fieldnames]
+    # Sniff the dialect from the head, then rewind for the real read
+    pos = file_stream.tell()
+    head = file_stream.read(SNIFF_BYTES)
+    file_stream.seek(pos)
+    dialect = sniff_csv_dialect(head.decode("utf-8", errors="ignore")) or csv.excel
 
-    for row in reader:
-        try:
-            ts = row.get("timestamp")
-            if not ts:
-                continue
+    text_stream = io.TextIOWrapper(file_stream, encoding="utf-8", errors="ignore")
+    try:
+        # cells beyond the header are kept as a list under "extra_columns"
+        reader = csv.DictReader(text_stream, dialect=dialect, restkey="extra_columns")
 
-            try:
-                timestamp = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S,%f")
-            except ValueError:
-                timestamp = datetime.strptime(ts, "%Y-%m-%d %H:%M:%S")
+        if not reader.fieldnames:
+            return
 
-            severity = row.get("level", "INFO").upper()
-            service = row.get("service", "unknown")
-            message = row.get("message", "")
+        reader.fieldnames = [h.strip().lower() for h in reader.fieldnames]
 
-            extras = []
-            for k, v in row.items():
-                if k not in ("timestamp", "level", "service", "message", "thread"):
-                    if v:
-                        extras.append(f"{k}={v}")
+        # "decode" covers reading, utf-8 decoding and CSV splitting of a row
+        for row in iter(profile.timed("decode", reader.__next__), _END):
+            try:
+                ts = row.get("timestamp")
+                if not ts:
+                    continue
 
-            if extras:
-                message += " | " + " ".join(extras)
+                timestamp = parse_timestamp(ts)
 
-            logs.append({
-                "timestamp": timestamp,
-                "severity": severity,
-                "service": service,
-                "message": message
-            })
+                severity = row.get("level", "INFO").upper()
+                service = row.get("service", "unknown")
+                message = row.get("message", "")
 
-        except Exception as e:
-            print("CSV error:", e)
+                attributes = {}
+                for k, v in row.items():
+                    if k not in ("timestamp", "level", "service", "message", "thread"):
+                        if v:
+                            attributes[k] = v
 
-    return logs
+                yield {
+                    "timestamp": timestamp,
+                    "severity": severity,
+                    "service": service,
+                    "message": message,
+                    "attributes": attributes or None
+                }
 
+            except Exception as e:
+                print("CSV error:", e)
+    finally:
+        # the caller owns file_stream (ingest_worker reads it to the end
+        # for the uncompressed size); a collected wrapper would close it
+        text_stream.detach()
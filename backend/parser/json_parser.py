@@ -1,50 +1,228 @@
 import json
-from datetime import datetime
+from . import timestamps
+from .profiler import NULL_PROFILE
 import io
 
-def parse_json(file_stream):
-    logs = []
+CHUNK_SIZE = 64 * 1024
+WHITESPACE = " \t\r\n"
+# Longest single value (in characters) read ahead while waiting for it to
+# end; a document that does not close a value within this is malformed
+MAX_VALUE_CHARS = 32 * 1024 * 1024
+# A decode error this close to the end of the buffer may just be a value cut
+# by the read ("tru", "\u00"); further in, the document itself is broken
+CUT_SLACK = 16
 
-    # Wrap bytes stream → text stream for json
-    text_stream = io.TextIOWrapper(file_stream, encoding="utf-8", errors="ignore")
+_decoder = json.JSONDecoder()
+_END = object()
+
+
+class MalformedJSON(Exception):
+    """
+    The array / object stream is not valid JSON. Records were already
+    yielded, so the caller drops them: a broken file yields no records, as
+    before streaming. (NDJSON skips bad lines instead.)
+    """
+
+
+def _to_record(entry, parse_timestamp):
+    if not isinstance(entry, dict):
+        return None
+
+    timestamp_str = entry.get("timestamp")
+    if not timestamp_str:
+        return None
+
+    timestamp = parse_timestamp(timestamp_str)
+    severity = entry.get("level", "INFO").upper()
+    service = entry.get("service", "unknown")
+    message = entry.get("message", "")
+
+    # nested objects / arrays are kept as they are
+    attributes = {
+        key: value
+        for key, value in entry.items()
+        if key not in ("timestamp", "level", "service", "message", "thread") and value is not None
+    }
+
+    return {
+        "timestamp": timestamp,
+        "severity": severity,
+        "service": service,
+        "message": message,
+        "attributes": attributes or None
+    }
 
-    try:
-        data = json.load(text_stream)
-    except Exception:
-        return logs
 
-    # Expecting a list of log objects
-    if not isinstance(data, list):
-        return logs
+def _iter_values(text_stream, buf, pos, in_array):
+    """
+    Decode JSON values one at a time from a chunked text stream.
+
+    in_array=True walks the elements of a top-level array (buf[pos] is just
+    past the opening '['); otherwise values are whitespace separated, which
+    covers concatenated / pretty-printed objects. Only the unread tail of the
+    buffer is kept, so memory is bounded by the largest single value, and
+    at most MAX_VALUE_CHARS are read ahead. A syntax error or an unfinished
+    value raises MalformedJSON.
+    """
+    eof = False
+    read_size = CHUNK_SIZE
+
+    while True:
+        # skip separators
+        while pos < len(buf) and (buf[pos] in WHITESPACE or (in_array and buf[pos] == ",")):
+            pos += 1
+
+        if pos >= len(buf):
+            more = None if eof else text_stream.read(read_size)
+            if not more:
+                if in_array:
+                    raise MalformedJSON("array is not closed")
+                return
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+
+        if in_array and buf[pos] == "]":
+            return
 
-    for entry in data:
         try:
-            timestamp_str = entry.get("timestamp")
-            if not timestamp_str:
-                continue
+            value, end = _decoder.raw_decode(buf, pos)
+        except json.JSONDecodeError as e:
+            if e.pos + CUT_SLACK < len(buf) and not e.msg.startswith("Unterminated string"):
+                raise MalformedJSON(str(e)) from e
+            value, end, error = None, -1, e
+
+        # value cut by the buffer edge (a number may even decode short): read more
+        if (end == -1 or end == len(buf)) and not eof:
+            if len(buf) - pos > MAX_VALUE_CHARS:
+                raise MalformedJSON(f"no value ends within {MAX_VALUE_CHARS} characters")
+            more = text_stream.read(read_size)
+            if more:
+                buf = buf[pos:] + more
+                pos = 0
+                # grow reads geometrically so a huge value is not re-decoded O(n) times
+                read_size = min(max(CHUNK_SIZE, len(buf)), MAX_VALUE_CHARS)
+            else:
+                eof = True
+            continue
+
+        if end == -1:
+            # truncated document
+            raise MalformedJSON(str(error))
+
+        read_size = CHUNK_SIZE
+        yield value
+        pos = end
 
-            timestamp = datetime.fromisoformat(timestamp_str)
-            severity = entry.get("level", "INFO").upper()
-            service = entry.get("service", "unknown")
-            message = entry.get("message", "")
+        if pos > CHUNK_SIZE:
+            buf = buf[pos:]
+            pos = 0
 
-            extra_fields = []
-            for key, value in entry.items():
-                if key not in ("timestamp", "level", "service", "message", "thread"):
-                    if value is not None:
-                        extra_fields.append(f"{key}={value}")
 
-            if extra_fields:
-                message = message + " | " + " ".join(extra_fields)
+def _iter_lines(text_stream, buf):
+    pos = 0
+    while True:
+        nl = buf.find("\n", pos)
+        if nl == -1:
+            more = text_stream.read(CHUNK_SIZE)
+            if not more:
+                if pos < len(buf):
+                    yield buf[pos:]
+                return
+            buf = buf[pos:] + more
+            pos = 0
+            continue
+
+        yield buf[pos:nl]
+        pos = nl + 1
 
-            logs.append({
-                "timestamp": timestamp,
-                "severity": severity,
-                "service": service,
-                "message": message
-            })
 
-        except Exception:
+def _iter_ndjson(text_stream, buf):
+    for line in _iter_lines(text_stream, buf):
+        line = line.strip()
+        if not line:
             continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # truncated / garbage line from a shipper: skip it
+            continue
+
+
+def _detect_mode(text_stream):
+    """
+    Look at the start of the document and pick a reader:
+    ARRAY  - one top-level [ ... ] array
+    NDJSON - one object per line (JSON Lines)
+    STREAM - concatenated / pretty-printed objects
+    """
+    buf = text_stream.read(CHUNK_SIZE)
+    pos = 0
+
+    while True:
+        while pos < len(buf) and buf[pos] in WHITESPACE:
+            pos += 1
+        if pos < len(buf):
+            break
+        more = text_stream.read(CHUNK_SIZE)
+        if not more:
+            return None, "", 0
+        buf = buf[pos:] + more
+        pos = 0
+
+    if buf[pos] == "[":
+        return "ARRAY", buf, pos + 1
+
+    # NDJSON if the first line holds a complete value on its own
+    nl = buf.find("\n", pos)
+    while nl == -1:
+        more = text_stream.read(CHUNK_SIZE)
+        if not more:
+            nl = len(buf)
+            break
+        buf += more
+        nl = buf.find("\n", pos)
+
+    try:
+        json.loads(buf[pos:nl])
+        return "NDJSON", buf, pos
+    except ValueError:
+        return "STREAM", buf, pos
+
+
+def iter_json_entries(text_stream):
+    mode, buf, pos = _detect_mode(text_stream)
+
+    if mode == "ARRAY":
+        return _iter_values(text_stream, buf, pos, in_array=True)
+    if mode == "NDJSON":
+        return _iter_ndjson(text_stream, buf[pos:])
+    if mode == "STREAM":
+        return _iter_values(text_stream, buf, pos, in_array=False)
+    return iter(())
+
+
+def parse_json(file_stream, profile=NULL_PROFILE):
+    """
+    Yield log records from a JSON array, NDJSON / JSON Lines, or a stream of
+    concatenated objects. The layout is detected from the first bytes and the
+    document is decoded one object at a time.
+    """
+    # Wrap bytes stream → text stream for json
+    text_stream = io.TextIOWrapper(file_stream, encoding="utf-8-sig", errors="ignore")
+    parse_timestamp = profile.timed("timestamp", timestamps.parse_timestamp)
+
+    # "decode" covers reading, utf-8 decoding and JSON decoding of an entry
+    try:
+        entries = iter_json_entries(text_stream)
+        for entry in iter(profile.timed("decode", entries.__next__), _END):
+            try:
+                record = _to_record(entry, parse_timestamp)
+            except Exception:
+                continue
 
-    return logs
+            if record:
+                yield record
+    finally:
+        # leave file_stream open for the caller (see parse_csv)
+        text_stream.detach()
@@ -1,10 +1,17 @@
-from io import BytesIO
+import json
+
 from db import get_db_connection
-from .detectors import detect_category
+from config import INGEST_BATCH_SIZE, INGEST_PROFILE, INGEST_TRACEMALLOC
+from dimensions import severity_id, category_id, service_id
+from partitions import ensure_partition_for
+from .bulk_loader import BulkLoader
+from .detectors import detect_category, refresh_rules
+from .template_miner import refresh_templates
+from .profiler import IngestProfile, NULL_PROFILE
 from .text_parser import parse_text
 from .csv_parser import parse_csv
-from .json_parser import parse_json
-from .xml_parser import parse_xml
+from .json_parser import parse_json, MalformedJSON
+from .xml_parser import parse_xml, MalformedXML
 
 PARSERS = {
     "TXT": parse_text,
@@ -13,24 +20,36 @@ PARSERS = {
     "XML": parse_xml
 }
 
-def run_parser(file_id, file_stream):
-    # 🔥 Read stream ONCE
-    raw_bytes = file_stream.read()
-    if not raw_bytes:
+def _jsonb(value):
+    if not value:
+        return None
+    # jsonb rejects \u0000 even though it is valid JSON
+    return json.dumps(value, default=str).replace("\\u0000", "")
+
+
+def _is_empty(file_stream):
+    # Peek one byte instead of reading the whole upload into memory
+    pos = file_stream.tell()
+    head = file_stream.read(1)
+    file_stream.seek(pos)
+    return not head
+
+
+def run_parser(file_id, file_stream, on_progress=None, replace=False, write_slot=None):
+    """
+    Parse file_stream into log_entries for file_id.
+
+    on_progress(rows_so_far) is called after every committed batch.
+    replace=True first removes rows left behind by an earlier attempt.
+    write_slot is an optional semaphore held while each batch is written.
+    """
+    if _is_empty(file_stream):
         raise Exception("Parser received empty file stream")
 
     conn = get_db_connection()
     cur = conn.cursor()
 
-<<<<<<< HEAD
     # Get format
-=======
-    #  Read file ONCE
-    raw_bytes = file_stream.read()
-    if not raw_bytes:
-        return
-
->>>>>>> origin/main
     cur.execute("""
         SELECT ff.format_name
         FROM raw_files rf
@@ -47,61 +66,94 @@ def run_parser(file_id, file_stream):
     if not parser:
         raise Exception(f"No parser for format {format_name}")
 
-<<<<<<< HEAD
-    # ✅ DEBUG (this WILL print)
-    print("Bytes received by parser:", len(raw_bytes))
-
-    # 🔥 Always give parser a fresh stream
-=======
-    #  Pass fresh stream
->>>>>>> origin/main
-    parsed_logs = parser(BytesIO(raw_bytes))
-
-    for log in parsed_logs:
-        severity = log["severity"].upper()
-
-        # Severity
-        cur.execute(
-            "SELECT severity_id FROM log_severities WHERE severity_code=%s",
-            (severity,)
-        )
-        row = cur.fetchone()
-        if row:
-            severity_id = row[0]
-        else:
-            cur.execute(
-                "SELECT severity_id FROM log_severities WHERE severity_code='INFO'"
-            )
-            severity_id = cur.fetchone()[0]
-
-        # Category
-        category = detect_category(log["message"])
-        cur.execute(
-            "SELECT category_id FROM log_categories WHERE category_name=%s",
-            (category,)
-        )
-        row = cur.fetchone()
-        if row:
-            category_id = row[0]
-        else:
-            cur.execute(
-                "SELECT category_id FROM log_categories WHERE category_name='GENERAL'"
-            )
-            category_id = cur.fetchone()[0]
-
-        # Insert log entry
-        cur.execute("""
-            INSERT INTO log_entries
-            (file_id, log_timestamp, severity_id, category_id, message_line)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (
-            file_id,
-            log.get("timestamp"),
-            severity_id,
-            category_id,
-            log.get("message")
-        ))
+    # pick up keyword rules teams added to category_rules
+    refresh_rules(cur)
+    # templates mined from earlier uploads (by any worker)
+    miner = refresh_templates(cur)
+
+    if replace:
+        cur.execute("DELETE FROM log_entries WHERE file_id = %s", (file_id,))
+        conn.commit()
+
+    # templates and services are committed on their own connection, one short
+    # transaction each, so parallel workers never wait on each other's batches
+    dim_conn = get_db_connection()
+    dim_cur = dim_conn.cursor()
 
+    # Parsers read the stream lazily; each full batch is flushed and
+    # committed so memory stays bounded by INGEST_BATCH_SIZE
+    loader = BulkLoader(conn, INGEST_BATCH_SIZE, commit_each_batch=True, on_flush=on_progress, write_slot=write_slot)
+
+    profile = IngestProfile(trace_memory=INGEST_TRACEMALLOC) if INGEST_PROFILE else NULL_PROFILE
+    categorize = profile.timed("categorize", detect_category)
+    mine_template = profile.timed("template", miner.add)
+
+    profile.start()
+    try:
+        for log in parser(file_stream, profile):
+            # the partition for a new month / an old backfill is created before its rows are copied
+            ensure_partition_for(log["timestamp"])
+            template_id, params = mine_template(dim_cur, log.get("message"))
+            loader.add((
+                file_id,
+                log.get("timestamp"),
+                severity_id(log["severity"]),
+                category_id(categorize(log["message"])),
+                log.get("message"),
+                template_id,
+                _jsonb(params),
+                service_id(dim_cur, log.get("service")),
+                _jsonb(log.get("attributes"))
+            ))
+
+        loader.flush()
+        conn.commit()
+    except (MalformedXML, MalformedJSON) as e:
+        # the file is ingested with no records, not failed
+        print(f"file_id={file_id}: {format_name} is not well-formed, no records kept ({e})")
+        conn.rollback()
+        cur.execute("DELETE FROM log_entries WHERE file_id = %s", (file_id,))
+        conn.commit()
+        loader.discard()
+    except Exception:
+        profile.stop()
+        # Drop the batches already committed so a failed file leaves no partial rows
+        # (templates and services it added stay; other files may use them already)
+        conn.rollback()
+        dim_conn.rollback()
+        cur.execute("DELETE FROM log_entries WHERE file_id = %s", (file_id,))
+        conn.commit()
+        cur.close()
+        conn.close()
+        dim_cur.close()
+        dim_conn.close()
+        raise
+
+    dim_cur.close()
+    dim_conn.close()
+
+    profile.stop()
+    profile.add("db_write", loader.write_seconds, loader.batches)
+
+    stats = loader.stats()
+    stats["profile"] = profile.save(cur, file_id, stats["rows"])
+    # per-file count the archiver and the archive button use, and the oldest
+    # log_timestamp the dashboard bounds its partition scan with
+    cur.execute("""
+        UPDATE raw_files
+        SET record_count = %s,
+            first_log_at = (SELECT MIN(log_timestamp) FROM log_entries WHERE file_id = %s)
+        WHERE file_id = %s
+    """, (stats["rows"], file_id, file_id))
     conn.commit()
+
     cur.close()
     conn.close()
+
+    print(
+        f"Ingested file_id={file_id}: {stats['rows']} rows in {stats['seconds']}s "
+        f"({stats['rows_per_sec']} rows/sec via {stats['method']})"
+    )
+    if stats["profile"]:
+        print(f"  slowest stage: {stats['profile']['slowest_stage']}")
+    return stats
@@ -0,0 +1,104 @@
+import json
+import time
+import tracemalloc
+
+# -------------------------
+# Per-stage ingestion profile
+# -------------------------
+# Parsers and run_parser wrap the functions of each pipeline stage with
+# profile.timed(stage, fn); the wrapper adds call time and count to the
+# stage totals. With profiling off NULL_PROFILE hands the functions back
+# unwrapped, so the hot loops pay nothing.
+
+
+class IngestProfile:
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = {}
+        self.started_at = None
+        self.total_seconds = 0.0
+        self.peak_memory_bytes = None
+
+    def timed(self, stage, fn):
+        totals = self.stages.setdefault(stage, [0.0, 0])
+        clock = time.perf_counter
+
+        # a call that raises is not counted (end of input, bad record)
+        def wrapper(*args):
+            start = clock()
+            result = fn(*args)
+            totals[0] += clock() - start
+            totals[1] += 1
+            return result
+
+        return wrapper
+
+    def add(self, stage, seconds, count=1):
+        totals = self.stages.setdefault(stage, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += count
+
+    def start(self):
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        else:
+            self.trace_memory = False
+        self.started_at = time.perf_counter()
+
+    def stop(self):
+        self.total_seconds = time.perf_counter() - self.started_at
+        if self.trace_memory:
+            self.peak_memory_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def summary(self):
+        stages = {
+            stage: {"seconds": round(seconds, 4), "count": count}
+            for stage, (seconds, count) in self.stages.items()
+        }
+        measured = sum(seconds for seconds, _ in self.stages.values())
+        slowest = max(self.stages.items(), key=lambda s: s[1][0])[0] if self.stages else None
+        return {
+            "total_seconds": round(self.total_seconds, 4),
+            # generator plumbing, dict building, etc.
+            "other_seconds": round(max(self.total_seconds - measured, 0.0), 4),
+            "slowest_stage": slowest,
+            "peak_memory_bytes": self.peak_memory_bytes,
+            "stages": stages,
+        }
+
+    def save(self, cur, file_id, rows):
+        summary = self.summary()
+        cur.execute("""
+            INSERT INTO ingestion_profiles
+            (file_id, rows_ingested, total_seconds, slowest_stage, peak_memory_bytes, stages)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (
+            file_id,
+            rows,
+            summary["total_seconds"],
+            summary["slowest_stage"],
+            summary["peak_memory_bytes"],
+            json.dumps(summary["stages"])
+        ))
+        return summary
+
+
+class NullProfile(IngestProfile):
+    def timed(self, stage, fn):
+        return fn
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def add(self, stage, seconds, count=1):
+        pass
+
+    def save(self, cur, file_id, rows):
+        return None
+
+
+NULL_PROFILE = NullProfile()
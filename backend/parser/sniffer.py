@@ -0,0 +1,163 @@
+import csv
+import json
+from collections import namedtuple
+
+from .text_layouts import LAYOUTS, layouts_by_first_char, identify, is_separator
+from .timestamps import parse_timestamp
+
+# Content sniffing on the first few KB of an upload.
+# Decides which parser should run (whatever the file extension says) and
+# lets upload reject files that no parser would get rows out of.
+
+SNIFF_BYTES = 8 * 1024
+MIN_CONFIDENCE = 0.5
+
+CSV_DELIMITERS = {",": "COMMA", ";": "SEMICOLON", "\t": "TAB", "|": "PIPE"}
+
+SniffResult = namedtuple("SniffResult", ["format_name", "layout", "confidence"])
+
+
+def _complete_lines(text, truncated):
+    lines = text.splitlines()
+    # the last line of a truncated head is probably cut in half
+    if truncated and len(lines) > 1:
+        lines = lines[:-1]
+    return lines
+
+
+def _sniff_json(text, lines):
+    stripped = text.lstrip()
+
+    if stripped.startswith("["):
+        rest = stripped[1:].lstrip()
+        if rest.startswith("{"):
+            return SniffResult("JSON", "ARRAY", 0.95)
+        if rest.startswith("]"):
+            return SniffResult("JSON", "ARRAY", 0.6)
+        return SniffResult("JSON", "ARRAY", 0.3)
+
+    if stripped.startswith("{"):
+        objects = [l for l in lines if l.strip()]
+        parsed = 0
+        for line in objects:
+            try:
+                if isinstance(json.loads(line), dict):
+                    parsed += 1
+            except ValueError:
+                pass
+
+        if objects and parsed == len(objects):
+            return SniffResult("JSON", "NDJSON", 0.95)
+        if parsed:
+            return SniffResult("JSON", "NDJSON", 0.5 + 0.4 * parsed / len(objects))
+        # one pretty-printed / concatenated object stream
+        return SniffResult("JSON", "STREAM", 0.7)
+
+    return None
+
+
+def _sniff_xml(text):
+    stripped = text.lstrip()
+    if not stripped.startswith("<"):
+        return None
+    if "<log>" in stripped or "<log " in stripped:
+        return SniffResult("XML", "XML", 0.95)
+    return SniffResult("XML", "XML", 0.5)
+
+
+_TEXT_LAYOUTS = layouts_by_first_char(LAYOUTS)
+
+
+def _sniff_text(lines):
+    headers = {}
+    considered = 0
+
+    for line in lines:
+        line = line.rstrip()
+        if not line or is_separator(line):
+            continue
+        # indented lines are stack-trace style continuations
+        if line[0].isspace():
+            continue
+
+        considered += 1
+        layout = identify(line, parse_timestamp, _TEXT_LAYOUTS)
+        if layout:
+            headers[layout] = headers.get(layout, 0) + 1
+
+    if not headers:
+        return None
+
+    matched = sum(headers.values())
+    layout = max(headers, key=headers.get)
+    return SniffResult("TXT", layout, round(0.4 + 0.6 * matched / considered, 3))
+
+
+def sniff_csv_dialect(sample):
+    """
+    csv.Sniffer restricted to the delimiters we support; None if it cannot decide.
+    """
+    try:
+        return csv.Sniffer().sniff(sample, delimiters="".join(CSV_DELIMITERS))
+    except csv.Error:
+        return None
+
+
+def _sniff_csv(text, lines):
+    if len(lines) < 2:
+        return None
+
+    sample = "\n".join(lines)
+    dialect = sniff_csv_dialect(sample)
+    if dialect is None:
+        return None
+
+    header = [h.strip().lower() for h in next(csv.reader([lines[0]], dialect))]
+    if len(header) < 2:
+        return None
+
+    layout = CSV_DELIMITERS.get(dialect.delimiter, "COMMA")
+
+    # parse_csv needs a timestamp column to produce any rows
+    if "timestamp" in header:
+        return SniffResult("CSV", layout, 0.9)
+
+    try:
+        has_header = csv.Sniffer().has_header(sample)
+    except csv.Error:
+        has_header = False
+    return SniffResult("CSV", layout, 0.45 if has_header else 0.2)
+
+
+def sniff(head, truncated=True):
+    """
+    Guess the format of an upload from its first bytes.
+    Returns the most likely SniffResult, or None when nothing fits.
+    """
+    text = head.decode("utf-8", errors="ignore").lstrip("\ufeff")
+    if not text.strip():
+        return None
+
+    lines = _complete_lines(text, truncated)
+
+    candidates = [
+        _sniff_json(text, lines),
+        _sniff_xml(text),
+        _sniff_text(lines),
+        _sniff_csv(text, lines),
+    ]
+    candidates = [c for c in candidates if c]
+    if not candidates:
+        return None
+
+    return max(candidates, key=lambda c: c.confidence)
+
+
+def sniff_stream(file_stream):
+    """
+    Sniff a seekable binary stream without moving its position.
+    """
+    pos = file_stream.tell()
+    head = file_stream.read(SNIFF_BYTES + 1)
+    file_stream.seek(pos)
+    return sniff(head[:SNIFF_BYTES], truncated=len(head) > SNIFF_BYTES)
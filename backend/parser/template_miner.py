@@ -0,0 +1,193 @@
+import psycopg2
+
+from config import TEMPLATE_TREE_DEPTH, TEMPLATE_SIMILARITY, TEMPLATE_MAX_CHILDREN
+
+# -------------------------
+# Log template mining (Drain)
+# -------------------------
+# Messages are grouped into templates such as
+#     "Database connection failed after <*> retries"
+# using a fixed-depth parse tree: token count first, then the first
+# TEMPLATE_TREE_DEPTH tokens, then a short list of candidate templates that
+# is scanned for the most similar one. Tokens containing a digit are treated
+# as parameters up front. Templates live in log_templates, so the tree built
+# by one upload is reused (and refined) by the next.
+
+WILDCARD = "<*>"
+_LEAF = ""
+
+
+def _tokenize(message):
+    tokens = message.split()
+    masked = [WILDCARD if any(ch.isdigit() for ch in t) else t for t in tokens]
+    return tokens, masked
+
+
+class Template:
+    __slots__ = ("template_id", "tokens")
+
+    def __init__(self, template_id, tokens):
+        self.template_id = template_id
+        self.tokens = tokens
+
+    @property
+    def text(self):
+        return " ".join(self.tokens)
+
+
+class TemplateMiner:
+    """
+    In-memory Drain tree over log_templates.
+
+    add(cur, message) returns (template_id, params). New templates and
+    templates that gained a wildcard are written and committed through cur
+    right away, one short transaction each, so cur belongs to a connection
+    of its own and the ingest transaction never holds template row locks.
+    A refinement is merged with the stored text under a row lock: wildcards
+    other workers added are kept, not overwritten by this process's copy.
+    """
+
+    def __init__(self, depth=TEMPLATE_TREE_DEPTH, similarity=TEMPLATE_SIMILARITY,
+                 max_children=TEMPLATE_MAX_CHILDREN):
+        self.depth = depth
+        self.similarity = similarity
+        self.max_children = max_children
+        self.version = None
+        self._root = {}
+
+    def _leaf(self, masked):
+        node = self._root.setdefault(len(masked), {})
+        for token in masked[:self.depth]:
+            child = node.get(token)
+            if child is None:
+                # a node with too many distinct children sends the rest to <*>
+                if len(node) >= self.max_children:
+                    token = WILDCARD
+                    child = node.get(token)
+                if child is None:
+                    child = node[token] = {}
+            node = child
+        return node.setdefault(_LEAF, [])
+
+    def _best(self, candidates, masked):
+        best, best_score = None, (-1.0, -1)
+        for template in candidates:
+            same = params = 0
+            for t, tok in zip(template.tokens, masked):
+                if t == tok:
+                    same += 1
+                elif t == WILDCARD:
+                    params += 1
+            score = (same / len(masked), params)
+            if score > best_score:
+                best, best_score = template, score
+
+        if best is not None and best_score[0] >= self.similarity:
+            return best
+        return None
+
+    def add(self, cur, message):
+        if not message:
+            return None, None
+
+        tokens, masked = _tokenize(message)
+        if not tokens:
+            return None, None
+
+        leaf = self._leaf(masked)
+        template = self._best(leaf, masked)
+
+        if template is None:
+            template = Template(None, masked)
+            template.template_id = _insert(cur, template.text, len(masked))
+            leaf.append(template)
+        else:
+            merged = [t if t == tok else WILDCARD for t, tok in zip(template.tokens, masked)]
+            if merged != template.tokens:
+                _refine(cur, template, merged)
+
+        params = [tok for t, tok in zip(template.tokens, tokens) if t == WILDCARD]
+        return template.template_id, params or None
+
+    def load(self, cur, version):
+        self._root = {}
+        cur.execute("""
+            SELECT template_id, template_text
+            FROM log_templates
+            WHERE merged_into IS NULL
+            ORDER BY template_id
+        """)
+        for template_id, text in cur.fetchall():
+            tokens = text.split()
+            if tokens:
+                self._leaf(tokens).append(Template(template_id, tokens))
+        self.version = version
+
+
+def _template_id_by_text(cur, text):
+    cur.execute("""
+        SELECT template_id
+        FROM log_templates
+        WHERE md5(template_text) = md5(%s) AND merged_into IS NULL
+    """, (text,))
+    return cur.fetchone()[0]
+
+
+def _insert(cur, text, token_count):
+    # another worker may have mined the same template since our last load
+    cur.execute("""
+        INSERT INTO log_templates (token_count, template_text)
+        VALUES (%s, %s)
+        ON CONFLICT ((md5(template_text))) WHERE merged_into IS NULL DO NOTHING
+        RETURNING template_id
+    """, (token_count, text))
+    row = cur.fetchone()
+    template_id = row[0] if row else _template_id_by_text(cur, text)
+    cur.connection.commit()
+    return template_id
+
+
+def _refine(cur, template, merged):
+    # NO KEY UPDATE: does not wait for ingest transactions whose rows
+    # reference the template (they hold KEY SHARE through the foreign key)
+    cur.execute("""
+        SELECT template_text
+        FROM log_templates
+        WHERE template_id = %s
+        FOR NO KEY UPDATE
+    """, (template.template_id,))
+    row = cur.fetchone()
+    stored = row[0].split() if row else []
+    if len(stored) == len(merged):
+        merged = [t if t == s else WILDCARD for t, s in zip(merged, stored)]
+
+    text = " ".join(merged)
+    try:
+        if text != (row[0] if row else None):
+            cur.execute("""
+                UPDATE log_templates
+                SET template_text = %s, updated_at = NOW()
+                WHERE template_id = %s
+            """, (text, template.template_id))
+        cur.connection.commit()
+    except psycopg2.IntegrityError:
+        # refined into a template that already exists: use that one from now on
+        cur.connection.rollback()
+        template.template_id = _template_id_by_text(cur, text)
+        cur.connection.commit()
+    template.tokens = merged
+
+
+_miner = TemplateMiner()
+
+
+def refresh_templates(cur):
+    """
+    Reload the tree when log_templates changed since it was built
+    (another worker or node added or refined templates).
+    """
+    cur.execute("SELECT COUNT(*), MAX(updated_at) FROM log_templates")
+    version = cur.fetchone()
+    if version != _miner.version:
+        _miner.load(cur, version)
+    return _miner
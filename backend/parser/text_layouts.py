@@ -0,0 +1,237 @@
+import re
+import string
+import time
+from collections import namedtuple
+
+# -------------------------
+# Text layout registry
+# -------------------------
+# Every plain-text layout parse_text understands: a compiled pattern, the
+# characters a header line of that layout can start with, a substring every
+# header line contains (or None), and a function turning a match into a log
+# record (or None when the line only looks like the layout). The
+# first-character table and the marker let parse_text skip every regex on
+# continuation lines such as "    at com.acme...", "Caused by: ..." or
+# "java.lang.IllegalStateException: ...".
+
+TextLayout = namedtuple("TextLayout", ["name", "pattern", "first_chars", "marker", "to_record"])
+
+MONTHS = {
+    "Jan": "01", "Feb": "02", "Mar": "03", "Apr": "04", "May": "05", "Jun": "06",
+    "Jul": "07", "Aug": "08", "Sep": "09", "Oct": "10", "Nov": "11", "Dec": "12",
+}
+
+DIGITS = string.digits
+LETTERS = string.ascii_letters
+# an IPv4 / IPv6 client address
+IP_CHARS = DIGITS + "abcdefABCDEF:"
+
+
+# -------- FORMAT 1: space-separated (service-based) --------
+SPACE_FORMAT_PATTERN = re.compile(
+    r"^(?P<date>\d{4}-\d{2}-\d{2})\s+"
+    r"(?P<time>\d{2}:\d{2}:\d{2}(?:,\d{3})?)\s+"
+    r"(?P<severity>DEBUG|INFO|WARN|WARNING|ERROR|CRITICAL|FATAL)\s+"
+    r"(?:\[(?P<thread>[^\]]+)\]\s+)?"
+    r"(?P<service>[A-Za-z0-9_.-]+)\s*"
+    r"(?:-\s+)?"
+    r"(?P<message>.*)$"
+)
+
+
+def _space_record(match, parse_timestamp):
+    return {
+        "timestamp": parse_timestamp(f"{match.group('date')} {match.group('time')}"),
+        "severity": match.group("severity"),
+        "service": match.group("service"),
+        "message": match.group("message"),
+    }
+
+
+# -------- FORMAT 2: pipe-separated --------
+PIPE_FORMAT_PATTERN = re.compile(
+    r"^(?P<date>\d{4}-\d{2}-\d{2})\s+"
+    r"(?P<time>\d{2}:\d{2}:\d{2},\d{3})\s*\|\s*"
+    r"(?P<severity>DEBUG|INFO|WARN|WARNING|ERROR|CRITICAL|FATAL)\s*\|\s*"
+    r"(?P<message>.+)$"
+)
+
+
+def _pipe_record(match, parse_timestamp):
+    return {
+        "timestamp": parse_timestamp(f"{match.group('date')} {match.group('time')}"),
+        "severity": match.group("severity"),
+        "service": "unknown-service",
+        "message": match.group("message"),
+    }
+
+
+# -------- FORMAT 3: Python logging "%(asctime)s - %(name)s - %(levelname)s - %(message)s" --------
+PYTHON_LOGGING_PATTERN = re.compile(
+    r"^(?P<date>\d{4}-\d{2}-\d{2}) "
+    r"(?P<time>\d{2}:\d{2}:\d{2}(?:,\d{3})?) - "
+    r"(?P<service>\S+) - "
+    r"(?P<severity>DEBUG|INFO|WARNING|ERROR|CRITICAL) - "
+    r"(?P<message>.*)$"
+)
+
+
+def _python_record(match, parse_timestamp):
+    return {
+        "timestamp": parse_timestamp(f"{match.group('date')} {match.group('time')}"),
+        "severity": match.group("severity"),
+        "service": match.group("service"),
+        "message": match.group("message"),
+    }
+
+
+# -------- FORMAT 4: syslog (RFC 3164), optional <PRI> --------
+SYSLOG_PATTERN = re.compile(
+    r"^(?:<(?P<pri>\d{1,3})>)?"
+    r"(?P<month>Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec) +(?P<day>\d{1,2}) "
+    r"(?P<time>\d{2}:\d{2}:\d{2}) "
+    r"(?P<host>\S+) "
+    r"(?P<service>[^\s:\[]+)(?:\[(?P<pid>\d+)\])?: ?"
+    r"(?P<message>.*)$"
+)
+
+# syslog severity (PRI % 8) -> log_severities code
+SYSLOG_SEVERITIES = ["FATAL", "FATAL", "FATAL", "ERROR", "WARN", "INFO", "INFO", "DEBUG"]
+
+
+def _syslog_record(match, parse_timestamp):
+    # RFC 3164 has no year: assume the current one, unless that would put
+    # the entry in the future (a December log read in January)
+    now = time.localtime()
+    month = MONTHS[match.group("month")]
+    year = now.tm_year - 1 if int(month) > now.tm_mon + 1 else now.tm_year
+
+    pri = match.group("pri")
+    attributes = {"host": match.group("host")}
+    if match.group("pid"):
+        attributes["pid"] = int(match.group("pid"))
+
+    return {
+        "timestamp": parse_timestamp(f"{year}-{month}-{int(match.group('day')):02d}T{match.group('time')}"),
+        "severity": SYSLOG_SEVERITIES[int(pri) % 8] if pri else "INFO",
+        "service": match.group("service"),
+        "message": match.group("message"),
+        "attributes": attributes,
+    }
+
+
+# -------- FORMAT 5: Apache / Nginx access log (common + combined) --------
+ACCESS_LOG_PATTERN = re.compile(
+    r'^(?P<client>\S+) \S+ (?P<user>\S+) '
+    r'\[(?P<day>\d{2})/(?P<month>[A-Z][a-z]{2})/(?P<year>\d{4}):(?P<time>\d{2}:\d{2}:\d{2}) '
+    r'(?P<tz>[+-]\d{4})\] '
+    r'"(?P<request>[^"]*)" (?P<status>\d{3}) (?P<size>\d+|-)'
+    r'(?: "(?P<referer>[^"]*)" "(?P<agent>[^"]*)")?'
+)
+
+
+def _access_record(match, parse_timestamp):
+    month = MONTHS.get(match.group("month"))
+    if month is None:
+        return None
+
+    status = int(match.group("status"))
+    tz = match.group("tz")
+    attributes = {"client": match.group("client"), "status": status}
+    for key in ("user", "referer", "agent"):
+        value = match.group(key)
+        if value and value != "-":
+            attributes[key] = value
+
+    return {
+        "timestamp": parse_timestamp(
+            f"{match.group('year')}-{month}-{match.group('day')}T{match.group('time')}{tz[:3]}:{tz[3:]}"
+        ),
+        "severity": "ERROR" if status >= 500 else "WARN" if status >= 400 else "INFO",
+        "service": "http",
+        "message": f'{match.group("client")} "{match.group("request")}" {status} {match.group("size")}',
+        "attributes": attributes,
+    }
+
+
+# -------- FORMAT 6: logfmt (key=value pairs) --------
+LOGFMT_PATTERN = re.compile(r'^[A-Za-z_][\w.-]*=(?:"(?:[^"\\]|\\.)*"|\S*)(?: |$)')
+LOGFMT_PAIR = re.compile(r'([A-Za-z_][\w.-]*)=("(?:[^"\\]|\\.)*"|\S*)')
+
+LOGFMT_KEYS = {
+    "timestamp": ("time", "ts", "timestamp", "t"),
+    "severity": ("level", "lvl", "severity"),
+    "service": ("service", "app", "logger", "component"),
+    "message": ("msg", "message"),
+}
+
+
+def _logfmt_record(match, parse_timestamp):
+    pairs = {}
+    for key, value in LOGFMT_PAIR.findall(match.string):
+        if value.startswith('"'):
+            value = value[1:-1].replace('\\"', '"')
+        pairs[key] = value
+
+    fields = {}
+    for field, keys in LOGFMT_KEYS.items():
+        for key in keys:
+            if key in pairs:
+                fields[field] = pairs.pop(key)
+                break
+
+    if not fields.get("timestamp"):
+        return None
+
+    return {
+        "timestamp": parse_timestamp(fields["timestamp"]),
+        "severity": fields.get("severity", "INFO"),
+        "service": fields.get("service", "unknown"),
+        "message": fields.get("message", ""),
+        "attributes": pairs or None,
+    }
+
+
+# Order is the tie-break when several layouts could start with the same character
+LAYOUTS = [
+    TextLayout("SPACE", SPACE_FORMAT_PATTERN, DIGITS, None, _space_record),
+    TextLayout("PIPE", PIPE_FORMAT_PATTERN, DIGITS, "|", _pipe_record),
+    TextLayout("PYTHON", PYTHON_LOGGING_PATTERN, DIGITS, " - ", _python_record),
+    TextLayout("SYSLOG", SYSLOG_PATTERN, "<JFMASOND", None, _syslog_record),
+    TextLayout("ACCESS", ACCESS_LOG_PATTERN, IP_CHARS, '] "', _access_record),
+    TextLayout("LOGFMT", LOGFMT_PATTERN, LETTERS + "_", "=", _logfmt_record),
+]
+
+
+def layouts_by_first_char(layouts=LAYOUTS):
+    """
+    {first character: layouts whose header lines can start with it}
+    """
+    table = {}
+    for layout in layouts:
+        for ch in layout.first_chars:
+            table.setdefault(ch, []).append(layout)
+    return {ch: tuple(candidates) for ch, candidates in table.items()}
+
+
+def identify(line, parse_timestamp, table):
+    """
+    Name of the first layout that turns line into a record, or None.
+    """
+    for layout in table.get(line[0], ()):
+        if layout.marker and layout.marker not in line:
+            continue
+        match = layout.pattern.match(line)
+        if not match:
+            continue
+        try:
+            if layout.to_record(match, parse_timestamp) is not None:
+                return layout.name
+        except ValueError:
+            continue
+    return None
+
+
+def is_separator(line):
+    # "-----" lines between records
+    return (line[0] == "-" or line[0].isspace()) and not line.strip().strip("-")
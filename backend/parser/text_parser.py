@@ -1,75 +1,92 @@
-import re
-from datetime import datetime
-
-# -------- FORMAT 1: space-separated (service-based) --------
-SPACE_FORMAT_PATTERN = re.compile(
-    r"^(?P<date>\d{4}-\d{2}-\d{2})\s+"
-    r"(?P<time>\d{2}:\d{2}:\d{2}(?:,\d{3})?)\s+"
-    r"(?P<severity>DEBUG|INFO|WARN|WARNING|ERROR|CRITICAL|FATAL)\s+"
-    r"(?:\[(?P<thread>[^\]]+)\]\s+)?"
-    r"(?P<service>[A-Za-z0-9_.-]+)\s*"
-    r"(?:-\s+)?"
-    r"(?P<message>.*)$"
+from . import timestamps
+from .profiler import NULL_PROFILE
+from .text_layouts import (
+    LAYOUTS, SPACE_FORMAT_PATTERN, PIPE_FORMAT_PATTERN,
+    layouts_by_first_char, is_separator
 )
 
-# -------- FORMAT 2: pipe-separated --------
-PIPE_FORMAT_PATTERN = re.compile(
-    r"^(?P<date>\d{4}-\d{2}-\d{2})\s+"
-    r"(?P<time>\d{2}:\d{2}:\d{2},\d{3})\s*\|\s*"
-    r"(?P<severity>DEBUG|INFO|WARN|WARNING|ERROR|CRITICAL|FATAL)\s*\|\s*"
-    r"(?P<message>.+)$"
-)
 
-def parse_text(file_stream):
-    logs = []
+def _to_record(matcher, line, parse_timestamp):
+    marker = matcher[2]
+    if marker and marker not in line:
+        return None
+    match = matcher[0](line)
+    if not match:
+        return None
+    try:
+        return matcher[1](match, parse_timestamp)
+    except ValueError:
+        # looks like a header but the date is invalid: keep it as message text
+        return None
+
+
+def parse_text(file_stream, profile=NULL_PROFILE, layouts=LAYOUTS):
+    """
+    Yield one log dict per record. Continuation lines (stack traces, etc.)
+    are collected into a list and joined when the record is complete, so
+    only the record being built is held in memory.
+
+    A line is only matched against layouts that can start with its first
+    character and whose marker it contains, and the layout that matched last is tried first, since a
+    file almost always sticks to one layout.
+    """
     current_log = None
+    message_parts = []
+
+    read_line = profile.timed("read", file_stream.readline)
+    decode = profile.timed("decode", bytes.decode)
+    parse_timestamp = profile.timed("timestamp", timestamps.parse_timestamp)
 
-    for raw_line in file_stream:
-        line = raw_line.decode("utf-8", errors="ignore").rstrip()
+    # (match, to_record, marker) per layout, looked up by the line's first character
+    matchers = {
+        layout: (profile.timed("regex", layout.pattern.match), layout.to_record, layout.marker)
+        for layout in layouts
+    }
+    dispatch = {
+        ch: tuple(matchers[layout] for layout in candidates)
+        for ch, candidates in layouts_by_first_char(layouts).items()
+    }
+    last = None
+
+    for raw_line in iter(read_line, b""):
+        line = decode(raw_line, "utf-8", "ignore").rstrip()
 
         if not line:
             continue
 
         # Ignore separator lines (-----)
-        if set(line.strip()) == {"-"}:
+        if is_separator(line):
             continue
 
-        match = SPACE_FORMAT_PATTERN.match(line)
-        log_format = "SPACE"
+        record = None
+        candidates = dispatch.get(line[0])
+
+        if candidates:
+            if last is not None and last in candidates:
+                record = _to_record(last, line, parse_timestamp)
 
-        if not match:
-            match = PIPE_FORMAT_PATTERN.match(line)
-            log_format = "PIPE"
+            if record is None:
+                for matcher in candidates:
+                    if matcher is last:
+                        continue
+                    record = _to_record(matcher, line, parse_timestamp)
+                    if record is not None:
+                        last = matcher
+                        break
 
-        if match:
-            # save previous multiline log
+        if record is not None:
+            # previous multiline log is complete
             if current_log:
-                logs.append(current_log)
-
-            ts_raw = f"{match.group('date')} {match.group('time')}"
-            ts_format = (
-                "%Y-%m-%d %H:%M:%S,%f"
-                if "," in match.group("time")
-                else "%Y-%m-%d %H:%M:%S"
-            )
-            timestamp = datetime.strptime(ts_raw, ts_format)
-
-            current_log = {
-                "timestamp": timestamp,
-                "severity": match.group("severity"),
-                "service": (
-                    match.groupdict().get("service")
-                    if log_format == "SPACE"
-                    else "unknown-service"
-                ),
-                "message": match.group("message")
-            }
+                current_log["message"] = "\n".join(message_parts)
+                yield current_log
+
+            current_log = record
+            message_parts = [record["message"]]
         else:
             # multiline continuation (stack traces, etc.)
             if current_log:
-                current_log["message"] += "\n" + line
+                message_parts.append(line)
 
     if current_log:
-        logs.append(current_log)
-
-    return logs
+        current_log["message"] = "\n".join(message_parts)
+        yield current_log
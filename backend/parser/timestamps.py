@@ -0,0 +1,20 @@
+import sys
+from datetime import datetime
+
+# Shared timestamp parsing for all parsers.
+#
+# Log timestamps use the layouts
+#   YYYY-MM-DD HH:MM:SS[,fff]      (text / csv)
+#   YYYY-MM-DDTHH:MM:SS[.ffffff][Z|+HH:MM]   (json / xml, ISO-8601)
+# all of which datetime.fromisoformat reads as of Python 3.11 (comma
+# fractions, "Z", any number of fraction digits). It is implemented in C
+# and faster than slicing the text in Python, so it is used directly.
+# Older versions reject the comma and "Z" layouts, and every text / CSV
+# record would be dropped, so they are refused at import.
+
+if sys.version_info < (3, 11):
+    raise RuntimeError("Python 3.11 or newer is required (datetime.fromisoformat of log timestamps)")
+
+
+def parse_timestamp(text):
+    return datetime.fromisoformat(text.strip())
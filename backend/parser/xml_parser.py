@@ -1,53 +1,101 @@
 import xml.etree.ElementTree as ET
-from datetime import datetime
+from config import XML_KEEP_PARTIAL
+from . import timestamps
+from .profiler import NULL_PROFILE
 
-def parse_xml(file_stream):
-    logs = []
+_END = object()
 
-    try:
-        raw_bytes = file_stream.read()
-    except Exception:
-        return logs
 
-    if not raw_bytes:
-        return logs
+class MalformedXML(Exception):
+    """
+    The document is not well-formed. Records were already yielded, so the
+    caller drops them: a broken file yields no records, as before streaming.
+    """
 
-    try:
-        root = ET.fromstring(raw_bytes)
-    except Exception:
-        return logs
-
-    # Expecting structure: <logs><log>...</log></logs>
-    for log_elem in root.findall("log"):
-        try:
-            ts_text = log_elem.findtext("timestamp")
-            if not ts_text:
-                continue
 
-            timestamp = datetime.fromisoformat(ts_text)
-            severity = log_elem.findtext("level", "INFO").upper()
-            service = log_elem.findtext("service", "unknown")
-            message = log_elem.findtext("message", "")
+def _element_value(elem):
+    # <user><id>7</id><role>admin</role></user> -> {"id": "7", "role": "admin"}
+    if len(elem):
+        nested = {}
+        for child in elem:
+            value = _element_value(child)
+            if value:
+                nested[child.tag] = value
+        return nested
+    return (elem.text or "").strip()
 
-            extra_fields = []
-            for child in log_elem:
-                tag = child.tag
-                text = (child.text or "").strip()
 
-                if tag not in ("timestamp", "level", "service", "message", "thread") and text:
-                    extra_fields.append(f"{tag}={text}")
+def _to_record(log_elem, parse_timestamp):
+    ts_text = log_elem.findtext("timestamp")
+    if not ts_text:
+        return None
 
-            if extra_fields:
-                message = message + " | " + " ".join(extra_fields)
+    timestamp = parse_timestamp(ts_text)
+    severity = log_elem.findtext("level", "INFO").upper()
+    service = log_elem.findtext("service", "unknown")
+    message = log_elem.findtext("message", "")
 
-            logs.append({
-                "timestamp": timestamp,
-                "severity": severity,
-                "service": service,
-                "message": message
-            })
-
-        except Exception:
+    attributes = {}
+    for child in log_elem:
+        tag = child.tag
+        if tag in ("timestamp", "level", "service", "message", "thread"):
             continue
 
-    return logs
+        value = _element_value(child)
+        if value:
+            attributes[tag] = value
+
+    return {
+        "timestamp": timestamp,
+        "severity": severity,
+        "service": service,
+        "message": message,
+        "attributes": attributes or None
+    }
+
+
+def parse_xml(file_stream, profile=NULL_PROFILE, keep_partial=XML_KEEP_PARTIAL):
+    """
+    Yield log records from <logs><log>...</log></logs> as each <log> closes.
+
+    Only direct <log> children of the root are used (same as root.findall("log")),
+    and each one is dropped from the root after use so memory stays flat.
+    Malformed / truncated XML raises MalformedXML at the broken element,
+    unless keep_partial, which just stops there.
+    """
+    depth = 0
+    root = None
+    parse_timestamp = profile.timed("timestamp", timestamps.parse_timestamp)
+
+    try:
+        # "decode" covers reading and XML tokenizing up to the next event
+        events = ET.iterparse(file_stream, events=("start", "end"))
+        for event, elem in iter(profile.timed("decode", events.__next__), _END):
+            if event == "start":
+                if root is None:
+                    root = elem
+                depth += 1
+                continue
+
+            depth -= 1
+
+            # depth 1 == direct child of the root element
+            if depth != 1:
+                continue
+
+            if elem.tag == "log":
+                try:
+                    record = _to_record(elem, parse_timestamp)
+                except Exception:
+                    record = None
+
+                if record:
+                    yield record
+
+            # Free the finished child and anything the root still holds
+            elem.clear()
+            root.clear()
+    except ET.ParseError as e:
+        if keep_partial:
+            return
+        raise MalformedXML(str(e)) from e
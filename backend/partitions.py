@@ -0,0 +1,235 @@
+"""
+Time-range partitions of log_entries.
+
+    python partitions.py [--ahead N]      # schedule it (e.g. daily from cron)
+    python partitions.py --list
+
+log_entries is PARTITION BY RANGE (log_timestamp) once migrate_partitions.py
+has run: one partition per LOG_PARTITION_INTERVAL (month / week / day),
+named log_entries_pYYYYMMDD after its first day, plus log_entries_default
+for rows no partition covers. Creating the partition for a range moves the
+rows the default partition holds for it.
+
+The scheduled CLI run is what creates partitions: the next N ones, plus one
+for every range the default partition has rows for. Ingestion only tries
+on demand (ensure_partition_for, e.g. for an old backfill) under a short
+lock_timeout: ATTACH needs an ACCESS EXCLUSIVE lock on the default
+partition, and waiting for it behind running /logs reads would queue every
+later read behind the ingest. When the lock is not free the rows go to the
+default partition and the next scheduled run moves them.
+"""
+import argparse
+import datetime
+import threading
+import time
+
+from psycopg2 import errors
+
+from db import get_db_connection
+from config import LOG_PARTITION_INTERVAL, LOG_PARTITIONS_AHEAD
+
+PARENT = "log_entries"
+DEFAULT_PARTITION = "log_entries_default"
+ONE_DAY = datetime.timedelta(days=1)
+# how long a process trusts "not partitioned" before asking again
+# (the migration may finish while workers are running)
+RECHECK_SECONDS = 300
+# how long ingestion waits for the locks of an on-demand partition
+ON_DEMAND_LOCK_TIMEOUT = "2s"
+
+_lock = threading.Lock()
+# days this process knows a partition for
+_covered_days = set()
+_partitioned = None
+_checked_at = 0.0
+
+
+def partition_range(day, interval=LOG_PARTITION_INTERVAL):
+    """
+    (first day, first day of the next partition) of the partition holding day.
+    """
+    if interval == "day":
+        return day, day + ONE_DAY
+    if interval == "week":
+        start = day - datetime.timedelta(days=day.weekday())
+        return start, start + datetime.timedelta(days=7)
+    start = day.replace(day=1)
+    return start, (start + datetime.timedelta(days=32)).replace(day=1)
+
+
+def partition_name(start):
+    return f"{PARENT}_p{start:%Y%m%d}"
+
+
+def is_partitioned(cur, table=PARENT):
+    cur.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (table,))
+    row = cur.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def create_partition(cur, start, end, parent=PARENT):
+    """
+    Create and attach the partition for [start, end) unless it exists.
+    Runs in cur's transaction; returns True when a partition was created.
+    """
+    name = partition_name(start)
+
+    # two workers meeting the same new month: the second one waits here
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (name,))
+    cur.execute("SELECT to_regclass(%s)", (name,))
+    if cur.fetchone()[0] is not None:
+        return False
+
+    # Built standalone and attached afterwards: the default partition may
+    # already hold rows of this range, and ATTACH refuses to run while it does
+    cur.execute(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS)")
+    cur.execute(f"""
+        WITH moved AS (
+            DELETE FROM {DEFAULT_PARTITION}
+            WHERE log_timestamp >= %s AND log_timestamp < %s
+            RETURNING *
+        )
+        INSERT INTO {name}
+        SELECT * FROM moved
+    """, (start.isoformat(), end.isoformat()))
+    cur.execute(
+        f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+        (start.isoformat(), end.isoformat())
+    )
+    return True
+
+
+def create_range(cur, first_day, last_day, parent=PARENT):
+    """
+    Partitions covering first_day .. last_day; returns how many were created.
+    """
+    created = 0
+    day = first_day
+    while day <= last_day:
+        start, end = partition_range(day)
+        created += create_partition(cur, start, end, parent)
+        day = end
+    return created
+
+
+def create_ahead(cur, ahead=LOG_PARTITIONS_AHEAD):
+    """
+    The current partition and the next `ahead` ones.
+    """
+    start, end = partition_range(datetime.date.today())
+    created = create_partition(cur, start, end)
+    for _ in range(ahead):
+        start, end = partition_range(end)
+        created += create_partition(cur, start, end)
+    return created
+
+
+def sweep_default(cur):
+    """
+    Give every range that still has rows in the default partition its own partition.
+    """
+    created = 0
+    after = datetime.date.min
+    while True:
+        cur.execute(
+            f"SELECT MIN(log_timestamp)::date FROM {DEFAULT_PARTITION} WHERE log_timestamp >= %s",
+            (after.isoformat(),)
+        )
+        first = cur.fetchone()[0]
+        if first is None:
+            return created
+        start, end = partition_range(first)
+        # False when the partition exists and the rows only missed it by a
+        # time zone offset; they stay where they are
+        created += create_partition(cur, start, end)
+        after = end
+
+
+def ensure_partition_for(ts):
+    """
+    Try to have a partition cover ts before it is written. Called per row by
+    run_parser, so the common case is one set lookup. Gives up after
+    ON_DEMAND_LOCK_TIMEOUT; the row then lands in the default partition.
+    """
+    global _partitioned, _checked_at
+
+    if _partitioned is False and time.monotonic() - _checked_at < RECHECK_SECONDS:
+        return
+    day = ts.date()
+    if day in _covered_days:
+        return
+
+    with _lock:
+        if day in _covered_days:
+            return
+
+        conn = get_db_connection()
+        cur = conn.cursor()
+        try:
+            if not _partitioned:
+                _partitioned = is_partitioned(cur)
+                _checked_at = time.monotonic()
+                if not _partitioned:
+                    return
+
+            # an offset-aware timestamp can land on the neighbouring day in
+            # the session time zone, so cover both sides as well
+            for d in (day - ONE_DAY, day, day + ONE_DAY):
+                start, end = partition_range(d)
+                try:
+                    cur.execute(f"SET LOCAL lock_timeout = '{ON_DEMAND_LOCK_TIMEOUT}'")
+                    create_partition(cur, start, end)
+                    conn.commit()
+                except errors.LockNotAvailable:
+                    # busy: leave the range to the default partition and the
+                    # scheduled partitions.py run instead of blocking readers
+                    conn.rollback()
+                    print(f"partition for {start} not created (lock busy); rows go to {DEFAULT_PARTITION}")
+                # either way, this process does not ask again for these days
+                _covered_days.update(start + ONE_DAY * i for i in range((end - start).days))
+        finally:
+            cur.close()
+            conn.close()
+
+
+def list_partitions(cur):
+    """
+    (partition name, bound expression, approximate rows) of log_entries.
+    """
+    cur.execute("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid), c.reltuples::bigint
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        ORDER BY c.relname
+    """, (PARENT,))
+    return cur.fetchall()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Create upcoming log_entries partitions")
+    arg_parser.add_argument("--ahead", type=int, default=LOG_PARTITIONS_AHEAD)
+    arg_parser.add_argument("--list", action="store_true")
+    args = arg_parser.parse_args()
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    if not is_partitioned(cur):
+        print("log_entries is not partitioned yet; run migrate_partitions.py first")
+    elif args.list:
+        for name, bound, rows in list_partitions(cur):
+            print(f"{name:<28} {bound:<70} ~{max(rows, 0)} rows")
+    else:
+        created = create_ahead(cur, args.ahead)
+        conn.commit()
+        swept = sweep_default(cur)
+        conn.commit()
+        print(f"{created} partitions created ahead, {swept} from rows in {DEFAULT_PARTITION}")
+
+    cur.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
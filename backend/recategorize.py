@@ -0,0 +1,268 @@
+"""
+Re-categorization backfill.
+
+    python recategorize.py [--workers N] [--chunk-size 10000]
+    python recategorize.py --resume RUN_ID
+    python recategorize.py --status RUN_ID
+
+Recomputes log_entries.category_id with the current keyword rules
+(built-ins + category_rules). The log_id range is cut into chunks stored in
+recategorize_chunks; worker processes claim chunks with FOR UPDATE SKIP
+LOCKED, read the chunk through the primary key, and write only the rows
+whose category changed with one UPDATE ... FROM (VALUES ...) per page.
+Every chunk commits on its own, so row locks are held for one chunk at a
+time and an interrupted run resumes from its last finished chunk.
+"""
+import argparse
+import multiprocessing
+import signal
+import time
+
+from psycopg2.extras import execute_values
+
+from db import get_db_connection
+from config import INGEST_WORKERS, RECATEGORIZE_CHUNK_SIZE, RECATEGORIZE_PAGE_SIZE
+from parser.detectors import refresh_rules
+import dimensions
+
+PENDING = "PENDING"
+RUNNING = "RUNNING"
+DONE = "DONE"
+FAILED = "FAILED"
+
+
+def create_run(conn, chunk_size):
+    """
+    Register a run and its chunks covering the current log_id range.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT MIN(log_id), MAX(log_id) FROM log_entries")
+    min_id, max_id = cur.fetchone()
+
+    cur.execute("""
+        INSERT INTO recategorize_runs (min_log_id, max_log_id, chunk_size, state)
+        VALUES (%s, %s, %s, %s)
+        RETURNING run_id
+    """, (min_id, max_id, chunk_size, RUNNING))
+    run_id = cur.fetchone()[0]
+
+    if min_id is not None:
+        cur.execute("""
+            INSERT INTO recategorize_chunks (run_id, chunk_start, chunk_end, state)
+            SELECT %s, s, s + %s, %s
+            FROM generate_series(%s::bigint, %s::bigint, %s::bigint) AS s
+        """, (run_id, chunk_size, PENDING, min_id, max_id, chunk_size))
+
+    conn.commit()
+    cur.close()
+    return run_id
+
+
+def resume_run(conn, run_id):
+    # chunks a killed run left RUNNING are redone (the UPDATE is idempotent)
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE recategorize_chunks
+        SET state = %s
+        WHERE run_id = %s AND state IN (%s, %s)
+    """, (PENDING, run_id, RUNNING, FAILED))
+    cur.execute("""
+        UPDATE recategorize_runs
+        SET state = %s, finished_at = NULL
+        WHERE run_id = %s
+    """, (RUNNING, run_id))
+    conn.commit()
+    cur.close()
+
+
+def claim_chunk(conn, run_id):
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE recategorize_chunks
+        SET state = %s, started_at = NOW()
+        WHERE (run_id, chunk_start) = (
+            SELECT run_id, chunk_start
+            FROM recategorize_chunks
+            WHERE run_id = %s AND state = %s
+            ORDER BY chunk_start
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING chunk_start, chunk_end
+    """, (RUNNING, run_id, PENDING))
+    chunk = cur.fetchone()
+    conn.commit()
+    cur.close()
+    return chunk
+
+
+def process_chunk(conn, run_id, chunk_start, chunk_end, matcher):
+    """
+    Recategorize log_id in [chunk_start, chunk_end); one transaction.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT log_id, log_timestamp, category_id, message_line
+        FROM log_entries
+        WHERE log_id >= %s AND log_id < %s
+    """, (chunk_start, chunk_end))
+
+    scanned = 0
+    changes = []
+    for log_id, log_timestamp, current, message in cur:
+        scanned += 1
+        new_id = dimensions.category_id(matcher.match(message))
+        if new_id != current:
+            changes.append((log_id, log_timestamp, new_id))
+
+    if changes:
+        # log_timestamp is part of the key so each lookup hits one partition
+        execute_values(cur, """
+            UPDATE log_entries AS le
+            SET category_id = v.category_id::smallint
+            FROM (VALUES %s) AS v(log_id, log_timestamp, category_id)
+            WHERE le.log_id = v.log_id
+              AND le.log_timestamp = v.log_timestamp::timestamptz
+        """, changes, page_size=RECATEGORIZE_PAGE_SIZE)
+
+    cur.execute("""
+        UPDATE recategorize_chunks
+        SET state = %s, rows_scanned = %s, rows_changed = %s, finished_at = NOW()
+        WHERE run_id = %s AND chunk_start = %s
+    """, (DONE, scanned, len(changes), run_id, chunk_start))
+    conn.commit()
+    cur.close()
+    return scanned, len(changes)
+
+
+def worker_loop(run_id, stop_event):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    matcher = refresh_rules(cur)
+    conn.commit()
+    cur.close()
+
+    while not stop_event.is_set():
+        chunk = claim_chunk(conn, run_id)
+        if not chunk:
+            break
+
+        try:
+            process_chunk(conn, run_id, chunk[0], chunk[1], matcher)
+        except Exception as e:
+            print(f"chunk {chunk[0]}-{chunk[1]} failed:", e)
+            conn.rollback()
+            cur = conn.cursor()
+            cur.execute("""
+                UPDATE recategorize_chunks
+                SET state = %s, finished_at = NOW()
+                WHERE run_id = %s AND chunk_start = %s
+            """, (FAILED, run_id, chunk[0]))
+            conn.commit()
+            cur.close()
+
+    conn.close()
+
+
+def run_progress(conn, run_id):
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT COUNT(*),
+               COUNT(*) FILTER (WHERE state = %s),
+               COUNT(*) FILTER (WHERE state = %s),
+               COALESCE(SUM(rows_scanned), 0),
+               COALESCE(SUM(rows_changed), 0),
+               EXTRACT(EPOCH FROM (MAX(finished_at) - MIN(started_at)))
+        FROM recategorize_chunks
+        WHERE run_id = %s
+    """, (DONE, FAILED, run_id))
+    total, done, failed, scanned, changed, elapsed = cur.fetchone()
+    conn.commit()
+    cur.close()
+
+    elapsed = float(elapsed or 0)
+    return {
+        "chunks": total,
+        "done": done,
+        "failed": failed,
+        "rows_scanned": int(scanned),
+        "rows_changed": int(changed),
+        "rows_per_sec": round(int(scanned) / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def print_progress(run_id, progress):
+    print(
+        f"run {run_id}: {progress['done']}/{progress['chunks']} chunks, "
+        f"{progress['rows_scanned']} scanned, {progress['rows_changed']} changed, "
+        f"{progress['failed']} failed chunks, {progress['rows_per_sec']} rows/sec"
+    )
+
+
+def finish_run(conn, run_id, progress):
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE recategorize_runs
+        SET state = %s, finished_at = NOW()
+        WHERE run_id = %s
+    """, (FAILED if progress["failed"] or progress["done"] < progress["chunks"] else DONE, run_id))
+    conn.commit()
+    cur.close()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Recompute log_entries.category_id with the current rules")
+    arg_parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    arg_parser.add_argument("--chunk-size", type=int, default=RECATEGORIZE_CHUNK_SIZE)
+    arg_parser.add_argument("--resume", type=int, metavar="RUN_ID")
+    arg_parser.add_argument("--status", type=int, metavar="RUN_ID")
+    args = arg_parser.parse_args()
+
+    conn = get_db_connection()
+
+    if args.status:
+        print_progress(args.status, run_progress(conn, args.status))
+        conn.close()
+        return
+
+    if args.resume:
+        run_id = args.resume
+        resume_run(conn, run_id)
+    else:
+        run_id = create_run(conn, max(1, args.chunk_size))
+    print(f"recategorize run {run_id} started")
+
+    stop_event = multiprocessing.Event()
+
+    def shutdown(signum, frame):
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    processes = [
+        multiprocessing.Process(target=worker_loop, args=(run_id, stop_event), daemon=True)
+        for _ in range(max(1, args.workers))
+    ]
+    for p in processes:
+        p.start()
+
+    while any(p.is_alive() for p in processes):
+        time.sleep(5)
+        print_progress(run_id, run_progress(conn, run_id))
+
+    for p in processes:
+        p.join()
+
+    progress = run_progress(conn, run_id)
+    finish_run(conn, run_id, progress)
+    print_progress(run_id, progress)
+    if stop_event.is_set():
+        print(f"stopped; continue with: python recategorize.py --resume {run_id}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+import re
+from collections import namedtuple
+
+# Keyword search for /logs.
+# The keyword box picks the index by its syntax:
+#
+#   timeout refused       words     tsvector @@ plainto_tsquery      (GIN tsvector)
+#   "connection reset"    phrase    tsvector @@ phraseto_tsquery     (GIN tsvector)
+#   conn* time*           prefix    tsvector @@ to_tsquery 'conn:*'
+#   /time(d )?out/        regex     message_line ~* ...              (GIN pg_trgm)
+#   user_id=42, 10.0.0.1  substring message_line ILIKE '%...%'       (GIN pg_trgm)
+#
+# The tsvector is an expression index (MESSAGE_TSVECTOR), not a column, so
+# queries repeat the expression exactly. Both indexes are built by
+# search_indexes.py. Words match whole tokens of the 'simple' configuration
+# (no stemming, no stop words); anything with punctuation in it is matched
+# as a substring.
+# pg_trgm needs three characters to use its index, shorter substrings and
+# regexes without a literal of that length scan.
+# matches() is the same test in Python, used on the cold segments; it
+# tokenizes a little more naively than PostgreSQL's parser. Python's re
+# backtracks, so a regex that can take exponential time there (nested
+# repetition, backreferences) or a very long one is not run on the cold
+# segments: matches is None and `warning` says why.
+
+WORDS = "words"
+PHRASE = "phrase"
+PREFIX = "prefix"
+REGEX = "regex"
+SUBSTRING = "substring"
+
+TS_CONFIG = "simple"
+
+# Only the first 100k characters are tokenized (a tsvector is capped at
+# 1MB); substring and regex search see the whole message.
+MESSAGE_TSVECTOR = f"to_tsvector('{TS_CONFIG}', left(message_line, 100000))"
+
+# index name -> definition on log_entries (search_indexes.py, migrate_partitions.py)
+SEARCH_INDEXES = {
+    "idx_log_entries_message_tsv": f"USING GIN (({MESSAGE_TSVECTOR}))",
+    "idx_log_entries_message_trgm": "USING GIN (message_line gin_trgm_ops)",
+}
+
+SearchQuery = namedtuple("SearchQuery", ["mode", "text", "sql", "params", "matches", "warning"])
+SearchQuery.__new__.__defaults__ = (None,)
+
+_LE_TSVECTOR = MESSAGE_TSVECTOR.replace("message_line", "le.message_line")
+
+# longest regex run with Python's re on archived messages
+MAX_COLD_PATTERN = 200
+
+# PostgreSQL's default parser splits on "_" as well
+TOKEN = re.compile(r"[^\W_]+")
+WORD_TERM = re.compile(r"[^\W_]+\*?")
+REPEAT_BOUNDS = re.compile(r"\{\d*(?:,\d*)?\}")
+
+
+def _tokens(text):
+    return TOKEN.findall(text.lower())
+
+
+def _like_pattern(text):
+    return "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _words_query(text):
+    words = _tokens(text)
+
+    def matches(message):
+        tokens = set(_tokens(message))
+        return all(w in tokens for w in words)
+
+    return SearchQuery(
+        WORDS, text,
+        f"{_LE_TSVECTOR} @@ plainto_tsquery('{TS_CONFIG}', %s)", [text],
+        matches
+    )
+
+
+def _phrase_query(text):
+    words = _tokens(text)
+
+    def matches(message):
+        tokens = _tokens(message)
+        n = len(words)
+        return any(tokens[i:i + n] == words for i in range(len(tokens) - n + 1))
+
+    return SearchQuery(
+        PHRASE, text,
+        f"{_LE_TSVECTOR} @@ phraseto_tsquery('{TS_CONFIG}', %s)", [text],
+        matches
+    )
+
+
+def _prefix_query(terms):
+    # terms are [^\W_]+ with an optional trailing *, so nothing in them
+    # needs escaping for to_tsquery
+    terms = [t.lower() for t in terms]
+    tsquery = " & ".join(t[:-1] + ":*" if t.endswith("*") else t for t in terms)
+
+    def matches(message):
+        tokens = _tokens(message)
+        return all(
+            any(tok.startswith(t[:-1]) for tok in tokens) if t.endswith("*") else t in tokens
+            for t in terms
+        )
+
+    return SearchQuery(
+        PREFIX, " ".join(terms),
+        f"{_LE_TSVECTOR} @@ to_tsquery('{TS_CONFIG}', %s)", [tsquery],
+        matches
+    )
+
+
+def cold_regex_problem(pattern):
+    """
+    Why pattern is not safe to run with Python's re, or None: too long, a
+    backreference, or a repeated group that itself repeats or alternates
+    ((a+)+, (a|aa)*), the shapes that backtrack exponentially.
+    """
+    if len(pattern) > MAX_COLD_PATTERN:
+        return f"longer than {MAX_COLD_PATTERN} characters"
+
+    # one flag per open group: does it contain repetition or "|"
+    groups = [False]
+    # flag of the group that just closed, None when the last atom was not a group
+    closed = None
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        atom_group = None
+
+        if c == "\\":
+            if pattern[i + 1:i + 2].isdigit() and pattern[i + 1] != "0":
+                return "it uses a backreference"
+            i += 2
+        elif c == "[":
+            # character class: skip to its closing bracket
+            i += 1
+            if pattern[i:i + 1] == "^":
+                i += 1
+            if pattern[i:i + 1] == "]":
+                i += 1
+            while i < n and pattern[i] != "]":
+                i += 2 if pattern[i] == "\\" else 1
+            i += 1
+        elif c == "(":
+            if pattern.startswith("(?P=", i):
+                return "it uses a backreference"
+            groups.append(False)
+            i += 1
+        elif c == ")":
+            atom_group = groups.pop() if len(groups) > 1 else False
+            groups[-1] = groups[-1] or atom_group
+            i += 1
+        elif c == "|":
+            groups[-1] = True
+            i += 1
+        elif c in "*+" or (c == "{" and REPEAT_BOUNDS.match(pattern, i)):
+            if closed:
+                return "it repeats a group that repeats or alternates"
+            groups[-1] = True
+            i = REPEAT_BOUNDS.match(pattern, i).end() if c == "{" else i + 1
+            # lazy / possessive suffix
+            if pattern[i:i + 1] in ("?", "+"):
+                i += 1
+        else:
+            i += 1
+
+        closed = atom_group
+    return None
+
+
+def _regex_query(pattern, compiled):
+    problem = cold_regex_problem(pattern)
+    if problem:
+        return SearchQuery(
+            REGEX, pattern,
+            "le.message_line ~* %s", [pattern],
+            None,
+            f"Archived logs were not searched: this pattern {problem}."
+        )
+    return SearchQuery(
+        REGEX, pattern,
+        "le.message_line ~* %s", [pattern],
+        lambda message: compiled.search(message) is not None
+    )
+
+
+def _substring_query(text):
+    needle = text.lower()
+    return SearchQuery(
+        SUBSTRING, text,
+        "le.message_line ILIKE %s", [_like_pattern(text)],
+        lambda message: needle in message.lower()
+    )
+
+
+def parse_query(text):
+    """
+    SearchQuery for the keyword box text, or None when it is empty.
+    """
+    text = text.strip()
+    if not text:
+        return None
+
+    if len(text) > 2 and text.startswith("/") and text.endswith("/"):
+        pattern = text[1:-1]
+        try:
+            compiled = re.compile(pattern, re.IGNORECASE)
+        except re.error:
+            # not a valid regex: look for the text as typed
+            return _substring_query(text)
+        return _regex_query(pattern, compiled)
+
+    if len(text) > 2 and text.startswith('"') and text.endswith('"'):
+        phrase = text[1:-1].strip()
+        if _tokens(phrase):
+            return _phrase_query(phrase)
+        return _substring_query(phrase or text)
+
+    terms = text.split()
+    if not all(WORD_TERM.fullmatch(t) for t in terms):
+        return _substring_query(text)
+    if any(t.endswith("*") for t in terms):
+        return _prefix_query(terms)
+    return _words_query(text)
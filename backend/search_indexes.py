@@ -0,0 +1,103 @@
+"""
+Build the /logs keyword search indexes without blocking writes.
+
+    python search_indexes.py
+    python search_indexes.py --status
+
+Creates search.SEARCH_INDEXES on log_entries with CREATE INDEX CONCURRENTLY.
+A partitioned index cannot be built concurrently, so on a partitioned
+log_entries the parent index is created ON ONLY log_entries (catalog only),
+each partition's index is built concurrently and attached, and the parent
+becomes valid once every partition has one. Partitions created later get
+theirs when they are attached. Safe to re-run: finished partitions are
+skipped, an index a failed run left INVALID is dropped and built again.
+"""
+import argparse
+
+from db import get_db_connection
+from search import SEARCH_INDEXES
+import partitions
+
+
+def _index_state(cur, name):
+    """
+    None when the index does not exist, else whether it is valid.
+    """
+    cur.execute("""
+        SELECT x.indisvalid
+        FROM pg_index x
+        WHERE x.indexrelid = to_regclass(%s)
+    """, (name,))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def _partition_index(cur, parent_index, partition):
+    """
+    Name of the index of partition attached to parent_index, or None.
+    """
+    cur.execute("""
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_index x ON x.indexrelid = i.inhrelid
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s) AND x.indrelid = to_regclass(%s)
+    """, (parent_index, partition))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def build_concurrently(cur, name, table, definition):
+    """
+    CREATE INDEX CONCURRENTLY name on table, replacing an INVALID leftover.
+    cur must be in autocommit mode.
+    """
+    state = _index_state(cur, name)
+    if state is False:
+        cur.execute(f"DROP INDEX CONCURRENTLY {name}")
+    if state is not True:
+        cur.execute(f"CREATE INDEX CONCURRENTLY {name} ON {table} {definition}")
+
+
+def build_index(cur, name, definition):
+    if not partitions.is_partitioned(cur):
+        build_concurrently(cur, name, partitions.PARENT, definition)
+        print(f"{name}: built")
+        return
+
+    cur.execute(f"CREATE INDEX IF NOT EXISTS {name} ON ONLY {partitions.PARENT} {definition}")
+    for partition, _, _ in partitions.list_partitions(cur):
+        if _partition_index(cur, name, partition):
+            continue
+        # <partition>_<index suffix>, e.g. log_entries_p20250101_message_tsv
+        child = f"{partition}_{name[len('idx_log_entries_'):]}"
+        build_concurrently(cur, child, partition, definition)
+        cur.execute(f"ALTER INDEX {name} ATTACH PARTITION {child}")
+        print(f"{name}: {partition} done")
+
+    print(f"{name}: {'valid' if _index_state(cur, name) else 'NOT valid yet'}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Build the log search indexes concurrently")
+    arg_parser.add_argument("--status", action="store_true")
+    args = arg_parser.parse_args()
+
+    conn = get_db_connection()
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    for name, definition in SEARCH_INDEXES.items():
+        if args.status:
+            state = _index_state(cur, name)
+            print(f"{name}: {'missing' if state is None else 'valid' if state else 'building / invalid'}")
+        else:
+            build_index(cur, name, definition)
+
+    cur.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import hashlib
+import os
+import uuid
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge
+from config import INGEST_SPOOL_DIR, MAX_UPLOAD_BYTES
+
+# Uploads are written straight from the multipart parser into a spool file
+# under INGEST_SPOOL_DIR, in the chunks werkzeug hands us. Size and SHA-256
+# are computed during that single copy, so an upload never sits in memory
+# and never has to be re-read just to measure or hash it.
+
+
+class SpoolFile:
+    """
+    File-like object werkzeug streams one uploaded file into.
+
+    Behaves like the temp file werkzeug would normally use (read / seek / tell
+    are passed through), plus incremental size + hash and a hard size cap.
+    Call persist(path) to keep the file; otherwise it is removed on close.
+    """
+
+    def __init__(self, spool_dir=INGEST_SPOOL_DIR, max_bytes=MAX_UPLOAD_BYTES):
+        os.makedirs(spool_dir, exist_ok=True)
+        self.path = os.path.join(spool_dir, f".upload-{uuid.uuid4().hex}.part")
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file = open(self.path, "w+b")
+        self._kept = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            self.discard()
+            raise RequestEntityTooLarge(
+                f"Uploaded file exceeds the {self.max_bytes} byte limit"
+            )
+
+        self._hash.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    def persist(self, dest_path):
+        """
+        Move the spooled upload to dest_path (same filesystem, so no copy).
+        It stays open for reading there: the members of a zip are still
+        read after the archive is persisted for the first one.
+        """
+        self._file.flush()
+        self._file.close()
+        os.replace(self.path, dest_path)
+        self.path = dest_path
+        self._kept = True
+        self._file = open(dest_path, "rb")
+        return dest_path
+
+    def discard(self):
+        if not self._file.closed:
+            self._file.close()
+        if not self._kept and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        self.discard()
+
+    def __getattr__(self, name):
+        # read, seek, tell, readable, ... go to the real file
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class SpoolingRequest(Request):
+    """
+    Flask request class that spools every uploaded file through SpoolFile
+    instead of werkzeug's default (memory first, then an anonymous temp file).
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpoolFile()
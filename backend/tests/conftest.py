@@ -0,0 +1,121 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# Tests that touch PostgreSQL run against TEST_DATABASE_URL, a libpq
+# connection string for a database with database_code/log_management
+# loaded that is used for nothing else (the archiver and queue tests see
+# every row in it), e.g. "host=localhost dbname=logvault_test user=postgres".
+# Without it they are skipped.
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("INGEST_SPOOL_DIR", tempfile.mkdtemp(prefix="logvault-spool-"))
+os.environ.setdefault("COLD_STORE_DIR", tempfile.mkdtemp(prefix="logvault-cold-"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if TEST_DATABASE_URL:
+    import config
+    config.DB_SETTINGS.clear()
+    config.DB_SETTINGS["dsn"] = TEST_DATABASE_URL
+
+
+@pytest.fixture
+def db():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+
+    from db import get_db_connection
+    conn = get_db_connection()
+    yield conn
+    conn.rollback()
+    conn.close()
+
+
+@pytest.fixture
+def team_user(db):
+    """
+    (team_id, user_id) of a throwaway team with one USER-role member;
+    everything they uploaded is removed afterwards.
+    """
+    tag = uuid.uuid4().hex[:12]
+    cur = db.cursor()
+    cur.execute("INSERT INTO teams (team_name) VALUES (%s) RETURNING team_id", (f"test-{tag}",))
+    team_id = cur.fetchone()[0]
+    cur.execute("""
+        INSERT INTO users (first_name, phone_no, email, username, password_hash, gender)
+        VALUES ('Test', '0', %s, %s, 'x', 'X')
+        RETURNING user_id
+    """, (f"{tag}@example.com", f"test-{tag}"))
+    user_id = cur.fetchone()[0]
+    cur.execute("INSERT INTO user_teams (user_id, team_id) VALUES (%s, %s)", (user_id, team_id))
+    cur.execute("""
+        INSERT INTO user_roles (user_id, role_id)
+        SELECT %s, role_id FROM roles WHERE role_name = 'USER'
+    """, (user_id,))
+    db.commit()
+
+    yield team_id, user_id
+
+    db.rollback()
+    cur.execute("""
+        DELETE FROM archives
+        WHERE file_id IN (SELECT file_id FROM raw_files WHERE team_id = %s)
+    """, (team_id,))
+    cur.execute("""
+        DELETE FROM raw_files WHERE team_id = %s
+        RETURNING blob_sha256
+    """, (team_id,))
+    blobs = [r[0] for r in cur.fetchall() if r[0]]
+    cur.execute("DELETE FROM raw_blobs WHERE sha256 = ANY(%s)", (blobs,))
+    cur.execute("DELETE FROM audit_trail WHERE user_id = %s", (user_id,))
+    cur.execute("DELETE FROM users WHERE user_id = %s", (user_id,))
+    cur.execute("DELETE FROM teams WHERE team_id = %s", (team_id,))
+    db.commit()
+    cur.close()
+
+
+@pytest.fixture
+def client(team_user):
+    from app import app
+
+    app.config["TESTING"] = True
+    with app.test_client() as client:
+        with client.session_transaction() as session:
+            session["user_id"] = team_user[1]
+        yield client
+
+
+@pytest.fixture
+def raw_file(db, team_user):
+    """
+    Factory for raw_files rows of team_user:
+    raw_file(blob=False, archived=False, uploaded_at=None) returns the file_id.
+    """
+    team_id, user_id = team_user
+    cur = db.cursor()
+
+    def make(blob=False, archived=False, uploaded_at=None):
+        content_sha256 = uuid.uuid4().hex * 2
+        if blob:
+            cur.execute("""
+                INSERT INTO raw_blobs (sha256, codec, stored_bytes)
+                VALUES (%s, 'gzip', 1)
+            """, (content_sha256,))
+        cur.execute("""
+            INSERT INTO raw_files
+            (team_id, uploaded_by, original_name, file_size_bytes, format_id,
+             environment_id, content_sha256, blob_sha256, is_archived, uploaded_at)
+            SELECT %s, %s, 'app.log', 1, format_id, 1, %s, %s, %s, COALESCE(%s, NOW())
+            FROM file_formats WHERE format_name = 'TXT'
+            RETURNING file_id
+        """, (team_id, user_id, content_sha256, content_sha256 if blob else None, archived, uploaded_at))
+        file_id = cur.fetchone()[0]
+        db.commit()
+        return file_id
+
+    return make
@@ -0,0 +1,38 @@
+from datetime import datetime, timedelta, timezone
+
+import archiver
+from jobs import QUEUED, DONE
+
+
+def _archived(db, file_ids):
+    cur = db.cursor()
+    cur.execute("""
+        SELECT file_id FROM raw_files WHERE file_id = ANY(%s) AND is_archived
+        ORDER BY file_id
+    """, (file_ids,))
+    archived = [r[0] for r in cur.fetchall()]
+    db.commit()
+    return archived
+
+
+def test_file_with_active_job_holds_the_watermark(db, raw_file):
+    # older than every file of earlier runs, so behind no watermark
+    base = datetime.now(timezone.utc) - timedelta(days=1)
+    first, busy, last = (raw_file(uploaded_at=base + timedelta(seconds=i)) for i in range(3))
+    cur = db.cursor()
+    cur.execute("DELETE FROM archiver_runs")
+    cur.execute("INSERT INTO ingestion_jobs (file_id, state) VALUES (%s, %s) RETURNING job_id", (busy, QUEUED))
+    job_id = cur.fetchone()[0]
+    db.commit()
+
+    archiver.run_once(db, age_days=0, batch_size=1)
+    assert _archived(db, [first, busy, last]) == [first]
+
+    # the next run picks up where the busy file stopped it
+    archiver.run_once(db, age_days=0, batch_size=1)
+    assert _archived(db, [first, busy, last]) == [first]
+
+    cur.execute("UPDATE ingestion_jobs SET state = %s WHERE job_id = %s", (DONE, job_id))
+    db.commit()
+    archiver.run_once(db, age_days=0, batch_size=1)
+    assert _archived(db, [first, busy, last]) == [first, busy, last]
@@ -0,0 +1,19 @@
+import pytest
+
+import dimensions
+
+SEVERITIES = {"DEBUG": 1, "INFO": 2, "WARN": 3, "ERROR": 4, "FATAL": 5}
+
+
+@pytest.fixture(autouse=True)
+def lookup_tables(monkeypatch):
+    monkeypatch.setattr(dimensions, "get_dimensions", lambda: {"severities": SEVERITIES})
+
+
+@pytest.mark.parametrize("level, code", [
+    ("warning", "WARN"), ("Warning", "WARN"), ("WARN", "WARN"),
+    ("critical", "FATAL"), ("err", "ERROR"), ("trace", "DEBUG"),
+    (" error ", "ERROR"), ("", "INFO"), (None, "INFO"), ("verbose", "INFO"),
+])
+def test_severity_aliases_apply_to_every_format(level, code):
+    assert dimensions.severity_id(level) == SEVERITIES[code]
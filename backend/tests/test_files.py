@@ -0,0 +1,50 @@
+from jobs import QUEUED, DONE, fail_job
+
+
+def _jobs(db, file_id):
+    cur = db.cursor()
+    cur.execute("SELECT state FROM ingestion_jobs WHERE file_id = %s ORDER BY job_id", (file_id,))
+    states = [r[0] for r in cur.fetchall()]
+    db.commit()
+    return states
+
+
+def _content_sha256(db, file_id):
+    cur = db.cursor()
+    cur.execute("SELECT content_sha256 FROM raw_files WHERE file_id = %s", (file_id,))
+    value = cur.fetchone()[0]
+    db.commit()
+    return value
+
+
+def test_reparse_queues_one_job(client, raw_file, db):
+    file_id = raw_file(blob=True)
+
+    assert client.post(f"/files/{file_id}/reparse").status_code == 302
+    assert client.post(f"/files/{file_id}/reparse").status_code == 409
+    assert _jobs(db, file_id) == [QUEUED]
+
+
+def test_reparse_of_archived_file_is_refused(client, raw_file, db):
+    file_id = raw_file(blob=True, archived=True)
+
+    assert client.post(f"/files/{file_id}/reparse").status_code == 409
+    assert _jobs(db, file_id) == []
+
+
+def test_failed_reparse_keeps_the_duplicate_hash(client, raw_file, db):
+    file_id = raw_file(blob=True)
+    content_sha256 = _content_sha256(db, file_id)
+    cur = db.cursor()
+    cur.execute("""
+        INSERT INTO ingestion_jobs (file_id, state, finished_at)
+        VALUES (%s, %s, NOW())
+    """, (file_id, DONE))
+    db.commit()
+
+    client.post(f"/files/{file_id}/reparse")
+    cur.execute("SELECT MAX(job_id) FROM ingestion_jobs WHERE file_id = %s", (file_id,))
+    job_id = cur.fetchone()[0]
+    fail_job(db, job_id, "parser error")
+
+    assert _content_sha256(db, file_id) == content_sha256
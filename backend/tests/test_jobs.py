@@ -0,0 +1,105 @@
+from datetime import datetime, timezone
+
+from db import get_db_connection
+from jobs import (
+    QUEUED, RUNNING, FAILED, claim_job, fail_job, enqueue_job,
+    INGEST_JOB_MAX_ATTEMPTS, INGEST_JOB_STALE_SECONDS,
+)
+
+
+def _job(db, job_id):
+    cur = db.cursor()
+    cur.execute("SELECT state, attempts, error FROM ingestion_jobs WHERE job_id = %s", (job_id,))
+    row = cur.fetchone()
+    db.commit()
+    return row
+
+
+def _running(db, file_id, attempts, stale=False, spool_path=None):
+    cur = db.cursor()
+    cur.execute("""
+        INSERT INTO ingestion_jobs (file_id, spool_path, state, attempts, started_at, heartbeat_at)
+        VALUES (%s, %s, %s, %s, NOW(), NOW() - (%s || ' seconds')::interval)
+        RETURNING job_id
+    """, (file_id, spool_path, RUNNING, attempts, INGEST_JOB_STALE_SECONDS + 60 if stale else 0))
+    job_id = cur.fetchone()[0]
+    db.commit()
+    return job_id
+
+
+def _queued(db, file_id):
+    cur = db.cursor()
+    job_id = enqueue_job(cur, file_id, "/nonexistent/spool")
+    db.commit()
+    return job_id
+
+
+def test_claim_takes_the_oldest_queued_job(db, raw_file):
+    first = _queued(db, raw_file())
+    second = _queued(db, raw_file())
+
+    job = claim_job(db, "worker-a")
+    assert job[0] == first
+    assert _job(db, first)[:2] == (RUNNING, 1)
+
+    assert claim_job(db, "worker-b")[0] == second
+    assert claim_job(db, "worker-c") is None
+
+
+def test_claim_skips_a_locked_job(db, raw_file):
+    locked = _queued(db, raw_file())
+    free = _queued(db, raw_file())
+
+    other = get_db_connection()
+    try:
+        cur = other.cursor()
+        cur.execute("SELECT 1 FROM ingestion_jobs WHERE job_id = %s FOR UPDATE", (locked,))
+        # does not wait for the other transaction
+        assert claim_job(db, "worker-a")[0] == free
+        assert _job(db, locked)[0] == QUEUED
+    finally:
+        other.rollback()
+        other.close()
+
+
+def test_stale_job_is_claimed_again(db, raw_file):
+    job_id = _running(db, raw_file(), attempts=1, stale=True)
+
+    job = claim_job(db, "worker-b")
+    assert job[0] == job_id
+    assert job[-1] == 2
+
+
+def test_stale_job_on_its_last_attempt_fails(db, raw_file):
+    file_id = raw_file()
+    job_id = _running(db, file_id, attempts=INGEST_JOB_MAX_ATTEMPTS, stale=True)
+    cur = db.cursor()
+    cur.execute("""
+        INSERT INTO log_entries (file_id, log_timestamp, severity_id, category_id, message_line)
+        SELECT %s, %s, MIN(severity_id), MIN(category_id), 'partial batch'
+        FROM log_severities, log_categories
+    """, (file_id, datetime(2024, 1, 1, tzinfo=timezone.utc)))
+    db.commit()
+
+    assert claim_job(db, "worker-b") is None
+
+    state, attempts, error = _job(db, job_id)
+    assert (state, attempts) == (FAILED, INGEST_JOB_MAX_ATTEMPTS)
+    assert "last attempt" in error
+    cur.execute("SELECT COUNT(*) FROM log_entries WHERE file_id = %s", (file_id,))
+    assert cur.fetchone()[0] == 0
+    cur.execute("SELECT content_sha256 FROM raw_files WHERE file_id = %s", (file_id,))
+    assert cur.fetchone()[0] is None
+    db.commit()
+
+
+def test_fail_on_last_attempt_is_final(db, raw_file, tmp_path):
+    spool = tmp_path / "upload.log"
+    spool.write_text("2024-01-01 10:00:00 INFO api - started\n")
+    job_id = _running(db, raw_file(), attempts=INGEST_JOB_MAX_ATTEMPTS, spool_path=str(spool))
+
+    fail_job(db, job_id, "parser error")
+
+    assert _job(db, job_id)[0] == FAILED
+    assert not spool.exists()
+    assert claim_job(db, "worker-b") is None
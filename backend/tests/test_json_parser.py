@@ -0,0 +1,45 @@
+import io
+import json
+
+import pytest
+
+from parser.json_parser import parse_json, MalformedJSON
+
+
+def _entry(i):
+    return json.dumps({"timestamp": "2024-01-01T10:00:00", "level": "info", "message": f"entry {i}"})
+
+
+def _parse(text):
+    return list(parse_json(io.BytesIO(text.encode())))
+
+
+def test_array_spanning_many_chunks():
+    records = _parse("[" + ",".join(_entry(i) for i in range(5000)) + "]")
+    assert len(records) == 5000
+    assert records[-1]["message"] == "entry 4999"
+
+
+def test_ndjson_skips_bad_lines():
+    records = _parse(_entry(1) + "\n{broken\n" + _entry(2) + "\n")
+    assert [r["message"] for r in records] == ["entry 1", "entry 2"]
+
+
+@pytest.mark.parametrize("text", [
+    "[" + _entry(1) + ', {"timestamp": "x" "level": "info"}, ' + ",".join(_entry(i) for i in range(5000)) + "]",
+    "[" + _entry(1) + ', {"message": "never closed',
+    "[" + _entry(1) + "," + _entry(2),
+])
+def test_malformed_array_raises(text):
+    with pytest.raises(MalformedJSON):
+        _parse(text)
+
+
+def test_malformed_element_does_not_buffer_the_rest():
+    from parser.json_parser import CHUNK_SIZE
+
+    text = "[" + _entry(1) + ', {"oops" 1}, ' + ",".join(_entry(i) for i in range(50000)) + "]"
+    stream = io.BytesIO(text.encode())
+    with pytest.raises(MalformedJSON):
+        list(parse_json(stream))
+    assert stream.tell() < 4 * CHUNK_SIZE < len(text)
@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+
+
+def test_malformed_date_is_a_bad_request(client):
+    assert client.get("/logs?start_date=yesterday").status_code == 400
+    assert client.get("/logs?end_date=2024-13-01").status_code == 400
+
+
+def test_date_filter_uses_utc_days(client, raw_file, db, monkeypatch):
+    # a session time zone behind UTC would move the row to the previous day
+    monkeypatch.setenv("PGTZ", "America/New_York")
+    file_id = raw_file()
+    cur = db.cursor()
+    cur.execute("""
+        INSERT INTO log_entries (file_id, log_timestamp, severity_id, category_id, message_line)
+        SELECT %s, %s, MIN(severity_id), MIN(category_id), 'just after midnight UTC'
+        FROM log_severities, log_categories
+    """, (file_id, datetime(2024, 3, 2, 0, 30, tzinfo=timezone.utc)))
+    db.commit()
+
+    page = client.get("/logs?start_date=2024-03-02&end_date=2024-03-02").get_data(as_text=True)
+    assert "just after midnight UTC" in page
+
+    page = client.get("/logs?start_date=2024-03-01&end_date=2024-03-01").get_data(as_text=True)
+    assert "just after midnight UTC" not in page
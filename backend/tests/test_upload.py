@@ -0,0 +1,87 @@
+import gzip
+import io
+import os
+import zipfile
+from urllib.parse import urlparse, parse_qs
+
+
+def _log(service, lines):
+    return "".join(
+        f"2024-01-01 10:00:{i:02d},000 INFO {service} - request {i} completed\n"
+        for i in range(lines)
+    ).encode()
+
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buf.getvalue()
+
+
+def _upload(client, filename, data):
+    response = client.post(
+        "/upload",
+        data={"environment_id": "1", "files": (io.BytesIO(data), filename)},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 302
+    return parse_qs(urlparse(response.headers["Location"]).query)
+
+
+def test_zip_members_each_get_a_job(client, team_user, db):
+    data = _zip({
+        "api.log": _log("api", 20),
+        "worker.log": _log("worker", 30),
+        "nested/db.log": _log("db", 40),
+    })
+
+    result = _upload(client, "bundle.zip", data)
+
+    assert "rejected" not in result
+    job_ids = [int(j) for j in result["jobs"][0].split(",")]
+    assert len(job_ids) == 3
+
+    cur = db.cursor()
+    cur.execute("""
+        SELECT rf.original_name, j.spool_path, j.archive_member
+        FROM ingestion_jobs j
+        JOIN raw_files rf ON j.file_id = rf.file_id
+        WHERE j.job_id = ANY(%s)
+        ORDER BY rf.original_name
+    """, (job_ids,))
+    rows = cur.fetchall()
+    assert [r[0] for r in rows] == ["bundle.zip/api.log", "bundle.zip/nested_db.log", "bundle.zip/worker.log"]
+    assert sorted(r[2] for r in rows) == ["api.log", "nested/db.log", "worker.log"]
+
+    # one spooled archive shared by every member
+    spool_paths = {r[1] for r in rows}
+    assert len(spool_paths) == 1
+    spool_path = spool_paths.pop()
+    assert os.path.exists(spool_path)
+    os.remove(spool_path)
+
+
+def test_zip_member_already_uploaded_is_a_duplicate(client, team_user, db):
+    _upload(client, "api.log", _log("api", 20))
+
+    result = _upload(client, "bundle.zip", _zip({
+        "api.log": _log("api", 20),
+        "worker.log": _log("worker", 30),
+    }))
+
+    assert len(result["jobs"][0].split(",")) == 1
+    assert result["duplicates"][0].startswith("bundle.zip/api.log:")
+
+
+def test_compressed_uploads_deduplicate_on_content(client, team_user, db):
+    log = _log("api", 50)
+    first = _upload(client, "api.log.gz", gzip.compress(log, compresslevel=1))
+    assert len(first["jobs"][0].split(",")) == 1
+
+    again = _upload(client, "api-copy.log.gz", gzip.compress(log, compresslevel=9))
+    zipped = _upload(client, "bundle.zip", _zip({"api.log": log}))
+
+    assert "jobs" not in again and again["duplicates"][0].startswith("api-copy.log.gz:")
+    assert "jobs" not in zipped and zipped["duplicates"][0].startswith("bundle.zip/api.log:")
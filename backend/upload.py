@@ -1,21 +1,145 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, abort
+import os
+import uuid
+from flask import Blueprint, render_template, request, redirect, url_for, session, abort, jsonify
 from werkzeug.utils import secure_filename
 from db import get_db_connection
 from audit import log_audit
 from permissions import require_permission
-from parser.parser_runner import run_parser
+from config import INGEST_SPOOL_DIR, DUPLICATE_UPLOAD_POLICY, ZIP_MAX_UNCOMPRESSED_BYTES, ZIP_MAX_RATIO
+from jobs import enqueue_job, get_job, get_jobs, summarize_jobs
+from parser.sniffer import sniff_stream, MIN_CONFIDENCE
+from compression import (
+    split_compression, decompressing_reader, archive_members, open_member,
+    digest_stream, ARCHIVE_COMPRESSIONS, DECOMPRESSION_ERRORS, DecompressionLimitExceeded
+)
+import dimensions
 
 upload_bp = Blueprint("upload", __name__)
 
+# compressed content up to this size is not held to ZIP_MAX_RATIO
+# (a small, repetitive log can legitimately compress better than that)
+RATIO_FREE_BYTES = 1024 * 1024
+
 ALLOWED_EXTENSIONS = {
     "txt": "TXT",
     "csv": "CSV",
     "json": "JSON",
-    "xml": "XML"
+    "ndjson": "JSON",
+    "jsonl": "JSON",
+    "xml": "XML",
+    "log": "TXT"
 }
 
 def allowed_file(filename):
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+    # app.log.gz / app.json.bz2 / app.xml.xz are judged by the inner extension;
+    # zip members are checked one by one when the archive is opened
+    inner, compression = split_compression(filename)
+    if compression in ARCHIVE_COMPRESSIONS:
+        return True
+    return "." in inner and inner.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def sniff_upload(stream, compression):
+    """
+    Sniff the decompressed head; None for unreadable / corrupt compressed data.
+    """
+    try:
+        return sniff_stream(decompressing_reader(stream, compression))
+    except DECOMPRESSION_ERRORS:
+        return None
+
+
+def decompressed_limit(compressed_size, budget=ZIP_MAX_UNCOMPRESSED_BYTES):
+    return min(budget, max(compressed_size * ZIP_MAX_RATIO, RATIO_FREE_BYTES))
+
+
+def digest_upload(spool, compression):
+    """
+    (sha256, size) of the decompressed content, so the same log is one
+    duplicate whether it came plain, zipped or gzipped at any level. Plain
+    uploads were hashed while they were spooled.
+    """
+    if not compression:
+        return spool.sha256, spool.size
+
+    pos = spool.tell()
+    try:
+        with decompressing_reader(spool, compression) as stream:
+            return digest_stream(stream, decompressed_limit(spool.size))
+    finally:
+        spool.seek(pos)
+
+
+def is_admin_user(cur, user_id):
+    cur.execute("""
+        SELECT 1
+        FROM user_roles ur
+        JOIN roles r ON ur.role_id = r.role_id
+        WHERE ur.user_id = %s AND r.role_name = 'ADMIN'
+        LIMIT 1
+    """, (user_id,))
+    return cur.fetchone() is not None
+
+
+def find_duplicate(cur, team_id, content_sha256):
+    # single probe of the (team_id, content_sha256) unique index; files whose
+    # ingest failed have no content_sha256 (jobs.fail_job) and never match
+    cur.execute("""
+        SELECT file_id
+        FROM raw_files
+        WHERE team_id = %s AND content_sha256 = %s
+    """, (team_id, content_sha256))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def record_duplicate(cur, policy, team_id, user_id, filename, file_size, existing_file_id, environment_id):
+    """
+    "link": keep a raw_files row pointing at the already-ingested file (no re-parse).
+    "skip": store nothing.
+    """
+    if policy != "link":
+        return "skipped"
+
+    cur.execute("""
+        INSERT INTO raw_files
+        (team_id, uploaded_by, original_name, file_size_bytes, format_id, environment_id, duplicate_of)
+        SELECT %s, %s, %s, %s, format_id, %s, file_id
+        FROM raw_files
+        WHERE file_id = %s
+    """, (team_id, user_id, filename, file_size, environment_id, existing_file_id))
+    return "linked"
+
+
+def register_upload(cur, team_id, user_id, environment_id, name, detected,
+                    content_sha256, file_size, compressed_size=None):
+    """
+    Insert the raw_files row for one uploaded file or archive member.
+    Returns the file_id, or None when the team already has these bytes
+    (the unique index settles two identical uploads racing).
+    """
+    cur.execute("""
+    INSERT INTO raw_files
+    (team_id, uploaded_by, original_name, file_size_bytes, compressed_size_bytes,
+     format_id, environment_id, detected_format, format_confidence, content_sha256)
+    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+    ON CONFLICT (team_id, content_sha256) WHERE content_sha256 IS NOT NULL
+    DO NOTHING
+    RETURNING file_id
+    """, (
+        team_id,
+        user_id,
+        name,
+        file_size,
+        compressed_size,
+        dimensions.format_id(detected.format_name),
+        environment_id,
+        f"{detected.format_name}:{detected.layout}",
+        detected.confidence,
+        content_sha256
+    ))
+    row = cur.fetchone()
+    return row[0] if row else None
 
 
 @upload_bp.route("/upload", methods=["GET", "POST"])
@@ -28,18 +152,9 @@ def upload_file():
     conn = get_db_connection()
     cur = conn.cursor()
 
-    # admin check
-    cur.execute("""
-        SELECT 1
-        FROM user_roles ur
-        JOIN roles r ON ur.role_id = r.role_id
-        WHERE ur.user_id = %s AND r.role_name = 'ADMIN'
-        LIMIT 1
-    """, (user_id,))
-    admin = cur.fetchone() is not None
+    admin = is_admin_user(cur, user_id)
 
-    cur.execute("SELECT environment_id, environment_code FROM environments")
-    environments = cur.fetchall()
+    environments = dimensions.environments()
 
     if request.method == "POST":
         files = request.files.getlist("files")
@@ -47,72 +162,227 @@ def upload_file():
 
         if not environment_id:
             abort(400, "Environment is required")
-        
+
+        duplicate_policy = request.form.get("on_duplicate", DUPLICATE_UPLOAD_POLICY)
+        if duplicate_policy not in ("link", "skip"):
+            duplicate_policy = DUPLICATE_UPLOAD_POLICY
+
+        files = [f for f in files if f and f.filename]
+        if not files:
+            abort(400, "No file selected")
+
+        # Every file is reported on its own: one bad file no longer hides the others
+        job_ids = []
+        rejected = []
+        duplicates = []
+
+        # team_id
+        cur.execute(
+        "SELECT team_id FROM user_teams WHERE user_id=%s LIMIT 1",
+        (user_id,)
+        )
+        team_id = cur.fetchone()[0]
+
         for file in files:
-            if not file or file.filename == "":
-                abort(400, "No file selected")
             if not allowed_file(file.filename):
-                abort(400, "Unsupported file type")
+                rejected.append(f"{secure_filename(file.filename) or 'unnamed'}:type")
+                continue
             filename = secure_filename(file.filename)
-            extension = filename.rsplit(".", 1)[1].lower()
-            format_name = ALLOWED_EXTENSIONS[extension]
 
-            # format_id
-            cur.execute(
-            "SELECT format_id FROM file_formats WHERE format_name=%s",
-            (format_name,)
+            # Already streamed to the spool dir while the request was read
+            # (spool.SpoolFile), hash included
+            spool = file.stream
+            compression = split_compression(filename)[1]
+
+            # -------------------------
+            # Zip bundle: every member becomes its own raw_files row + job.
+            # The archive is spooled once; workers decompress their member.
+            # -------------------------
+            if compression in ARCHIVE_COMPRESSIONS:
+                try:
+                    members = archive_members(spool)
+                except DECOMPRESSION_ERRORS:
+                    rejected.append(f"{filename}:content")
+                    continue
+
+                spool_path = None
+                queued_before = len(job_ids)
+                # decompressed bytes this zip may still produce in the request
+                zip_budget = ZIP_MAX_UNCOMPRESSED_BYTES
+                for info in members:
+                    member_name = f"{filename}/{secure_filename(info.filename)}"
+                    inner_compression = split_compression(info.filename)[1]
+                    if inner_compression in ARCHIVE_COMPRESSIONS or not allowed_file(info.filename):
+                        rejected.append(f"{member_name}:type")
+                        continue
+
+                    # zip bombs: the header sizes reject most without reading a
+                    # byte; digest_stream enforces the limit on the real output
+                    limit = decompressed_limit(info.compress_size, zip_budget)
+                    if info.file_size > limit:
+                        rejected.append(f"{member_name}:size")
+                        continue
+
+                    try:
+                        with open_member(spool, info.filename) as stream:
+                            detected = sniff_stream(stream)
+                            content_sha256, file_size = digest_stream(stream, limit)
+                    except DecompressionLimitExceeded:
+                        rejected.append(f"{member_name}:size")
+                        continue
+                    except DECOMPRESSION_ERRORS:
+                        detected = None
+                    else:
+                        zip_budget -= file_size
+                    if not detected or detected.confidence < MIN_CONFIDENCE:
+                        rejected.append(f"{member_name}:content")
+                        continue
+
+                    existing_file_id = find_duplicate(cur, team_id, content_sha256)
+                    if not existing_file_id:
+                        if spool_path is None:
+                            spool_path = spool.persist(
+                                os.path.join(INGEST_SPOOL_DIR, f"{uuid.uuid4().hex}_{filename}")
+                            )
+                        file_id = register_upload(
+                            cur, team_id, user_id, environment_id, member_name, detected,
+                            content_sha256, file_size, info.compress_size
+                        )
+                        if file_id:
+                            job_ids.append(enqueue_job(cur, file_id, spool_path, info.filename))
+                            conn.commit()
+                            log_audit("UPLOAD_FILE", "raw_files", file_id, f"Uploaded {member_name}")
+                            continue
+                        existing_file_id = find_duplicate(cur, team_id, content_sha256)
+
+                    decision = record_duplicate(
+                        cur, duplicate_policy, team_id, user_id, member_name,
+                        file_size, existing_file_id, environment_id
+                    )
+                    conn.commit()
+                    duplicates.append(f"{member_name}:{existing_file_id}:{decision}")
+
+                # persisted, but every member lost an insert race to an identical upload
+                if spool_path and len(job_ids) == queued_before:
+                    os.remove(spool_path)
+                continue
+
+            # Look at the first few KB: the content, not the extension, picks the parser
+            detected = sniff_upload(spool, compression)
+            if not detected or detected.confidence < MIN_CONFIDENCE:
+                rejected.append(f"{filename}:content")
+                continue
+
+            try:
+                content_sha256, file_size = digest_upload(spool, compression)
+            except DecompressionLimitExceeded:
+                rejected.append(f"{filename}:size")
+                continue
+            except DECOMPRESSION_ERRORS:
+                rejected.append(f"{filename}:content")
+                continue
+            compressed_size = spool.size if compression else None
+
+            # Same content already uploaded by this team: don't parse it twice
+            existing_file_id = find_duplicate(cur, team_id, content_sha256)
+            if existing_file_id:
+                decision = record_duplicate(
+                    cur, duplicate_policy, team_id, user_id, filename,
+                    file_size, existing_file_id, environment_id
+                )
+                conn.commit()
+                duplicates.append(f"{filename}:{existing_file_id}:{decision}")
+                continue
+
+            # keep it under its final name for the workers
+            spool_path = spool.persist(
+                os.path.join(INGEST_SPOOL_DIR, f"{uuid.uuid4().hex}_{filename}")
             )
-            format_id = cur.fetchone()[0]
 
-            # team_id
-            cur.execute(
-            "SELECT team_id FROM user_teams WHERE user_id=%s LIMIT 1",
-            (user_id,)
+            file_id = register_upload(
+                cur, team_id, user_id, environment_id, filename, detected,
+                content_sha256, file_size, compressed_size
             )
-            team_id = cur.fetchone()[0]
-
-            # file size (memory-safe)
-            file_bytes = file.read()
-            file_size = len(file_bytes)
-            file.seek(0)
-
-            # insert raw_files
-            cur.execute("""
-            INSERT INTO raw_files
-            (team_id, uploaded_by, original_name, file_size_bytes, format_id, environment_id)
-            VALUES (%s,%s,%s,%s,%s,%s)
-            RETURNING file_id
-            """, (
-                team_id,
-                user_id,
-                filename,
-                file_size,
-                format_id,
-                environment_id
-            ))
-
-            file_id = cur.fetchone()[0]
-            log_audit("UPLOAD_FILE", "raw_files", file_id, f"Uploaded {filename}")
+            if not file_id:
+                os.remove(spool_path)
+                existing_file_id = find_duplicate(cur, team_id, content_sha256)
+                decision = record_duplicate(
+                    cur, duplicate_policy, team_id, user_id, filename,
+                    file_size, existing_file_id, environment_id
+                )
+                conn.commit()
+                duplicates.append(f"{filename}:{existing_file_id}:{decision}")
+                continue
+
+            # queue parsing; the request returns without waiting for it
+            job_ids.append(enqueue_job(cur, file_id, spool_path))
             conn.commit()
-            print("gd")
-            try:
-                run_parser(file_id, file.stream)
-                success = "1"
-                error = None
-            except Exception as e:
-                conn.rollback()
-                success = None
-                error = "Parsing failed. Please check the log format."
+            log_audit("UPLOAD_FILE", "raw_files", file_id, f"Uploaded {filename}")
 
         cur.close()
         conn.close()
 
-        if success:
-            return redirect(url_for("upload.upload_file", success="1"))
-        else:
-            return redirect(url_for("upload.upload_file", error="1"))
+        return redirect(url_for(
+            "upload.upload_file",
+            success="1" if job_ids else None,
+            error="1" if not job_ids and not duplicates else None,
+            jobs=",".join(str(j) for j in job_ids) or None,
+            rejected=",".join(rejected) or None,
+            duplicates=",".join(duplicates) or None
+        ))
 
 
     cur.close()
     conn.close()
-    return render_template("upload.html", environments=environments, admin=admin)
\ No newline at end of file
+    return render_template("upload.html", environments=environments, admin=admin)
+
+
+@upload_bp.route("/upload/jobs/<int:job_id>")
+@require_permission("UPLOAD_LOG")
+def job_status(job_id):
+    user_id = session.get("user_id")
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    job = get_job(cur, job_id)
+    admin = is_admin_user(cur, user_id)
+
+    cur.close()
+    conn.close()
+
+    if not job:
+        abort(404, "Job not found")
+
+    if not admin and job["uploaded_by"] != user_id:
+        abort(403, "You can view only your own uploads")
+
+    return jsonify(job)
+
+
+@upload_bp.route("/upload/jobs")
+@require_permission("UPLOAD_LOG")
+def jobs_status():
+    """
+    Per-file results of a multi-file upload: /upload/jobs?ids=1,2,3
+    """
+    user_id = session.get("user_id")
+
+    try:
+        job_ids = [int(j) for j in request.args.get("ids", "").split(",") if j]
+    except ValueError:
+        abort(400, "Invalid job ids")
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+
+    jobs = get_jobs(cur, job_ids)
+    admin = is_admin_user(cur, user_id)
+
+    cur.close()
+    conn.close()
+
+    if not admin:
+        jobs = [j for j in jobs if j["uploaded_by"] == user_id]
+
+    return jsonify({"jobs": jobs, "summary": summarize_jobs(jobs)})